@@ -0,0 +1,205 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Benchmarks of yasync-cli against a local fake Syncthing server.
+
+Each case is run at increasing scales (numbers of folders, paths, messages,
+etc.), and its wall time (the median of several runs) and peak memory
+allocated by Python (through `tracemalloc`) are recorded.
+
+Usage:
+    python benchmarks/bench.py [--scales 10,100,1000] [--json OUT]
+        [--baseline OLD.json] [--threshold 1.5]
+
+With `--baseline`, the exit code is 1 if any case is slower than `threshold`
+times its baseline, so regressions fail CI jobs.
+"""
+import io
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+
+# the package may not be installed when running benchmarks from a checkout
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import formatters
+from yasynccli import subcommands
+from yasynccli.config import SyncthingConfig
+from yasynccli.session import SyncthingSession
+import synthetic
+from fakeserver import FakeSyncthing
+
+def measure(func, repeat):
+    """Measure the wall time and peak memory of a function.
+
+    Args:
+    -----
+        func: a callable without arguments.
+        repeat: an int; the number of timed runs.
+
+    Returns:
+    --------
+        seconds: a float; the median wall time.
+        peak: an int; the peak memory in bytes allocated during one run.
+    """
+
+    func() # warm up, e.g., connections and imports
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter()-start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return statistics.median(times), peak
+
+def _args(config, cache_dir, **kwargs):
+    """A namespace of global CMD arguments talking to the server directly."""
+    return argparse.Namespace(
+        config=config, url=None, apikey=None, cache_dir=cache_dir, no_daemon=True,
+        use_cache=False, **kwargs)
+
+def cases(scale, workdir):
+    """Create the benchmark cases of a scale.
+
+    Args:
+    -----
+        scale: an int; the number of folders, paths, messages, etc.
+        workdir: a Path object of a scratch directory.
+
+    Yields:
+    -------
+        (name, callable without arguments, cleanup callable or None)
+    """
+
+    devices = max(1, scale // 10)
+    config_path = workdir.joinpath("config-{}.xml".format(scale))
+    server_config = synthetic.write_config(config_path, scale, devices, workdir)
+
+    # config parsing without the on-disk cache
+    yield "config", lambda: SyncthingConfig(config_path), None
+
+    # resolving paths to folders as `scan` does, with nested folders
+    config = SyncthingConfig(config_path)
+    paths = [
+        pathlib.Path(folder["path"]).joinpath("sub", "file{}".format(i))
+        for i, folder in enumerate(server_config["folders"])]
+    yield "scan-resolve", lambda: subcommands._group_by_folder(config, paths), None
+
+    # formatting `scale` log messages
+    data = synthetic.log(scale)
+    yield "log-format", lambda: sum(1 for _ in formatters.log(data)), None
+
+    server = FakeSyncthing(server_config, messages=scale, files=scale).start()
+    synthetic.write_config(config_path, scale, devices, workdir, server.address)
+    session = SyncthingSession(config_path)
+
+    # the whole `check` subcommand, from creating a session to formatting
+    def check():
+        with contextlib.redirect_stdout(io.StringIO()):
+            subcommands.check(_args(config_path, None))
+    yield "check", check, None
+
+    # GET and decode a log of `scale` messages and a browse of `scale` files
+    yield "get-log", lambda: session.get("system", "log").json(), None
+    yield "get-browse", lambda: session.get("db", "browse").json(), lambda: (
+        session.close(), server.stop())
+
+def run(scales, repeat):
+    """Run all cases at all scales.
+
+    Returns:
+    --------
+        A list of dicts with `case`, `scale`, `seconds`, and `peak`.
+    """
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            for name, func, cleanup in cases(scale, pathlib.Path(workdir)):
+                seconds, peak = measure(func, repeat)
+                results.append({"case": name, "scale": scale, "seconds": seconds, "peak": peak})
+                if cleanup is not None:
+                    cleanup()
+
+    return results
+
+def compare(results, baseline, threshold):
+    """Find cases slower than their baselines.
+
+    Args:
+    -----
+        results: a list of dicts from `run`.
+        baseline: a list of dicts from a previous `run`.
+        threshold: a float; the allowed ratio of slowdown.
+
+    Returns:
+    --------
+        A list of str describing regressions.
+    """
+
+    old = {(item["case"], item["scale"]): item["seconds"] for item in baseline}
+
+    regressions = []
+    for item in results:
+        before = old.get((item["case"], item["scale"]))
+        if before and item["seconds"] > threshold * before:
+            regressions.append("{} at scale {}: {:.3f} ms -> {:.3f} ms".format(
+                item["case"], item["scale"], before*1e3, item["seconds"]*1e3))
+
+    return regressions
+
+def main(argv=None):
+    """Main function of the benchmarks."""
+
+    parser = argparse.ArgumentParser(description="Benchmarks of yasync-cli.")
+    parser.add_argument(
+        "--scales", type=lambda s: [int(v) for v in s.split(",")], default=[10, 100, 1000],
+        help="comma-separated scales (Default: 10,100,1000)")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timed runs per case (Default: %(default)s)")
+    parser.add_argument("--json", type=pathlib.Path, default=None, help="write results to a JSON file")
+    parser.add_argument("--baseline", type=pathlib.Path, default=None, help="results of a previous run")
+    parser.add_argument(
+        "--threshold", type=float, default=1.5,
+        help="allowed slowdown ratio against the baseline (Default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.repeat)
+
+    sys.stdout.write("{:<12} {:>8} {:>12} {:>12}\n".format("case", "scale", "time (ms)", "peak (KiB)"))
+    for item in results:
+        sys.stdout.write("{:<12} {:>8} {:>12.3f} {:>12.1f}\n".format(
+            item["case"], item["scale"], item["seconds"]*1e3, item["peak"]/1024))
+
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2) + os.linesep)
+
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        for line in regressions:
+            sys.stderr.write("Regression: {}\n".format(line))
+        return 1 if regressions else 0
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
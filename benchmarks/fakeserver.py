@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""A local stand-in of Syncthing's REST API built on `http.server`.
+
+Every endpoint in SyncthingConfig's `_get_apis` and `_post_apis` is served.
+`/system/config`, `/system/log`, and `/db/browse` return synthetic payloads of
+the configured size; other endpoints return a small JSON object padded with
+`padding` bytes. Each request waits `latency` seconds before replying, to
+mimic a remote server.
+"""
+import sys
+import json
+import time
+import pathlib
+import threading
+import http.server
+import urllib.parse
+
+# the package may not be installed when running benchmarks from a checkout
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli.config import SyncthingConfig
+import synthetic
+
+class FakeSyncthing:
+    """A fake Syncthing server running in a background thread.
+
+    Constructor args:
+    -----------------
+        config: a dict in the form of `/system/config` responses.
+        apikey: a str; requests without this API key are refused with 403.
+        latency: a float; seconds to wait before each reply.
+        messages: an int; the number of messages of `/system/log`.
+        files: an int; the number of files of `/db/browse`.
+        padding: an int; bytes of padding in other responses.
+    """
+
+    def __init__(self, config, apikey="BENCHMARK", latency=0., messages=100,
+                 files=100, padding=0):
+        self.config = config
+        self.apikey = apikey
+        self.latency = latency
+        self.requests = 0
+
+        # pre-encode payloads so the server's own cost is small and constant
+        self._payloads = {
+            "/system/config": json.dumps(config).encode(),
+            "/system/log": json.dumps(synthetic.log(messages)).encode(),
+            "/db/browse": json.dumps(synthetic.browse(files)).encode(),
+        }
+        self._default = json.dumps({"ok": True, "padding": "x" * padding}).encode()
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        """The address in the form of `host:port`."""
+        return "{}:{}".format(*self._server.server_address[:2])
+
+    def start(self):
+        """Start serving in the background."""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _handler(self):
+        """Create the request handler class bound to this server."""
+
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            """Serve one connection of the fake server."""
+
+            protocol_version = "HTTP/1.1"
+
+            # headers and body are written separately; without this, Nagle's
+            # algorithm and delayed ACKs add ~40 ms to small responses
+            disable_nagle_algorithm = True
+
+            def _reply(self, apis):
+                fake.requests += 1
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                endpoint = urllib.parse.urlsplit(self.path).path[len("/rest"):]
+
+                if self.headers.get("X-API-KEY") != fake.apikey:
+                    status, body = 403, b"Forbidden\n"
+                elif endpoint not in apis:
+                    status, body = 404, b"404 page not found\n"
+                elif self.command == "POST":
+                    status, body = 200, b""
+                else:
+                    status, body = 200, fake._payloads.get(endpoint, fake._default)
+
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(SyncthingConfig._get_apis)
+
+            def do_POST(self):
+                self._reply(SyncthingConfig._post_apis)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Generators of synthetic Syncthing configs and server payloads.
+"""
+import pathlib
+from xml.sax.saxutils import quoteattr
+
+def device_id(i):
+    """A fake but well-formed device ID of the i-th device."""
+    raw = "{:056X}".format(i)
+    return "-".join(raw[j:j+7] for j in range(0, 56, 7))
+
+def folders(n, m, root):
+    """Describe n folders, each shared with all m devices.
+
+    Args:
+    -----
+        n: an int; the number of folders.
+        m: an int; the number of devices.
+        root: a str or Path object; the parent directory of folders.
+
+    Returns:
+    --------
+        A list of dicts with `id`, `label`, `path`, and `devices`, as in the
+        `folders` of `/system/config`.
+    """
+
+    root = pathlib.Path(root)
+    return [
+        {"id": "f{:05d}".format(i), "label": "Folder {}".format(i),
+         "path": str(root.joinpath("group{}".format(i % 10), "folder{}".format(i))),
+         "devices": [{"deviceID": device_id(j)} for j in range(m)]}
+        for i in range(n)]
+
+def devices(m):
+    """Describe m devices, as in the `devices` of `/system/config`."""
+    return [
+        {"deviceID": device_id(j), "name": "device{}".format(j),
+         "addresses": ["dynamic"], "paused": False}
+        for j in range(m)]
+
+def write_config(path, n, m, root, address="127.0.0.1:8384", apikey="BENCHMARK"):
+    """Write a config.xml with n folders and m devices.
+
+    Args:
+    -----
+        path: a str or Path object of the config file to write.
+        n: an int; the number of folders.
+        m: an int; the number of devices.
+        root: a str or Path object; the parent directory of folders.
+        address: a str; the GUI address.
+        apikey: a str; the API key.
+
+    Returns:
+    --------
+        A dict in the form of `/system/config` responses with the same folders
+        and devices.
+    """
+
+    config = {"folders": folders(n, m, root), "devices": devices(m)}
+
+    lines = ['<configuration version="30">']
+    for folder in config["folders"]:
+        lines.append(
+            '    <folder id={} label={} path={} type="sendreceive">'.format(
+                quoteattr(folder["id"]), quoteattr(folder["label"]),
+                quoteattr(folder["path"])))
+        for device in folder["devices"]:
+            lines.append('        <device id="{}"></device>'.format(device["deviceID"]))
+        lines.append('    </folder>')
+
+    for device in config["devices"]:
+        lines.append(
+            '    <device id="{}" name={}><address>dynamic</address></device>'.format(
+                device["deviceID"], quoteattr(device["name"])))
+
+    lines.append('    <gui enabled="true" tls="false">')
+    lines.append('        <address>{}</address>'.format(address))
+    lines.append('        <apikey>{}</apikey>'.format(apikey))
+    lines.append('    </gui>')
+    lines.append('</configuration>')
+
+    pathlib.Path(path).write_text("\n".join(lines) + "\n")
+    return config
+
+def log(n):
+    """A `/system/log` response with n messages."""
+    return {"messages": [
+        {"when": "2020-05-19T12:{:02d}:{:02d}.123456789-07:00".format(i // 60 % 60, i % 60),
+         "message": "Synthetic log message number {}".format(i), "level": 2}
+        for i in range(n)]}
+
+def browse(n):
+    """A `/db/browse` response with n files in directories of 100 files."""
+    return [
+        {"name": "dir{}".format(d), "type": "FILE_INFO_TYPE_DIRECTORY",
+         "children": [
+             {"name": "file{}".format(f), "type": "FILE_INFO_TYPE_FILE",
+              "size": 1024, "modTime": "2020-05-19T12:34:56-07:00"}
+             for f in range(d * 100, min(n, (d + 1) * 100))]}
+        for d in range((n + 99) // 100)]
@@ -68,6 +68,7 @@ meta = dict(
     include_package_data=True,
     entry_points={"console_scripts": ["yasync-cli = yasynccli.__main__:main"]},
     install_requires=["requests"],
+    extras_require={"fast": ["orjson"]},
     tests_require=["pytest"],
 )
 
@@ -0,0 +1,188 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Shared fixtures: a configurable fake Syncthing server.
+"""
+import json
+import time
+import pathlib
+import threading
+import socketserver
+import http.server
+import urllib.parse
+import pytest
+
+class Request:
+    """A request received by a FakeServer.
+
+    Attributes:
+    -----------
+        method: "GET" or "POST".
+        path: the full path, including the query string.
+        endpoint: the path without "/rest" and the query string.
+        query: a list of (key, value) pairs from the query string.
+        params: a dict of the query string; the last value wins.
+        headers: the request headers.
+        body: the request body in bytes.
+        client: the client's address.
+    """
+
+    def __init__(self, handler, body):
+        url = urllib.parse.urlparse(handler.path)
+        self.method = handler.command
+        self.path = handler.path
+        self.endpoint = url.path[len("/rest"):] if url.path.startswith("/rest") else url.path
+        self.query = urllib.parse.parse_qsl(url.query)
+        self.params = dict(self.query)
+        self.headers = handler.headers
+        self.body = body
+        self.client = handler.client_address
+
+    def json(self):
+        """Return the decoded JSON body."""
+        return json.loads(self.body)
+
+    def echo(self):
+        """Return a dict describing this request, the default response."""
+        return {
+            "method": self.method, "path": self.path, "host": self.headers["Host"],
+            "apikey": self.headers["X-API-KEY"], "body": self.body.decode()}
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Answer requests with the routes of the server's FakeServer."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def _reply(self):
+        fake = self.server.fake
+        request = Request(self, self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+        with fake.lock:
+            fake.requests.append(request)
+            fake.active += 1
+            fake.peak = max(fake.peak, fake.active)
+
+        try:
+            if fake.delay:
+                time.sleep(fake.delay)
+            status, body = fake.respond(request)
+        finally:
+            with fake.lock:
+                fake.active -= 1
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A threading HTTP server on a Unix-domain socket."""
+    daemon_threads = True
+
+class FakeServer:
+    """A fake Syncthing server answering requests from configurable routes.
+
+    `routes` maps an endpoint (e.g., "/system/version") or a method and an
+    endpoint (e.g., "POST /system/config") to a response. A response is an
+    object sent as JSON, bytes sent as is, None for a 404, or a callable
+    taking a Request and returning one of these or a (status, response)
+    tuple. Endpoints without routes get `Request.echo()`.
+
+    All requests are kept in `requests`. `connections` counts the accepted
+    connections, and `peak` is the largest number of requests answered at
+    the same time. Every answer waits `delay` seconds first.
+
+    Args:
+    -----
+        unix: a str or Path; serve on this Unix-domain socket instead of a
+            random TCP port on 127.0.0.1.
+    """
+
+    def __init__(self, unix=None):
+        self.routes = {}
+        self.requests = []
+        self.delay = 0
+        self.connections = self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+        if unix is None:
+            self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+            self.address = "127.0.0.1:{}".format(self._server.server_address[1])
+        else:
+            self._server = _UnixServer(str(unix), _Handler)
+            self.address = "unix://{}".format(unix)
+
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def respond(self, request):
+        """Return the (status, body in bytes) answering a Request."""
+
+        response = self.routes.get(
+            "{} {}".format(request.method, request.endpoint),
+            self.routes.get(request.endpoint, Request.echo))
+
+        status = 200
+        if callable(response):
+            response = response(request)
+            if isinstance(response, tuple):
+                status, response = response
+
+        if response is None:
+            return 404, b"null"
+        if isinstance(response, bytes):
+            return status, response
+        return status, json.dumps(response).encode()
+
+    def write_config(self, folder, body="", name="config.xml", apikey="KEY"):
+        """Write a config file pointing to this server; return its path.
+
+        Args:
+        -----
+            folder: a str or Path; where to write the file.
+            body: a str of XML elements put before `<gui>`, e.g., folders.
+            name: the file name.
+            apikey: the API key in the config.
+        """
+
+        p = pathlib.Path(folder).joinpath(name)
+        p.write_text(
+            '<configuration version="30">{}'
+            '<gui><address>{}</address><apikey>{}</apikey></gui>'
+            '</configuration>'.format(body, self.address, apikey))
+        return p
+
+    def close(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def fake_server():
+    """Yield a FakeServer on a random TCP port."""
+    server = FakeServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def fake_unix_server(tmpdir):
+    """Yield a FakeServer on a Unix-domain socket."""
+    server = FakeServer(pathlib.Path(tmpdir).joinpath("st.sock"))
+    yield server
+    server.close()
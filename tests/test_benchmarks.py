@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Smoke tests of the benchmark suite.
+"""
+import sys
+import json
+import pathlib
+
+# import target modules
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root.joinpath("benchmarks")))
+import bench as module
+import synthetic
+from yasynccli.config import SyncthingConfig
+
+def test_synthetic(tmpdir):
+    """Test synthetic configs are parsed as described."""
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    expected = synthetic.write_config(p, 12, 3, tmpdir)
+    config = SyncthingConfig(p)
+    assert len(config.folders) == 12
+    assert {item["id"] for item in config.folders.values()} == \
+        {folder["id"] for folder in expected["folders"]}
+
+def test_run(tmpdir):
+    """Test all cases run at a tiny scale and regressions are detected."""
+    out = pathlib.Path(tmpdir).joinpath("results.json")
+    assert module.main(["--scales", "3", "--repeat", "1", "--json", str(out)]) == 0
+
+    results = json.loads(out.read_text())
+    assert [item["case"] for item in results] == [
+        "config", "scan-resolve", "log-format", "check", "get-log", "get-browse"]
+
+    slower = [dict(item, seconds=item["seconds"]*3) for item in results]
+    assert len(module.compare(slower, results, 1.5)) == len(results)
+    assert module.compare(results, slower, 1.5) == []
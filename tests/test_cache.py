@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test the on-disk response cache.
+"""
+import sys
+import time
+import pathlib
+import pytest
+
+# import target modules
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import cache as module
+from yasynccli import session
+
+@pytest.fixture
+def config(tmpdir, fake_server):
+    """Return the path to a config of a fake server counting requests."""
+    fake_server.routes["/system/config"] = lambda request: {"count": len(fake_server.requests)}
+    return fake_server.write_config(tmpdir)
+
+def test_ttl(tmpdir):
+    """Test expired and non-cacheable entries."""
+    cache = module.ResponseCache(pathlib.Path(tmpdir).joinpath("r.sqlite"), {"/system/version": 0.2})
+    assert cache.ttl("/system/log") == 0
+    cache.put("/system/version", "v", 200, {"a": "b"}, b"1")
+    assert cache.get("v") == (200, {"a": "b"}, b"1")
+    time.sleep(0.3)
+    assert cache.get("v") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_eviction(tmpdir):
+    """Test least recently used entries are evicted first."""
+    cache = module.ResponseCache(pathlib.Path(tmpdir).joinpath("r.sqlite"), max_bytes=10)
+    cache.put("/svc/lang", "a", 200, {}, b"1234")
+    cache.put("/svc/lang", "b", 200, {}, b"1234")
+    cache.get("a")
+    cache.put("/svc/lang", "c", 200, {}, b"1234")
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+def test_invalidate(tmpdir):
+    """Test POST endpoints invalidate related GET endpoints."""
+    cache = module.ResponseCache(pathlib.Path(tmpdir).joinpath("r.sqlite"))
+    cache.put("/system/config", "a", 200, {}, b"1")
+    cache.put("/system/version", "b", 200, {}, b"1")
+    cache.invalidate("/db/scan")
+    assert cache.stats()["entries"] == 2
+    cache.invalidate("/system/config")
+    assert cache.get("a") is None and cache.get("b") is not None
+    cache.invalidate("/system/restart")
+    assert cache.stats()["entries"] == 0
+
+def test_shared(tmpdir):
+    """Test the counters are shared by all instances of the same file."""
+    p = pathlib.Path(tmpdir).joinpath("r.sqlite")
+    module.ResponseCache(p).put("/svc/lang", "a", 200, {}, b"12")
+    other = module.ResponseCache(p)
+    assert other.get("a") == (200, {}, b"12")
+    assert other.stats() == {"hits": 1, "misses": 0, "entries": 1, "bytes": 2}
+    other.clear()
+    assert other.stats() == {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+    assert p.stat().st_mode & 0o777 == 0o600
+
+def test_unusable(tmpdir):
+    """Test an unusable cache file is opened lazily and then ignored."""
+    p = pathlib.Path(tmpdir).joinpath("file")
+    p.write_text("not a directory")
+
+    cache = module.ResponseCache(p.joinpath("r.sqlite"))
+    assert cache.get("a") is None
+    cache.put("/svc/lang", "a", 200, {}, b"12")
+    cache.invalidate("/system/restart")
+    assert cache.get("a") is None
+
+    with pytest.raises(RuntimeError):
+        cache.stats()
+
+    # nothing is created until the first use
+    p = pathlib.Path(tmpdir).joinpath("lazy", "r.sqlite")
+    module.ResponseCache(p).close()
+    assert not p.parent.exists()
+
+def test_session(config, tmpdir, fake_server):
+    """Test SyncthingSession serves cached responses and invalidates them."""
+    cache = module.ResponseCache(pathlib.Path(tmpdir).joinpath("r.sqlite"))
+    syncthing = session.SyncthingSession(config, response_cache=cache)
+
+    first = syncthing.get("system", "config")
+    second = syncthing.get("system", "config")
+    assert second.json() == first.json()
+    assert getattr(second, "from_cache", False)
+    assert len(fake_server.requests) == 1
+
+    # different query strings, bypassing, and non-cacheable endpoints
+    syncthing.get("stats", "folder", params={"a": 1})
+    syncthing.get("stats", "folder", params={"a": 2})
+    syncthing.get("system", "config", cache=False)
+    syncthing.get("system", "log")
+    syncthing.get("system", "log")
+    assert len(fake_server.requests) == 6
+
+    syncthing.post("system", "config", json={})
+    assert syncthing.get("system", "config").json()["count"] == 8
@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test comparing config files with running servers.
+"""
+import sys
+import pathlib
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import checker as module
+from yasynccli import formatters
+from yasynccli.config import SyncthingConfig
+
+def get_config(tmpdir):
+    """Write and parse a config file with two folders and two devices."""
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<folder id="a" label="A" path="~/a/"><device id="X"></device><device id="Y"></device></folder>'
+        '<folder id="b" label="B" path="/tmp/b"><device id="X"></device></folder>'
+        '<device id="X" name="x"></device><device id="Y" name="y"></device>'
+        '<gui><address>127.0.0.1:8384</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+    return SyncthingConfig(p)
+
+def test_same(tmpdir):
+    """Test no differences are reported for the same configuration."""
+    live = {
+        "folders": [
+            {"id": "b", "label": "B", "path": "/tmp/b", "devices": [{"deviceID": "X"}]},
+            {"id": "a", "label": "A", "path": "~/a", "devices": [
+                {"deviceID": "Y"}, {"deviceID": "X"}]}],
+        "devices": [{"deviceID": "Y", "name": "y"}, {"deviceID": "X", "name": "x"}]}
+    assert module.compare(get_config(tmpdir), live) == []
+    assert formatters.check([]) == ""
+
+def test_all_differences(tmpdir):
+    """Test every difference is reported in one run."""
+    live = {
+        "folders": [
+            {"id": "a", "label": "AA", "path": "/elsewhere/a", "devices": [
+                {"deviceID": "X"}, {"deviceID": "Z"}]},
+            {"id": "c", "label": "C", "path": "/tmp/c", "devices": []}],
+        "devices": [{"deviceID": "X", "name": "xx"}, {"deviceID": "Z", "name": "z"}]}
+
+    diffs = module.compare(get_config(tmpdir), live)
+    assert [(diff["kind"], diff["id"], diff["field"]) for diff in diffs] == [
+        ("folder", "b", None), ("folder", "c", None), ("folder", "a", "label"),
+        ("folder", "a", "path"), ("folder", "a", "devices"), ("device", "Y", None),
+        ("device", "Z", None), ("device", "X", "name")]
+    assert diffs[4]["config"] == ["Y"] and diffs[4]["server"] == ["Z"]
+
+    lines = formatters.check(diffs).splitlines()
+    assert len(lines) == len(diffs)
+    assert lines[0] == "Folder b: only in the config file (/tmp/b)"
+    assert lines[1] == "Folder c: only in the server (/tmp/c)"
+    assert lines[2] == "Folder a: label mismatch: 'A' (config file) v.s. 'AA' (server)"
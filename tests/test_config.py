@@ -14,11 +14,11 @@ import importlib
 import requests
 import pytest
 
-# import target module
-target = pathlib.Path(__file__).resolve().parents[1].joinpath("yasynccli", "session.py")
-spec = importlib.util.spec_from_file_location("session", target)
-module = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(module)
+# import target modules; session.py imports config.py relatively, so the
+# package itself is imported from the repository instead of a single file
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+module = importlib.import_module("yasynccli.session")
+config_module = importlib.import_module("yasynccli.config")
 
 def create_fake_config(folder):
     """Create a bare-minumum fake config.xml."""
@@ -180,3 +180,86 @@ def test_SyncthingSession_9(tmpdir):
         config.put("a", "b", timeout=1)
         config.patch("a", "b", timeout=1)
         config.delete("a", "b", timeout=1)
+
+def test_SyncthingSession_10(tmpdir):
+    """Test finding the deepest monitored folder of a path."""
+    p = create_fake_config(tmpdir)
+    config = module.SyncthingSession(p)
+    home = pathlib.Path.home().resolve()
+
+    assert config.resolve_folder(home) == ("abcde-12345", None)
+    assert config.resolve_folder(home.joinpath("a", "b.txt")) == ("abcde-12345", "a/b.txt")
+    assert config.resolve_folder(home.parent) == ("cvbnm-q1w2e", None)
+    assert config.resolve_folder(str(home.parent.joinpath("zz"))) == ("cvbnm-q1w2e", "zz")
+
+def test_SyncthingSession_11(tmpdir):
+    """Test folders are read-only views."""
+    p = create_fake_config(tmpdir)
+    config = module.SyncthingSession(p)
+    home = pathlib.Path.home().resolve()
+
+    assert config.folders[home]["id"] == "abcde-12345"
+
+    with pytest.raises(TypeError):
+        config.folders[home] = {}
+
+    with pytest.raises(TypeError):
+        config.folders[home]["id"] = "abc"
+
+def test_SyncthingSession_12(tmpdir, monkeypatch):
+    """Test parsed-config cache."""
+    p = create_fake_config(tmpdir)
+    cache = pathlib.Path(tmpdir).joinpath("cache")
+
+    config = module.SyncthingSession(p, cache=cache)
+    assert config.apikey == "bMskdeWP293r7f8v3hdsTqwef"
+    assert len(list(cache.iterdir())) == 1
+
+    # a valid cache skips parsing completely
+    def _fail(path):
+        raise AssertionError("config.xml parsed")
+
+    parse = config_module._parse_config
+    monkeypatch.setattr(config_module, "_parse_config", _fail)
+    config = module.SyncthingSession(p, cache=cache)
+    assert config.url == "http://192.168.1.1:9783"
+    assert config.apikey == "bMskdeWP293r7f8v3hdsTqwef"
+    assert config.resolve_folder(pathlib.Path.home().resolve()) == ("abcde-12345", None)
+
+    # a modified config file invalidates the cache
+    content = p.read_text().replace("bMskdeWP293r7f8v3hdsTqwef", "anotherapikey")
+    p.write_text(content)
+    with pytest.raises(AssertionError):
+        module.SyncthingSession(p, cache=cache)
+
+    monkeypatch.setattr(config_module, "_parse_config", parse)
+    config = module.SyncthingSession(p, cache=cache)
+    assert config.apikey == "anotherapikey"
+
+def test_SyncthingSession_13(tmpdir):
+    """Test config parsing skips unrelated elements."""
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<folder id="a" label="A" path="/tmp/a"><device id="X"></device></folder>'
+        '<device id="X" name="x"><address>dynamic</address></device>'
+        '<gui><address>127.0.0.1:8384</address><apikey>KEY</apikey></gui>'
+        '<options><listenAddress>default</listenAddress></options>'
+        '</configuration>')
+
+    info = config_module._parse_config(p)
+    assert info["gui"]["address"] == "127.0.0.1:8384"
+    assert info["gui"]["apiKey"] == "KEY"
+    assert info["options"]["listenAddresses"] == ["default"]
+    assert [(f["id"], f["label"], f["path"], f["devices"]) for f in info["folders"]] == [
+        ("a", "A", "/tmp/a", [{"deviceID": "X"}])]
+    assert "resolvedPath" not in info["folders"][0] # resolved by the model on first use
+    assert [(d["deviceID"], d["name"], d["addresses"]) for d in info["devices"]] == [("X", "x", ["dynamic"])]
+
+def test_socket_path():
+    """Test different configs get different sockets."""
+    p1 = config_module.socket_path("/a/config.xml", None, None, "/tmp")
+    p2 = config_module.socket_path("/a/config.xml", "127.0.0.1:1234", None, "/tmp")
+    assert p1.parent == pathlib.Path("/tmp")
+    assert p1 != p2
+    assert p1 == config_module.socket_path("/a/config.xml", None, None, "/tmp")
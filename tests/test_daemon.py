@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test the client daemon and DaemonSession.
+"""
+import sys
+import json
+import time
+import pathlib
+import subprocess
+import requests
+import pytest
+
+# import target module
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root))
+from yasynccli import daemon as module
+
+@pytest.fixture
+def daemon(tmpdir, fake_server):
+    """Start a daemon for a fake server; yield (socket path, config path)."""
+
+    fake_server.routes["/db/file"] = None
+    config = fake_server.write_config(
+        tmpdir, '<folder id="a" label="A" path="{}"></folder>'.format(tmpdir))
+
+    sock = pathlib.Path(tmpdir).joinpath("d.sock")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "yasynccli", "--config", str(config),
+         "--socket", str(sock), "--cache-dir", str(tmpdir), "serve"], cwd=root)
+
+    for _ in range(100):
+        if sock.exists():
+            break
+        time.sleep(0.05)
+
+    yield sock, config
+
+    proc.terminate()
+    proc.wait(10)
+    assert not sock.exists()
+
+def test_connect_no_daemon(tmpdir):
+    """Test connecting to a socket without a daemon."""
+    sock = pathlib.Path(tmpdir).joinpath("none.sock")
+    assert module.DaemonSession.connect(sock, "config.xml") is None
+
+def test_forward(daemon):
+    """Test forwarding GET/POST requests through the daemon."""
+    sock, config = daemon
+
+    with module.DaemonSession.connect(sock, config) as session:
+        response = session.get("system", "version", params={"a": "1"}, timeout=5)
+        assert response.status_code == 200
+        assert response.json()["method"] == "GET"
+        assert response.json()["path"] == "/rest/system/version?a=1"
+        assert response.json()["apikey"] == "KEY"
+
+        response = session.post("db", "scan", params=[("sub", "x"), ("sub", "y")], timeout=5)
+        assert response.json()["path"] == "/rest/db/scan?sub=x&sub=y"
+
+        response = session.get("db", "file", timeout=5)
+        with pytest.raises(requests.exceptions.HTTPError):
+            response.raise_for_status()
+
+        with pytest.raises(RuntimeError):
+            session.get("dbs", "rescan")
+
+def test_bad_request(daemon):
+    """Test the daemon replies errors of bad requests and keeps the connection."""
+    sock, config = daemon
+
+    with module.DaemonSession.connect(sock, config) as session:
+        session._file.write(b'{"method": "GET"}\n')
+        session._file.flush()
+        assert json.loads(session._file.readline())["error"] == "KeyError"
+
+        response = session.get("system", "version", timeout=5)
+        assert response.status_code == 200
+
+    assert module._exception("ConnectTimeout") is requests.exceptions.ConnectTimeout
+    assert module._exception("ConnectionError") is requests.exceptions.ConnectionError
+    assert module._exception("KeyError") is KeyError
+    assert module._exception("NoSuchError") is RuntimeError
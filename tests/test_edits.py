@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test configuration edits.
+"""
+import io
+import sys
+import pathlib
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import edits as module
+
+config = {
+    "folders": [
+        {"id": "a", "label": "A", "paused": False, "devices": [{"deviceID": "X"}]},
+        {"id": "b", "label": "B", "paused": False, "devices": []}],
+    "devices": [{"deviceID": "X", "paused": False}],
+    "options": {"relaysEnabled": True, "listenAddresses": ["default"]}}
+
+def test_apply():
+    """Test all ops are applied to a copy."""
+    new = module.apply(config, [
+        {"op": "set", "path": "options.relaysEnabled", "value": False},
+        {"op": "set", "path": "options.listenAddresses.0", "value": "tcp://:22000"},
+        {"op": "set", "path": "folders[id=b].label", "value": "BB"},
+        {"op": "unset", "path": "folders[1].paused"},
+        {"op": "pause", "folder": "a"},
+        {"op": "pause", "device": "X"},
+        {"op": "add-device", "folder": "b", "device": "X"},
+        {"op": "add-device", "folder": "b", "device": "X"},
+        {"op": "remove-device", "folder": "a", "device": "X"}])
+
+    assert config["options"]["relaysEnabled"] # unchanged
+    assert new["options"] == {"relaysEnabled": False, "listenAddresses": ["tcp://:22000"]}
+    assert new["folders"] == [
+        {"id": "a", "label": "A", "paused": True, "devices": []},
+        {"id": "b", "label": "BB", "devices": [{"deviceID": "X", "introducedBy": ""}]}]
+    assert new["devices"][0]["paused"]
+
+    lines = module.diff(config, new)
+    assert lines[:2] == ["--- server", "+++ edited"]
+    assert '-    "relaysEnabled": true' in lines
+    assert module.diff(config, module.apply(config, [])) == []
+
+@pytest.mark.parametrize("edit", [
+    {"op": "set", "path": "folders[id=c].label", "value": 1},
+    {"op": "set", "path": "options.listenAddresses.3", "value": 1},
+    {"op": "unset", "path": "options.missing"},
+    {"op": "pause", "folder": "c"},
+    {"op": "set", "path": "options"},
+    {"op": "rename"}])
+def test_errors(edit):
+    """Test invalid edits raise RuntimeError naming the edit."""
+    with pytest.raises(RuntimeError, match="Edit #1"):
+        module.apply(config, [edit])
+
+def test_read():
+    """Test reading a JSON array or one edit per line."""
+    assert module.read(io.StringIO('[{"op": "pause"}]')) == [{"op": "pause"}]
+    assert module.read(io.StringIO('{"op": "pause"}\n\n{"op": "resume"}\n')) == [
+        {"op": "pause"}, {"op": "resume"}]
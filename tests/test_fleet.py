@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test running subcommands against many servers.
+"""
+import sys
+import json
+import time
+import socket
+import pathlib
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import fleet as module
+from yasynccli import __main__ as main
+from yasynccli.config import SyncthingConfig
+
+def test_read_inventory(tmpdir):
+    """Test the INI, JSON, and TOML inventories."""
+    root = pathlib.Path(tmpdir)
+
+    root.joinpath("hosts.ini").write_text(
+        "[a]\nconfig = a.xml\n\n[b]\nurl = 127.0.0.1:1\napi-key = KEY\ntimeout = 5\n")
+    hosts = module.read_inventory(root.joinpath("hosts.ini"), 30.)
+    assert hosts == [
+        {"name": "a", "config": root.resolve().joinpath("a.xml"), "url": None,
+         "apikey": None, "timeout": 30.},
+        {"name": "b", "config": None, "url": "127.0.0.1:1", "apikey": "KEY", "timeout": 5.}]
+
+    root.joinpath("hosts.json").write_text(json.dumps(
+        ["/x/a.xml", {"url": "127.0.0.1:1", "apikey": "KEY"}]))
+    hosts = module.read_inventory(root.joinpath("hosts.json"))
+    assert [host["name"] for host in hosts] == ["/x/a.xml", "127.0.0.1:1"]
+    assert hosts[1]["timeout"] == 60.
+
+    if module.tomllib is not None:
+        root.joinpath("hosts.toml").write_text('[a]\nconfig = "/x/a.xml"\ntimeout = 2\n')
+        assert module.read_inventory(root.joinpath("hosts.toml"))[0]["timeout"] == 2.
+
+    root.joinpath("bad.json").write_text(json.dumps(["/x/a.xml", "/x/a.xml"]))
+    with pytest.raises(RuntimeError):
+        module.read_inventory(root.joinpath("bad.json"))
+
+def test_run(tmpdir, capsys, fake_server):
+    """Test slow and unreachable hosts do not hold up the others."""
+    fake_server.routes["/system/version"] = {"version": "v1.0.0"}
+
+    hung = socket.socket() # accepts connections but never answers
+    hung.bind(("127.0.0.1", 0))
+    hung.listen(8)
+
+    closed = socket.socket() # nothing listens
+    closed.bind(("127.0.0.1", 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    config = pathlib.Path(tmpdir).joinpath("config.xml")
+    config.write_text(
+        '<configuration version="30">'
+        '<gui><address>127.0.0.1:1</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+
+    inventory = pathlib.Path(tmpdir).joinpath("hosts.ini")
+    inventory.write_text("".join(
+        "[{}]\nurl = {}\n".format(name, url) for name, url in [
+            ("hung", "127.0.0.1:{}".format(hung.getsockname()[1])), ("ok1", fake_server.address),
+            ("closed", "127.0.0.1:{}".format(closed_port)), ("ok2", fake_server.address)]))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--output", "ndjson",
+        "--fleet", str(inventory), "--fleet-jobs", "2", "--host-timeout", "0.5",
+        "get", "/system/version"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    code = None
+    start = time.perf_counter()
+    try:
+        module.run(args)
+    except SystemExit as err:
+        code = err.code
+    elapsed = time.perf_counter() - start
+    hung.close()
+
+    assert code == 1
+    assert elapsed < 2.
+
+    captured = capsys.readouterr()
+    results = {line["host"]: line for line in map(json.loads, captured.out.splitlines())}
+    assert list(results)[-1] == "hung" # the others are not held up
+    assert results["ok1"]["output"] == results["ok2"]["output"] == {"version": "v1.0.0"}
+    assert results["ok1"]["status"] == "ok"
+    assert results["closed"]["status"] == "error" and results["closed"]["errors"]
+    assert results["hung"]["status"] in ("timeout", "error")
+    assert "2 of 4 hosts failed" in captured.err
+
+def test_run_one_worker(tmpdir, capsys, fake_server):
+    """Test a single worker goes on after hosts time out."""
+    fake_server.routes["/system/version"] = {"version": "v1.0.0"}
+
+    hung = socket.socket() # accepts connections but never answers
+    hung.bind(("127.0.0.1", 0))
+    hung.listen(8)
+
+    config = pathlib.Path(tmpdir).joinpath("config.xml")
+    config.write_text(
+        '<configuration version="30">'
+        '<gui><address>127.0.0.1:1</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+
+    inventory = pathlib.Path(tmpdir).joinpath("hosts.json")
+    inventory.write_text(json.dumps({
+        "hung1": {"url": "127.0.0.1:{}".format(hung.getsockname()[1])},
+        "hung2": {"url": "127.0.0.1:{}".format(hung.getsockname()[1])},
+        "ok": {"url": fake_server.address}}))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--output", "ndjson",
+        "--fleet", str(inventory), "--fleet-jobs", "1", "--host-timeout", "0.3",
+        "get", "/system/version"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    with pytest.raises(SystemExit):
+        module.run(args)
+    hung.close()
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [result["host"] for result in results] == ["hung1", "hung2", "ok"]
+    assert results[2]["status"] == "ok"
+
+def test_run_url_only(tmpdir, capsys, fake_server):
+    """Test hosts with a URL and an API key do not read the local config file."""
+    fake_server.routes.update({
+        "/system/config": {
+            "folders": [{"id": "f", "label": "F", "path": "/remote/f",
+                         "devices": [{"deviceID": "ME"}, {"deviceID": "A"}]}],
+            "devices": [{"deviceID": "ME", "name": "me"}, {"deviceID": "A", "name": "a"}]},
+        "/system/status": {"myID": "ME"},
+        "/db/status": {"state": "idle", "globalBytes": 400, "needBytes": 100},
+        "/db/completion": {"completion": 50, "globalBytes": 200, "needBytes": 100}})
+
+    inventory = pathlib.Path(tmpdir).joinpath("hosts.json")
+    inventory.write_text(json.dumps({"remote": {"url": fake_server.address, "apikey": "KEY"}}))
+
+    def run(cmd):
+        argv = [
+            "--config", str(pathlib.Path(tmpdir).joinpath("missing.xml")), "--cache-dir",
+            str(tmpdir), "--output", "ndjson", "--fleet", str(inventory), cmd]
+        args = main.process_args(main.get_parser().parse_args(argv))
+        try:
+            module.run(args)
+        except SystemExit:
+            pass
+        return json.loads(capsys.readouterr().out)
+
+    result = run("status")
+    assert result["status"] == "ok"
+    assert [folder["id"] for folder in result["output"]["folders"]] == ["f"]
+    assert result["output"]["devices"]["A"]["name"] == "a"
+    assert all(request.headers["X-API-KEY"] == "KEY" for request in fake_server.requests)
+
+    result = run("check")
+    assert result["status"] == "error" and "no config file" in result["errors"]
+
+    with pytest.raises(RuntimeError):
+        SyncthingConfig(None, fake_server.address)
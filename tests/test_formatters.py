@@ -0,0 +1,30 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test formatters.
+"""
+import sys
+import types
+import pathlib
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import formatters as module
+
+def test_log():
+    """Test the log formatter yields one line per message."""
+    data = {"messages": [
+        {"when": "2020-05-19T12:34:56.123456789-07:00", "message": "abc"},
+        {"when": "2020-05-19T12:34:57Z", "message": "def"}]}
+
+    lines = module.log(data)
+    assert isinstance(lines, types.GeneratorType)
+    assert list(lines) == [
+        "2020-05-19 12:34:56-07:00: abc\n", "2020-05-19 12:34:57Z: def\n"]
+
+    assert list(module.log({"messages": None})) == []
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test instrumentation hooks and the profiler.
+"""
+import sys
+import json
+import pathlib
+import subprocess
+import pytest
+
+# import target modules
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root))
+from yasynccli import instrument as module
+from yasynccli import session
+from yasynccli import formatters
+
+@pytest.fixture
+def events():
+    """Register a callback; yield the list of events it receives."""
+    results = []
+    callback = lambda phase, seconds, info: results.append((phase, seconds, info))
+    module.register(callback)
+    yield results
+    module.unregister(callback)
+
+def test_wrap():
+    """Test timing functions and generator functions."""
+
+    @module.wrap("a", name="f")
+    def func(x):
+        return x + 1
+
+    @module.wrap("b")
+    def gen(n):
+        yield from range(n)
+        return "done"
+
+    # nothing is reported without callbacks
+    assert func(1) == 2
+    assert not module.enabled()
+
+    events = []
+    callback = lambda phase, seconds, info: events.append((phase, info))
+    module.register(callback)
+    assert func(1) == 2
+    assert list(gen(3)) == [0, 1, 2]
+    module.unregister(callback)
+
+    assert events == [("a", {"name": "f"}), ("b", {})]
+
+def test_session(events, tmpdir, fake_server):
+    """Test the phases of a request to a fake server."""
+
+    fake_server.routes["/system/log"] = {"messages": [
+        {"when": "2020-05-19T12:34:56.123-07:00", "message": "hi"}]}
+    p = fake_server.write_config(tmpdir)
+
+    profiler = module.Profiler()
+    module.register(profiler)
+    response = session.SyncthingSession(p).get("system", "log")
+    list(formatters.log(response.json()))
+    module.unregister(profiler)
+
+    phases = [phase for phase, _, _ in events]
+    assert phases == ["config", "session", "request", "download", "json", "format"]
+    assert events[2][2] == {
+        "method": "GET", "endpoint": "/system/log", "status": 200, "cached": False}
+    assert events[-1][2] == {"name": "log"}
+
+    summary = profiler.to_dict()
+    assert summary["phases"]["request"]["count"] == 1
+    assert summary["requests"][0]["endpoint"] == "/system/log"
+    assert profiler.report().splitlines()[1].startswith("config")
+
+def test_cli(tmpdir):
+    """Test `--profile-json` writes a report."""
+
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<gui><address>127.0.0.1:8384</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+    out = pathlib.Path(tmpdir).joinpath("profile.json")
+
+    subprocess.run(
+        [sys.executable, "-m", "yasynccli", "--config", str(p), "--cache-dir",
+         str(tmpdir), "--profile-json", str(out), "show"],
+        cwd=root, check=True, capture_output=True)
+
+    summary = json.loads(out.read_text())
+    assert set(summary["phases"]) == {"import", "config"}
+    assert summary["total"] >= summary["phases"]["import"]["seconds"]
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test incremental JSON parsing.
+"""
+import sys
+import json
+import pathlib
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import jsonstream as module
+
+def chunked(obj, size):
+    """Serialize an object and split it into chunks of `size` bytes."""
+    data = json.dumps(obj, indent=1, ensure_ascii=False).encode("utf-8")
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+documents = [
+    {"a": [1, -2.5, 3e10, True, False, None], "b": {"c": "d\"e\\\\fé中"}, "e": []},
+    [{"x": {}}, [], "😀 \\u escapes \n\t", 12345678901234567890, 0],
+    "string", 42, None, {}, []]
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize("obj", documents)
+def test_iterparse(obj, size):
+    """Test building objects from events of arbitrarily chunked documents."""
+    events = module.iterparse(chunked(obj, size))
+    assert module.build(*next(events), events) == obj
+    assert list(events) == []
+
+def test_iterparse_invalid():
+    """Test invalid documents."""
+    with pytest.raises(ValueError):
+        list(module.iterparse([b'{"a": tru']))
+
+    with pytest.raises(ValueError):
+        list(module.iterparse([b'{"a": "b']))
+
+def test_records_browse():
+    """Test flattening both formats of /db/browse."""
+    modern = [
+        {"name": "dir", "type": "FILE_INFO_TYPE_DIRECTORY", "children": [
+            {"name": "f1", "type": "FILE_INFO_TYPE_FILE", "size": 1},
+            {"name": "sub", "type": "FILE_INFO_TYPE_DIRECTORY", "children": []}]},
+        {"name": "f2", "type": "FILE_INFO_TYPE_FILE", "size": 2}]
+
+    results = list(module.records(module.iterparse(chunked(modern, 5)), "/db/browse"))
+    assert results == [
+        {"path": "dir", "type": "FILE_INFO_TYPE_DIRECTORY"},
+        {"path": "dir/f1", "type": "FILE_INFO_TYPE_FILE", "size": 1},
+        {"path": "dir/sub", "type": "FILE_INFO_TYPE_DIRECTORY"},
+        {"path": "f2", "type": "FILE_INFO_TYPE_FILE", "size": 2}]
+
+    legacy = {"dir": {"f1": ["2020-01-01T00:00:00Z", 1], "sub": {}}, "f2": ["t", 2]}
+    results = list(module.records(module.iterparse(chunked(legacy, 5)), "db/browse", "a/"))
+    assert results == [
+        {"path": "a/dir", "type": "dir"},
+        {"path": "a/dir/f1", "type": "file", "modTime": "2020-01-01T00:00:00Z", "size": 1},
+        {"path": "a/dir/sub", "type": "dir"},
+        {"path": "a/f2", "type": "file", "modTime": "t", "size": 2}]
+
+def test_records_need():
+    """Test records of /db/need and other endpoints."""
+    need = {
+        "progress": [{"name": "a"}], "queued": [], "rest": [{"name": "b"}, {"name": "c"}],
+        "page": 1, "perpage": 100}
+    results = list(module.records(module.iterparse(chunked(need, 3)), "/db/need"))
+    assert results == [
+        {"name": "a", "section": "progress"}, {"name": "b", "section": "rest"},
+        {"name": "c", "section": "rest"}]
+
+    results = list(module.records(module.iterparse(chunked({"x": [1], "y": 2}, 3)), "/system/status"))
+    assert results == [{"key": "x", "value": [1]}, {"key": "y", "value": 2}]
+
+    results = list(module.records(module.iterparse(chunked([1, {"a": 2}], 3)), "/events"))
+    assert results == [1, {"a": 2}]
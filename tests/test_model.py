@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test the config model.
+"""
+import sys
+import pathlib
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import model as module
+
+DATA = {
+    "gui": {"address": "127.0.0.1:8384", "apiKey": "key", "useTLS": True},
+    "options": {"listenAddresses": ["tcp://0.0.0.0:22000"], "relaysEnabled": False},
+    "folders": [
+        {"id": "a", "label": "Docs", "path": "/a", "devices": [{"deviceID": "D1"}]},
+        {"id": "b", "label": "Docs", "path": "/b", "paused": True,
+         "devices": [{"deviceID": "D1"}, {"deviceID": "D2"}]},
+        {"id": "c", "path": "/c"}],
+    "devices": [
+        {"deviceID": "D1", "name": "laptop", "addresses": ["dynamic"]},
+        {"deviceID": "D2", "name": "phone", "introducer": True}]}
+
+def test_records():
+    """Test fields, defaults, and read-only records."""
+    config = module.ConfigModel.from_json(DATA)
+
+    assert config.gui == module.Gui(
+        address="127.0.0.1:8384", apikey="key", tls=True, enabled=True)
+    assert config.options.listen_addresses == ("tcp://0.0.0.0:22000",)
+    assert not config.options.relays and config.options.global_announce
+
+    folder = config.folders[1]
+    assert (folder.id, folder.label, folder.paused, folder.devices) == ("b", "Docs", True, ("D1", "D2"))
+    assert folder["path"] == "/b" and folder.get("nope", 1) == 1
+    assert folder.resolved is None
+    assert config.folders[2].label == "" and config.folders[2].type == "sendreceive"
+    assert config.devices[1].introducer and config.devices[0].addresses == ("dynamic",)
+
+    with pytest.raises(AttributeError):
+        folder.label = "other"
+    with pytest.raises(TypeError):
+        folder["label"] = "other"
+    with pytest.raises(KeyError):
+        folder["nope"] # pylint: disable=pointless-statement
+    with pytest.raises(AttributeError):
+        config.folders = ()
+
+    assert len({folder, module.Folder.from_json(DATA["folders"][1])}) == 1
+
+def test_indexes(tmpdir):
+    """Test the lazily built indexes."""
+    config = module.ConfigModel.from_json(DATA)
+
+    assert list(config.folders_by_id) == ["a", "b", "c"]
+    assert config.folders_by_id is config.folders_by_id
+    assert [f.id for f in config.folders_by_label["Docs"]] == ["a", "b"]
+    assert [f.id for f in config.folders_by_device["D1"]] == ["a", "b"]
+    assert [f.id for f in config.folders_by_device["D2"]] == ["b"]
+    assert config.devices_by_id["D2"].name == "phone"
+    assert not config.folders_by_path # paths are not resolved
+
+    with pytest.raises(TypeError):
+        config.devices_by_id["D3"] = None
+
+    data = dict(DATA, folders=[{"id": "a", "path": str(tmpdir)}])
+    config = module.ConfigModel.from_json(data, resolve=True)
+    assert config.folders[0]._resolved is True # not resolved until used
+    assert config.folders_by_path[pathlib.Path(tmpdir).resolve()].id == "a"
+    assert config.folders[0]["resolved"] == pathlib.Path(tmpdir).resolve()
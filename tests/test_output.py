@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test output formats.
+"""
+import io
+import sys
+import json
+import pathlib
+import pytest
+
+# import target modules
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import output as module
+from yasynccli import __main__ as main
+
+@pytest.mark.parametrize("mode", module.MODES)
+def test_records(mode):
+    """Test records in each output format."""
+    stream = io.StringIO()
+    out = module.Writer(mode, stream)
+    for i in range(3):
+        out.record({"i": i, "s": "é"}, "record {}\n".format(i))
+    out.close()
+
+    text = stream.getvalue()
+    if mode == "pretty":
+        assert text == "record 0\nrecord 1\nrecord 2\n"
+    elif mode == "ndjson":
+        assert [json.loads(line)["i"] for line in text.splitlines()] == [0, 1, 2]
+    else:
+        assert [item["i"] for item in json.loads(text)] == [0, 1, 2]
+        assert (mode == "compact") == (len(text.splitlines()) == 1)
+        assert "é" in text
+
+@pytest.mark.parametrize("mode", module.MODES)
+def test_document(mode):
+    """Test a whole result in each output format."""
+    stream = io.StringIO()
+    out = module.Writer(mode, stream)
+    out.document({"a": [1, 2]}, lambda: "text\n")
+    out.close(False)
+
+    text = stream.getvalue()
+    if mode == "pretty":
+        assert text == "text\n"
+    else:
+        assert json.loads(text) == {"a": [1, 2]}
+        assert (mode == "json") == ("\n  " in text)
+
+def test_show(tmpdir, capsys):
+    """Test `show` as JSON."""
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<folder id="a" label="A" path="/tmp/a"><device id="X"></device></folder>'
+        '<device id="X" name="x"></device>'
+        '<gui><address>127.0.0.1:8384</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+
+    argv = ["--config", str(p), "--cache-dir", str(tmpdir), "--output", "compact", "show"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+    args.func(args)
+
+    data = json.loads(capsys.readouterr().out)
+    assert data["url"] == "http://127.0.0.1:8384"
+    assert data["folders"] == [
+        {"path": str(pathlib.Path("/tmp/a").resolve()), "id": "a", "label": "A", "devices": ["X"]}]
+    assert data["devices"] == [{"id": "X", "name": "x"}]
@@ -0,0 +1,28 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test helpers of paths.
+"""
+import sys
+import pathlib
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import paths as module
+
+def test_drop_nested():
+    """Test removing paths whose ancestors are also in the batch."""
+    paths = [
+        pathlib.Path("/a/b/c"), pathlib.Path("/a/b"), pathlib.Path("/a/bc"),
+        pathlib.Path("/a/b/d/e"), pathlib.Path("/x"), pathlib.Path("/x/y"),
+        pathlib.Path("/a/bc")]
+    assert module.drop_nested(paths) == [
+        pathlib.Path("/a/b"), pathlib.Path("/a/bc"), pathlib.Path("/x")]
+
+    # "a-b" sorts between "a" and "a/c" as a str, but not by components
+    assert module.drop_nested(["a/c", "a-b", "a", "b/c", "b/c"]) == ["a", "a-b", "b/c"]
@@ -0,0 +1,62 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test snapshots of monitored folders.
+"""
+import os
+import sys
+import shutil
+import pathlib
+import concurrent.futures
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import snapshot as module
+from yasynccli import treediff
+
+def _refresh(snapshot, root, prefix=""):
+    """Refresh a snapshot with a walk of a local tree."""
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        return snapshot.refresh(treediff.walk(root, prefix, pool), prefix)
+
+def test_snapshot(tmpdir):
+    """Test finding changes against a snapshot."""
+    root = pathlib.Path(tmpdir).joinpath("folder")
+    for path in ["a/x.txt", "a/y.txt", "a-b.txt", "c/d/e.txt", "c/f.txt"]:
+        root.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        root.joinpath(path).write_text(path)
+
+    snapshot = module.Snapshot(pathlib.Path(tmpdir).joinpath("snapshot.sqlite"))
+    assert _refresh(snapshot, str(root)) is None # nothing to compare with
+    snapshot.commit()
+    assert _refresh(snapshot, str(root)) == []
+
+    # a modified file, a new directory, a removed directory, and a replaced file
+    root.joinpath("a", "x.txt").write_text("longer content")
+    root.joinpath("a", "new", "g").mkdir(parents=True)
+    root.joinpath("a", "new", "g", "h.txt").write_text("h")
+    shutil.rmtree(root.joinpath("c", "d"))
+    root.joinpath("a-b.txt").unlink()
+    root.joinpath("a-b.txt").write_text("a-b.txt")
+    os.utime(root.joinpath("a-b.txt"), ns=(10**18, 10**18))
+
+    changes = ["a/new", "a/x.txt", "a-b.txt", "c/d"]
+    assert _refresh(snapshot, str(root)) == changes
+
+    # uncommitted changes are dropped
+    snapshot.close()
+    snapshot = module.Snapshot(pathlib.Path(tmpdir).joinpath("snapshot.sqlite"))
+    assert _refresh(snapshot, str(root), "a") == ["a/new", "a/x.txt"]
+    assert _refresh(snapshot, str(root), "c") == ["c/d"]
+    snapshot.commit()
+
+    assert [entry[0] for entry in snapshot.entries("a")] == [
+        "a/new", "a/new/g", "a/new/g/h.txt", "a/x.txt", "a/y.txt"]
+    assert _refresh(snapshot, str(root), "a") == []
+    assert _refresh(snapshot, str(root)) == ["a-b.txt"]
+    snapshot.close()
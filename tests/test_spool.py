@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test the scan request queue.
+"""
+import sys
+import pathlib
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import spool as module
+
+def test_queue(tmpdir):
+    """Test adding, taking, and locking."""
+    queue = module.ScanQueue(pathlib.Path(tmpdir).joinpath("queue"))
+    other = module.ScanQueue(pathlib.Path(tmpdir).joinpath("queue"))
+
+    assert queue.empty()
+    queue.put("a", ["x/y"])
+    other.put("b", None)
+    assert not queue.empty() and queue.size() == 2
+    assert queue.take() == [("a", ["x/y"]), ("b", None)]
+    assert queue.empty()
+
+    assert queue.lock()
+    assert not other.lock()
+    queue.unlock()
+    assert other.lock()
+    other.unlock()
+
+    assert queue.load_state() == {"last": {}, "next": 0.}
+    queue.save_state({"a": 1.5}, 2.5)
+    assert other.load_state() == {"last": {"a": 1.5}, "next": 2.5}
+
+    # the state file of older versions
+    pathlib.Path(tmpdir).joinpath("queue", "state").write_text('{"a": 1.5}')
+    assert queue.load_state() == {"last": {"a": 1.5}, "next": 0.}
+
+def test_scheduler():
+    """Test merging requests, priorities, and limits."""
+    scheduler = module.Scheduler(10., 2., {"c": 95.})
+
+    scheduler.add("a", None)
+    scheduler.add("a", ["x"])
+    scheduler.add("b", ["x/y", "z"])
+    scheduler.add("b", ["x", "x-y"])
+    scheduler.add("c", ["w"])
+    assert scheduler.pending == {"a": None, "b": ["x", "x-y", "z"], "c": ["w"]}
+
+    # c is not due yet, and b has subpaths while a is a whole folder
+    assert scheduler.pop(100.) == ("b", ["x", "x-y", "z"], 0.)
+    scheduler.done("b", 100., 1)
+
+    # the global rate: one request per 0.5 seconds
+    assert scheduler.pop(100.25) == (None, None, 0.25)
+    assert scheduler.pop(100.5) == ("a", None, 0.)
+    scheduler.done("a", 100.5, 2)
+
+    scheduler.add("b", ["q"])
+    assert scheduler.pop(101.5) == (None, None, 3.5) # c is due at 105
+    assert scheduler.pop(105.) == ("c", ["w"], 0.)
+    scheduler.done("c", 105.)
+    assert scheduler.pop(110.) == ("b", ["q"], 0.)
+    assert scheduler.pop(200.) == (None, None, None)
@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Startup-time regression tests using `python -X importtime`.
+"""
+import sys
+import re
+import time
+import pathlib
+import subprocess
+import pytest
+
+# import target module
+root = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(root))
+from yasynccli import __main__ as module
+
+# modules that should only be imported by subcommands talking to the server
+heavy = ["requests", "urllib3", "chardet", "charset_normalizer", "idna", "orjson"]
+
+def importtime(*args):
+    """Run yasync-cli with `-X importtime` and return {module: cumulative us}."""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "yasynccli"] + list(args),
+        cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr.splitlines()[-1]
+
+    pattern = r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)$"
+    results = {}
+    for line in result.stderr.splitlines():
+        match = re.search(pattern, line)
+        if match is not None:
+            results[match.group(4)] = int(match.group(2))
+
+    return results
+
+def subcommands():
+    """Get the names of all subcommands."""
+    parser = module.get_parser()
+    return list(parser._subparsers._group_actions[0].choices)
+
+@pytest.mark.parametrize("cmd", subcommands())
+def test_startup_help(cmd):
+    """Test the help of a subcommand does not import heavy modules."""
+    modules = importtime(cmd, "--help")
+    assert "yasynccli.__main__" in modules or "yasynccli.arguments" in modules
+    for name in heavy:
+        assert name not in modules, "{} imported by `{} --help`".format(name, cmd)
+
+def test_startup_show(tmpdir):
+    """Test `show` does not import heavy modules."""
+    p = pathlib.Path(tmpdir).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<folder id="a" label="A" path="/tmp/a"></folder>'
+        '<gui><address>127.0.0.1:8384</address><apikey>KEY</apikey></gui>'
+        '</configuration>')
+
+    args = ["--config", str(p), "--cache-dir", str(pathlib.Path(tmpdir).joinpath("cache"))]
+    for _ in range(2): # the 2nd run hits the parsed-config cache
+        modules = importtime(*args, "show")
+        assert "yasynccli.config" in modules
+        for name in heavy:
+            assert name not in modules, "{} imported by `show`".format(name)
+
+    assert "xml.etree.ElementTree" not in modules
+
+    # the default socket path is computed without the daemon module
+    assert "yasynccli.daemon" not in modules and "socket" not in modules
+
+# modules that only a direct connection to the server needs
+network = ["requests", "urllib3", "chardet", "charset_normalizer", "idna"]
+
+@pytest.fixture
+def server(tmpdir, fake_server):
+    """Return the global options for a fake server answering `check` and `status`."""
+    fake_server.routes.update({
+        "/system/config": {
+            "folders": [{"id": "a", "label": "A", "path": "/tmp/a", "devices": []}],
+            "devices": []},
+        "/system/version": {"version": "v1.0.0"},
+        "/system/status": {"myID": "ME"},
+        "/db/status": {"state": "idle", "globalBytes": 0, "needBytes": 0}})
+
+    p = fake_server.write_config(tmpdir, '<folder id="a" label="A" path="/tmp/a"></folder>')
+    return ["--config", str(p), "--cache-dir", str(pathlib.Path(tmpdir).joinpath("cache"))]
+
+def test_startup_daemon(server):
+    """Test `check` and `get` through a daemon do not import `requests`."""
+    proc = subprocess.Popen([sys.executable, "-m", "yasynccli"] + server + ["serve"], cwd=root)
+
+    try:
+        for _ in range(100):
+            if list(pathlib.Path(server[3]).glob("daemon-*.sock")):
+                break
+            time.sleep(0.05)
+
+        for cmd in [["check"], ["get", "/system/version"]]:
+            modules = importtime(*server, *cmd)
+            assert "yasynccli.daemon" in modules, "`{}` did not use the daemon".format(cmd[0])
+            for name in network:
+                assert name not in modules, "{} imported by `{}`".format(name, cmd[0])
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+def test_startup_status(server):
+    """Test `status` talks to the server directly and reuses the parsed config."""
+    for _ in range(2): # the 2nd run hits the parsed-config cache
+        modules = importtime(*server, "status")
+
+    assert "requests" in modules
+    assert "yasynccli.daemon" not in modules
+    assert "xml.etree.ElementTree" not in modules
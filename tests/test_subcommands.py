@@ -0,0 +1,510 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test helpers of subcommands.
+"""
+import os
+import sys
+import io
+import json
+import time
+import pathlib
+import urllib.parse
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import subcommands as module
+from yasynccli import __main__ as main
+
+def test_read_paths_0(monkeypatch):
+    """Test reading paths from CMD arguments."""
+    monkeypatch.setattr(sys, "stdin", io.StringIO("c\nd\n"))
+    assert module._read_paths(["a", "b"]) == ["a", "b"]
+
+def test_read_paths_1(monkeypatch):
+    """Test reading newline- and NUL-separated paths from stdin."""
+    monkeypatch.setattr(sys, "stdin", io.StringIO("c\nd e\n\n"))
+    assert module._read_paths([]) == ["c", "d e"]
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO("c\nd\0e\0"))
+    assert module._read_paths(["a", "-"], null=True) == ["a", "c\nd", "e"]
+
+def test_scan_params():
+    """Test packing subpaths into as few requests as possible."""
+    assert list(module._scan_params("abc", None)) == [[("folder", "abc")]]
+    assert list(module._scan_params("abc", ["d1", "d2"])) == [
+        [("folder", "abc"), ("sub", "d1"), ("sub", "d2")]]
+
+    subs = ["dir{:05d}/file.txt".format(i) for i in range(2000)]
+    results = list(module._scan_params("abc", subs))
+    assert len(results) > 1
+    assert [sub for params in results for _, sub in params[1:]] == subs
+
+    for params in results:
+        assert params[0] == ("folder", "abc")
+        assert len(urllib.parse.urlencode(params)) <= module._SCAN_QUERY_LIMIT
+
+def test_events(tmpdir, capsys, fake_server):
+    """Test resuming an event stream from a cursor file."""
+    fake_server.routes["/events"] = lambda request: [
+        {"id": i, "type": "Ping"} for i in range(int(request.params["since"])+1, 6)][:2]
+
+    config = fake_server.write_config(tmpdir)
+    cursor = pathlib.Path(tmpdir).joinpath("cursor")
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "events", "--cursor", str(cursor), "--once"]
+
+    ids = []
+    for _ in range(4):
+        args = main.process_args(main.get_parser().parse_args(argv))
+        args.func(args)
+        ids += [json.loads(line)["id"] for line in capsys.readouterr().out.splitlines()]
+
+    assert ids == [1, 2, 3, 4, 5]
+    assert cursor.read_text() == "5\n"
+
+def test_log_follow(tmpdir, capsys, monkeypatch, fake_server):
+    """Test `log --follow` prints only new messages."""
+
+    def _log(request): # grows by one message per request
+        messages = [
+            {"when": "2020-01-01T00:00:{:02d}Z".format(i), "message": str(i)}
+            for i in range(len(fake_server.requests) + 1)]
+        return {"messages": [
+            msg for msg in messages if msg["when"] > request.params.get("since", "")]}
+
+    fake_server.routes["/system/log"] = _log
+    config = fake_server.write_config(tmpdir)
+
+    # stop following after the 3rd poll
+    polls = []
+    def _sleep(seconds):
+        polls.append(seconds)
+        if len(polls) == 3:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(time, "sleep", _sleep)
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "log", "--follow", "--interval", "0.5"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+    args.func(args)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(": ")[1] for line in lines] == ["0", "1", "2", "3"]
+    assert polls == [0.5, 0.5, 0.5]
+
+def test_log_follow_json(tmpdir, capsys, monkeypatch, fake_server):
+    """Test `log --follow --output json` prints messages as they come."""
+    fake_server.routes["/system/log"] = lambda request: {"messages": [
+        {"when": "2020-01-01T00:00:{:02d}Z".format(len(fake_server.requests)), "message": "hi"}]}
+    config = fake_server.write_config(tmpdir)
+
+    # what has been printed before each poll; stop after the 2nd poll
+    printed = []
+    def _sleep(seconds):
+        printed.append(capsys.readouterr().out)
+        if len(printed) == 2:
+            raise KeyboardInterrupt
+    monkeypatch.setattr(time, "sleep", _sleep)
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "--output", "json", "log", "--follow"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+    args.func(args)
+
+    assert [json.loads(text)["when"] for text in printed] == [
+        "2020-01-01T00:00:01Z", "2020-01-01T00:00:02Z"]
+
+@pytest.fixture
+def status_server(fake_server):
+    """Return a fake server answering status requests; completions are slow."""
+
+    def _completion(request):
+        if request.params["device"] == "BAD":
+            return None
+        time.sleep(0.1)
+        return {"completion": 50, "globalBytes": 200, "needBytes": 100}
+
+    fake_server.routes.update({
+        "/system/status": {"myID": "ME"},
+        "/db/status": {"state": "idle", "globalBytes": 400, "needBytes": 100},
+        "/db/completion": _completion})
+    return fake_server
+
+def test_status(tmpdir, capsys, status_server):
+    """Test `status` sends requests concurrently and aggregates results."""
+    folders = "".join(
+        '<folder id="f{0}" label="F{0}" path="/tmp/f{0}"><device id="ME"></device>'
+        '<device id="A"></device><device id="B"></device></folder>'.format(i)
+        for i in range(5))
+    config = status_server.write_config(
+        tmpdir, folders +
+        '<folder id="g" label="G" path="/tmp/g"><device id="BAD"></device></folder>'
+        '<device id="ME" name="me"></device><device id="A" name="a"></device>'
+        '<device id="B" name="b"></device><device id="BAD" name="bad"></device>')
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon", "--no-cache",
+        "--output", "json", "status", "--jobs", "10"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    start = time.perf_counter()
+    args.func(args)
+    elapsed = time.perf_counter() - start
+
+    # 10 slow requests of 0.1 seconds are sent at the same time
+    assert elapsed < 0.5
+
+    data = json.loads(capsys.readouterr().out)
+    assert [folder["id"] for folder in data["folders"]] == ["f0", "f1", "f2", "f3", "f4", "g"]
+    assert data["folders"][0]["completion"] == 75
+    assert set(data["folders"][0]["devices"]) == {"A", "B"}
+    assert data["folders"][5]["devices"]["BAD"]["error"] is not None
+    assert data["devices"]["A"] == {
+        "name": "a", "folders": 5, "needBytes": 500, "errors": 0, "completion": 50}
+    assert data["devices"]["BAD"]["errors"] == 1
+
+def test_get_specs():
+    """Test splitting endpoint groups and reading specs from stdin."""
+    stdin = io.StringIO('\n/db/file folder=a "file=b c"\n{"endpoint": "system/version"}\n')
+    specs = module._get_specs(["/db/status", "folder=a", "system/ping"], stdin)
+    assert specs == [
+        ("/db/status", {"folder": "a"}), ("/system/ping", {}),
+        ("/db/file", {"folder": "a", "file": "b c"}), ("/system/version", {})]
+
+    for tokens in [["folder=a"], ["/db/statu"]]:
+        try:
+            module._get_specs(tokens)
+        except RuntimeError:
+            pass
+        else:
+            assert False, "RuntimeError not raised"
+
+def test_get_many(tmpdir, capsys, monkeypatch, status_server):
+    """Test several endpoints are sent concurrently and printed in order."""
+    config = status_server.write_config(tmpdir)
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO(
+        "".join("/db/completion folder=a device={}\n".format(i) for i in range(5))))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "get", "-", "/system/status", "/db/completion", "folder=a", "device=BAD"]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    start = time.perf_counter()
+    try:
+        args.func(args)
+    except SystemExit as err:
+        assert err.code == 1 # because of the failed request
+    else:
+        assert False, "SystemExit not raised"
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.3
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["params"].get("device") for line in lines] == [None, "BAD", "0", "1", "2", "3", "4"]
+    assert lines[0]["result"] == {"myID": "ME"}
+    assert lines[1]["status"] == 404 and lines[1]["error"] is not None
+    assert lines[2]["result"]["completion"] == 50
+
+@pytest.fixture
+def config_server(fake_server):
+    """Return a fake server holding a configuration, replaced by POST requests."""
+
+    state = {"config": {"folders": [{"id": "a", "paused": False}]}}
+
+    def _post(request):
+        state["config"] = request.json()
+        return b""
+
+    fake_server.routes["GET /system/config"] = lambda request: state["config"]
+    fake_server.routes["POST /system/config"] = _post
+    return fake_server
+
+def _posts(server):
+    """Return the POST requests a fake server received."""
+    return [request for request in server.requests if request.method == "POST"]
+
+def test_config_apply(tmpdir, capsys, monkeypatch, config_server):
+    """Test `config apply` posts once, and never for dry runs or no changes."""
+    config = config_server.write_config(tmpdir)
+
+    def run(edits, *options):
+        monkeypatch.setattr(sys, "stdin", io.StringIO(edits))
+        argv = [
+            "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+            "--output", "json", "config", "apply"] + list(options)
+        args = main.process_args(main.get_parser().parse_args(argv))
+        args.func(args)
+        return json.loads(capsys.readouterr().out)
+
+    edits = '{"op": "pause", "folder": "a"}\n{"op": "set", "path": "folders[id=a].label", "value": "A"}\n'
+
+    result = run(edits, "--dry-run")
+    assert result["changed"] and not result["posted"]
+    assert _posts(config_server) == []
+
+    result = run(edits)
+    assert result["posted"] and result["edits"] == 2
+    assert len(_posts(config_server)) == 1
+    assert _posts(config_server)[0].json() == {
+        "folders": [{"id": "a", "paused": True, "label": "A"}]}
+
+    result = run(edits)
+    assert not result["changed"] and not result["posted"]
+    assert len(_posts(config_server)) == 1
+
+def test_batch(tmpdir, capsys, config_server):
+    """Test `batch` runs all lines on one connection and reports failed ones."""
+    config = config_server.write_config(tmpdir)
+
+    edits = pathlib.Path(tmpdir).joinpath("edits.json")
+    edits.write_text('[{"op": "set", "path": "version", "value": 31}]')
+
+    script = pathlib.Path(tmpdir).joinpath("script.txt")
+    script.write_text("\n".join([
+        "# comments and blank lines are skipped", "",
+        "get /system/config",
+        "get /no/such/endpoint",
+        "config apply --dry-run '{}'".format(edits),
+        "--output compact get /system/config"]))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "--no-cache", "--output", "json", "batch", str(script)]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    code = None
+    try:
+        args.func(args)
+    except SystemExit as err:
+        code = err.code
+    assert code == 1
+
+    captured = capsys.readouterr()
+    assert "line 4" in captured.err and "1 of 4 lines failed" in captured.err
+
+    lines = captured.out.splitlines()
+    assert lines[0] == "{" # the batch's --output json
+    assert json.loads(lines[-1]) == {"folders": [{"id": "a", "paused": False}]} # --output compact
+    assert '"posted": false' in captured.out
+    assert config_server.connections == 1
+
+def test_batch_options(tmpdir, capsys):
+    """Test global options on batch lines are used or rejected, not ignored."""
+    for name in ["outer", "other"]:
+        pathlib.Path(tmpdir).joinpath(name + ".xml").write_text(
+            '<configuration version="30"><folder id="{0}" label="{0}" path="/tmp/{0}"></folder>'
+            '<gui><address>127.0.0.1:1</address><apikey>KEY</apikey></gui>'
+            '</configuration>'.format(name))
+
+    script = pathlib.Path(tmpdir).joinpath("script.txt")
+    script.write_text("\n".join([
+        "show",
+        "--config '{}' show".format(pathlib.Path(tmpdir).joinpath("other.xml")),
+        "--url 127.0.0.1:2 --api-key OTHER show",
+        "--log-level debug show"]))
+
+    argv = [
+        "--config", str(pathlib.Path(tmpdir).joinpath("outer.xml")), "--cache-dir", str(tmpdir),
+        "--output", "compact", "batch", str(script)]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    code = None
+    try:
+        args.func(args)
+    except SystemExit as err:
+        code = err.code
+    assert code == 1
+
+    captured = capsys.readouterr()
+    results = [json.loads(line) for line in captured.out.splitlines()]
+    assert [result["folders"][0]["id"] for result in results] == ["outer", "other", "outer"]
+    assert (results[2]["url"], results[2]["apikey"]) == ("http://127.0.0.1:2", "OTHER")
+    assert "line 4" in captured.err and "--log-level" in captured.err
+
+def _scans(server):
+    """Return the queries of the scan requests a fake server received."""
+    return [urllib.parse.parse_qs(urllib.parse.urlparse(request.path).query)
+            for request in _posts(server)]
+
+def test_diff(tmpdir, capsys, fake_server):
+    """Test `diff` reports differences between a directory and the index."""
+    folder = pathlib.Path(tmpdir).joinpath("folder")
+    folder.joinpath("sub", "dir").mkdir(parents=True)
+    folder.joinpath("sub", "same.txt").write_text("abc")
+    folder.joinpath("sub", "extra.txt").write_text("abc")
+    os.utime(folder.joinpath("sub", "same.txt"), ns=(10**18, 10**18))
+    mtime = "2001-09-09T01:46:40Z"
+
+    fake_server.routes["/db/browse"] = [
+        {"name": "dir", "type": "FILE_INFO_TYPE_DIRECTORY", "modTime": mtime, "children": [
+            {"name": "gone.txt", "type": "FILE_INFO_TYPE_FILE", "size": 1, "modTime": mtime}]},
+        {"name": "same.txt", "type": "FILE_INFO_TYPE_FILE", "size": 3, "modTime": mtime}]
+
+    config = fake_server.write_config(
+        tmpdir, '<folder id="f" label="F" path="{}"></folder>'.format(folder))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+        "diff", str(folder.joinpath("sub"))]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    code = None
+    try:
+        args.func(args)
+    except SystemExit as err:
+        code = err.code
+    assert code == 1
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(result["path"], result["diff"]) for result in results] == [
+        ("sub/dir/gone.txt", "missing"), ("sub/extra.txt", "extra")]
+    assert results[0]["folder"] == "f"
+    assert fake_server.requests[-1].params == {"folder": "f", "prefix": "sub"}
+
+def test_scan_changed(tmpdir, fake_server):
+    """Test `scan --changed` only asks to scan changed paths."""
+
+    folder = pathlib.Path(tmpdir).joinpath("folder")
+    for path in ["sub/a/x.txt", "sub/b/y.txt", "z.txt"]:
+        folder.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        folder.joinpath(path).write_text(path)
+
+    config = fake_server.write_config(
+        tmpdir, '<folder id="f" label="F" path="{}"></folder>'.format(folder))
+
+    def run(*paths):
+        argv = [
+            "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+            "scan", "--changed"] + [str(folder.joinpath(path)) for path in paths]
+        args = main.process_args(main.get_parser().parse_args(argv))
+        args.func(args)
+        posts = _scans(fake_server)
+        fake_server.requests.clear()
+        return posts
+
+    # the first run scans everything; files are always scanned
+    assert run("sub", "z.txt") == [{"folder": ["f"], "sub": ["sub", "z.txt"]}]
+    assert run("sub") == []
+
+    folder.joinpath("sub", "b", "y.txt").write_text("changed")
+    folder.joinpath("sub", "c").mkdir()
+    assert run("sub") == [{"folder": ["f"], "sub": ["sub/b/y.txt", "sub/c"]}]
+    assert run("sub") == []
+    assert run("") == [{"folder": ["f"], "sub": ["z.txt"]}] # z.txt is new to the snapshot
+    assert run("") == []
+
+def test_scan_skips_bad_paths(tmpdir, capsys, fake_server):
+    """Test `scan` reports bad paths and still scans the others."""
+
+    folder = pathlib.Path(tmpdir).joinpath("folder")
+    folder.joinpath("a").mkdir(parents=True)
+    pathlib.Path(tmpdir).joinpath("outside").mkdir()
+
+    config = fake_server.write_config(
+        tmpdir, '<folder id="f" label="F" path="{}"></folder>'.format(folder))
+
+    argv = [
+        "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon", "scan",
+        str(folder.joinpath("missing")), str(folder.joinpath("a")), str(tmpdir.join("outside"))]
+    args = main.process_args(main.get_parser().parse_args(argv))
+
+    code = None
+    try:
+        args.func(args)
+    except SystemExit as err:
+        code = err.code
+
+    assert code == 1
+    assert _scans(fake_server) == [{"folder": ["f"], "sub": ["a"]}]
+    err = capsys.readouterr().err
+    assert "missing not found" in err and "does not belong" in err
+    assert "2 of 3 paths skipped" in err
+
+def test_scan_queue(tmpdir, fake_server):
+    """Test queued scans are merged and sent by the process taking the lock."""
+    from yasynccli.spool import ScanQueue
+
+    folder = pathlib.Path(tmpdir).joinpath("folder")
+    for path in ["a/x.txt", "a/y.txt", "b/z.txt"]:
+        folder.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        folder.joinpath(path).write_text(path)
+
+    config = fake_server.write_config(
+        tmpdir, '<folder id="f" label="F" path="{}"></folder>'.format(folder))
+
+    def run(*paths):
+        argv = [
+            "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+            "scan", "--queue", "--min-interval", "0.5"] + [
+                str(folder.joinpath(path)) for path in paths]
+        args = main.process_args(main.get_parser().parse_args(argv))
+        args.func(args)
+        return args
+
+    # nobody else is draining: sent right away
+    args = run("a/x.txt")
+    assert _scans(fake_server) == [{"folder": ["f"], "sub": ["a/x.txt"]}]
+    fake_server.requests.clear()
+
+    # another process is draining: requests stay in the queue
+    queue = ScanQueue(args.socket.with_suffix(".queue"))
+    first = queue.load_state()["last"]["f"]
+    assert queue.lock()
+    run("a/y.txt", "b/z.txt")
+    run("a")
+    assert _scans(fake_server) == []
+    queue.unlock()
+
+    # within the minimum interval since the last scan of the folder, the next
+    # caller leaves the requests in the queue without waiting
+    if time.time() - first < 0.4:
+        start = time.perf_counter()
+        run("b")
+        assert time.perf_counter() - start < 0.4
+        assert _scans(fake_server) == [] and not queue.empty()
+        time.sleep(max(first + 0.5 - time.time(), 0))
+
+    # then everything is merged into one request
+    run("b")
+    assert _scans(fake_server) == [{"folder": ["f"], "sub": ["a", "b"]}]
+    assert queue.empty() and queue.load_state()["last"]["f"] - first >= 0.5
+
+def test_scan_queue_rate(tmpdir, fake_server):
+    """Test the global rate holds across callers of `scan --queue`."""
+    from yasynccli.spool import ScanQueue
+
+    folders = pathlib.Path(tmpdir).joinpath("folders")
+    for i in range(5):
+        folders.joinpath(str(i)).mkdir(parents=True)
+    config = fake_server.write_config(tmpdir, "".join(
+        '<folder id="{0}" label="{0}" path="{1}"></folder>'.format(i, folders.joinpath(str(i)))
+        for i in range(5)))
+
+    # each caller is a new drainer with its own Scheduler
+    for i in range(5):
+        argv = [
+            "--config", str(config), "--cache-dir", str(tmpdir), "--no-daemon",
+            "scan", "--queue", "--min-interval", "0", "--rate", "0.5",
+            str(folders.joinpath(str(i)))]
+        args = main.process_args(main.get_parser().parse_args(argv))
+        args.func(args)
+
+    # one request per 2 seconds: only the first one is sent
+    assert _scans(fake_server) == [{"folder": ["0"]}]
+    queue = ScanQueue(args.socket.with_suffix(".queue"))
+    assert queue.size() == 4
+    assert queue.load_state()["next"] - queue.load_state()["last"]["0"] == 2.
@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test HTTP over Unix-domain sockets.
+"""
+import sys
+import pathlib
+import requests
+import pytest
+
+# import target modules
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import session as module
+
+def write_config(folder, address):
+    """Write a config file with the given GUI address."""
+    p = pathlib.Path(folder).joinpath("config.xml")
+    p.write_text(
+        '<configuration version="30">'
+        '<gui><address>{}</address><apikey>KEY</apikey></gui>'
+        '</configuration>'.format(address))
+    return p
+
+def test_url(tmpdir):
+    """Test URLs of Unix-domain sockets."""
+    p = write_config(tmpdir, "unix:///var/run/syncthing.sock")
+    config = module.SyncthingSession(p)
+    assert config.url == "http+unix://%2Fvar%2Frun%2Fsyncthing.sock"
+
+    config = module.SyncthingSession(p, url="unix:///tmp/a b.sock")
+    assert config.url == "http+unix://%2Ftmp%2Fa%20b.sock"
+
+    config = module.SyncthingSession(p, url="127.0.0.1:8384")
+    assert config.url == "http://127.0.0.1:8384"
+
+def test_SyncthingSession(tmpdir, fake_unix_server):
+    """Test GET/POST over a Unix-domain socket with keep-alive."""
+    p = write_config(tmpdir, "127.0.0.1:1")
+
+    with module.SyncthingSession(p, url=fake_unix_server.address) as session:
+        for _ in range(3):
+            response = session.get("system", "version", params={"a": "1"}, timeout=5)
+            response.raise_for_status()
+            assert response.json() == {
+                "method": "GET", "path": "/rest/system/version?a=1", "host": "localhost",
+                "apikey": "KEY", "body": ""}
+
+        response = session.post("db", "scan", params=[("sub", "x"), ("sub", "y")], timeout=5)
+        assert response.json()["path"] == "/rest/db/scan?sub=x&sub=y"
+
+    assert fake_unix_server.connections == 1
+
+def test_SyncthingSession_error(tmpdir):
+    """Test connecting to a socket without a server."""
+    p = write_config(tmpdir, "unix://{}".format(pathlib.Path(tmpdir).joinpath("none.sock")))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        module.SyncthingSession(p).get("system", "version", timeout=5)
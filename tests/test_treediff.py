@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test comparing local trees with the server's index.
+"""
+import sys
+import pathlib
+import concurrent.futures
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import treediff as module
+
+def _tree(root):
+    """Create a small tree; returns its root as a str."""
+    root = pathlib.Path(root)
+    for path in ["b/y.txt", "b/x.txt", "a-c.txt", "a/z.txt", "c/d/e.txt"]:
+        root.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        root.joinpath(path).write_text(path)
+    root.joinpath(".stfolder").mkdir()
+    root.joinpath("b", "~syncthing~x.txt.tmp").write_text("")
+    return str(root)
+
+def test_mtime_ns():
+    """Test converting timestamps to ns and back."""
+    assert module._mtime_ns("1970-01-01T00:00:01Z") == 10**9
+    assert module._mtime_ns("1970-01-01T01:00:01.5+01:00") == 1500000000
+    assert module._mtime_ns("2020-05-19T12:34:56.123456789-07:00") % 10**9 == 123456789
+    assert module._format_ns(1500000001) == "1970-01-01T00:00:01.500000001Z"
+
+def test_walk(tmpdir):
+    """Test listing depth-first with sorted siblings and skipping subtrees."""
+    root = _tree(tmpdir)
+
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        paths = [entry[0] for entry in module.walk(root, "", pool, 1)]
+        assert paths == [
+            "a", "a/z.txt", "a-c.txt", "b", "b/x.txt", "b/y.txt", "c", "c/d", "c/d/e.txt"]
+        assert paths == sorted(paths, key=lambda path: path.split("/"))
+
+        paths = [entry[0] for entry in module.walk(root, "c/", pool)]
+        assert paths == ["c/d", "c/d/e.txt"]
+
+        walker = module.walk(root, "", pool)
+        paths = [next(walker)[0]]
+        paths.append(walker.send(True)[0]) # skip the children of a
+        assert paths == ["a", "a-c.txt"]
+        walker.close()
+
+def test_compare(tmpdir):
+    """Test merging local entries with the server's."""
+    root = _tree(tmpdir)
+
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        server = list(module.walk(root, "", pool))
+
+    # the server has a file we don't have, a different file, and a missing dir
+    server = [entry for entry in server if not entry[0].startswith("c")]
+    server.insert(1, ("a/w.txt", "file", 1, 0, None))
+    server = [
+        (path, kind, size+1, mtime, None) if path == "b/x.txt" else
+        (path, kind, size, mtime+3*10**9, None) if path == "b/y.txt" else
+        (path, kind, size, mtime, None) for path, kind, size, mtime, _ in server]
+    server.append(("a-c.txt/f", "file", 1, 0, None)) # unsorted
+
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        results = module.compare(module.walk(root, "", pool), iter(server[:-1]), 2.)
+        results = [(result["path"], result["diff"]) for result in results]
+    assert results == [
+        ("a/w.txt", "missing"), ("b/x.txt", "size"), ("b/y.txt", "mtime"), ("c", "extra")]
+
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        results = module.compare(module.walk(root, "", pool), iter(server), 5.)
+        try:
+            list(results)
+        except RuntimeError as err:
+            assert "not sorted" in str(err)
+        else:
+            assert False
+
+def test_remote():
+    """Test converting browse records of both formats."""
+    records = [
+        {"path": "a", "type": "FILE_INFO_TYPE_DIRECTORY", "modTime": "1970-01-01T00:00:01Z"},
+        {"path": "a/b", "type": "file", "size": 3, "modTime": "1970-01-01T00:00:02Z"},
+        {"path": "a/c", "type": "FILE_INFO_TYPE_SYMLINK", "size": 0},
+        {"path": "x", "value": "ignored"}]
+    assert list(module.remote(records)) == [
+        ("a", "dir", 0, 10**9, None), ("a/b", "file", 3, 2*10**9, None),
+        ("a/c", "symlink", 0, None, None)]
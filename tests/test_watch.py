@@ -0,0 +1,66 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Test file system watchers.
+"""
+import sys
+import pathlib
+import pytest
+
+# import target module
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from yasynccli import watch as module
+
+def test_collapse():
+    """Test collapsing subpaths to common ancestors."""
+    subs = ["a/b/c", "a/b/d", "a/e", "f"]
+    assert module.collapse(None, 10) is None
+    assert module.collapse(subs, 4) == sorted(subs)
+    assert module.collapse(subs, 3) == ["a/b", "a/e", "f"]
+    assert module.collapse(subs, 2) == ["a", "f"]
+    assert module.collapse(subs, 1) is None
+
+def touch_tree(root):
+    """Make some changes under root and return the expected changed paths."""
+    root.joinpath("new").mkdir()
+    root.joinpath("new", "file.txt").write_text("abc")
+    root.joinpath("old.txt").unlink()
+    root.joinpath(".stfolder").write_text("ignored")
+    return {str(root.joinpath("new")), str(root)}
+
+def watchers():
+    """Get the watchers available on this system."""
+    results = [lambda roots: module.Poller(roots, 0.01)]
+    if module.Inotify.available():
+        results.append(module.Inotify)
+    return results
+
+@pytest.mark.parametrize("watcher", watchers())
+def test_watcher(tmpdir, watcher):
+    """Test watchers report changed paths."""
+    root = pathlib.Path(tmpdir).resolve()
+    root.joinpath("old.txt").write_text("abc")
+
+    w = watcher([str(root)])
+    expected = touch_tree(root)
+
+    changes = set()
+    for _ in range(20):
+        changes |= w.read(0.05)
+
+    # a watcher may also report the new file or the changed directory itself
+    assert expected <= changes
+    assert changes <= expected | {str(root.joinpath("new", "file.txt"))}
+
+    # changes in a directory created after watching started are seen too
+    root.joinpath("new", "file.txt").write_text("abcd")
+    changes = set()
+    for _ in range(20):
+        changes |= w.read(0.05)
+    assert str(root.joinpath("new", "file.txt")) in changes
+    w.close()
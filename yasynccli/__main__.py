@@ -8,12 +8,21 @@
 
 """Main function/script of YASync-CLI.
 """
+import os
+import time
 import logging
 import argparse
 import pathlib
 import textwrap
+
+_started = time.perf_counter() # reported as the "import" phase by `--profile`
+
 from . import __version__
 from . import arguments
+from . import instrument
+from . import output
+
+_imported = time.perf_counter()
 
 def get_parser():
     """Get an argparse.ArgumentParser with arguments.
@@ -73,6 +82,63 @@ def get_parser():
         "--api-key", action="store", type=str, default="From config file",
         help=helpmsg, metavar="KEY", dest="apikey")
 
+    helpmsg = "directory for caching parsed config files (Default: %(default)s)"
+    parser.add_argument(
+        "--cache-dir", action="store", type=pathlib.Path,
+        default=pathlib.Path(os.environ.get("XDG_CACHE_HOME", "~/.cache"), "yasynccli"),
+        help=helpmsg, metavar="DIR", dest="cache_dir")
+
+    helpmsg = "Unix socket of the daemon (Default: a per-config socket in the cache directory)"
+    parser.add_argument(
+        "--socket", action="store", type=pathlib.Path, default=None,
+        help=helpmsg, metavar="SOCKET", dest="socket")
+
+    helpmsg = "do not forward requests to a running daemon"
+    parser.add_argument(
+        "--no-daemon", action="store_true", help=helpmsg, dest="no_daemon")
+
+    helpmsg = "output format. Options: %(choices)s (Default: %(default)s)"
+    parser.add_argument(
+        "--output", action="store", type=str, default="pretty",
+        choices=output.MODES,
+        help=helpmsg, metavar="FORMAT", dest="output")
+
+    helpmsg = "print the time spent in each phase to stderr"
+    parser.add_argument(
+        "--profile", action="store_const", const="-", default=None,
+        help=helpmsg, dest="profile")
+
+    helpmsg = "write the time spent in each phase as JSON to FILE"
+    parser.add_argument(
+        "--profile-json", action="store", type=str, default=None,
+        help=helpmsg, metavar="FILE", dest="profile")
+
+    helpmsg = "cache responses of slowly changing GET endpoints on disk for a short time"
+    parser.add_argument(
+        "--cache", action="store_true", default=False, help=helpmsg, dest="use_cache")
+
+    helpmsg = "do not use the on-disk cache of GET responses (the default)"
+    parser.add_argument(
+        "--no-cache", action="store_false", help=helpmsg, dest="use_cache")
+
+    # many servers
+    helpmsg = "run the command against all hosts in an inventory file " + \
+        "(check, get, log, and status only)"
+    parser.add_argument(
+        "--fleet", action="store", type=pathlib.Path, default=None,
+        help=helpmsg, metavar="INVENTORY", dest="fleet")
+
+    helpmsg = "number of hosts to run concurrently with --fleet (Default: %(default)s)"
+    parser.add_argument(
+        "--fleet-jobs", action="store", type=int, default=8,
+        help=helpmsg, metavar="N", dest="fleet_jobs")
+
+    helpmsg = "seconds each host may take with --fleet, unless the inventory " + \
+        "says otherwise (Default: %(default)s)"
+    parser.add_argument(
+        "--host-timeout", action="store", type=float, default=60.,
+        help=helpmsg, metavar="SECONDS", dest="host_timeout")
+
     # subparser
     subparsers = parser.add_subparsers(dest="cmd", metavar="<COMMAND>", required=True)
 
@@ -81,8 +147,16 @@ def get_parser():
     subparsers, _ = arguments.log(subparsers)
     subparsers, _ = arguments.scan(subparsers)
     subparsers, _ = arguments.check(subparsers)
+    subparsers, _ = arguments.status(subparsers)
+    subparsers, _ = arguments.diff(subparsers)
     subparsers, _ = arguments.get(subparsers)
     subparsers, _ = arguments.post(subparsers)
+    subparsers, _ = arguments.config(subparsers)
+    subparsers, _ = arguments.events(subparsers)
+    subparsers, _ = arguments.watch_scan(subparsers)
+    subparsers, _ = arguments.serve(subparsers)
+    subparsers, _ = arguments.cache(subparsers)
+    subparsers, _ = arguments.batch(subparsers)
 
     return parser
 
@@ -105,6 +179,12 @@ def process_args(args):
         args.apikey = None
 
     args.config = args.config.expanduser().resolve()
+    args.cache_dir = args.cache_dir.expanduser()
+
+    if args.socket is None:
+        # in config, which is loaded anyway; daemon is only needed by some commands
+        from .config import socket_path
+        args.socket = socket_path(args.config, args.url, args.apikey, args.cache_dir)
 
     if args.log_file is not None:
         args.log_file = args.log_file.expanduser().resolve()
@@ -122,6 +202,24 @@ def process_args(args):
 
     return args
 
+def _write_profile(profiler, path):
+    """Write the report of a profiler.
+
+    Args:
+    -----
+        profiler: an instrument.Profiler.
+        path: a str; "-" for a table to stderr, otherwise a JSON file path.
+    """
+
+    if path == "-":
+        import sys
+        sys.stderr.write(profiler.report())
+        return
+
+    import json
+    with open(os.path.expanduser(path), "w") as fileobj:
+        json.dump(profiler.to_dict(), fileobj, indent=2)
+
 def main():
     """Main function of YASync-CLI."""
 
@@ -134,9 +232,24 @@ def main():
     logger.setLevel(args.log_level)
     logger.addHandler(args.log_handler)
 
+    # register the timing report before anything is timed
+    if args.profile is not None:
+        profiler = instrument.Profiler(_started)
+        instrument.register(profiler)
+        instrument.emit("import", _imported-_started)
+
     # excute command
     logger.debug("Ready to execute command `{}`.".format(args.cmd))
-    args.func(args)
+    try:
+        if args.fleet is not None:
+            from . import fleet
+            fleet.run(args)
+        else:
+            args.func(args)
+    finally:
+        if args.profile is not None:
+            instrument.unregister(profiler)
+            _write_profile(profiler, args.profile)
     logger.debug("Existing yasync-cli.")
 
     return 0
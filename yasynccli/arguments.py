@@ -9,7 +9,9 @@
 """Subparsers & arguments for subcommands
 """
 import argparse
+import pathlib
 from . import subcommands
+from .config import SyncthingConfig
 
 def _add_docstring(func):
     """Add a docstring to a func and return it.
@@ -47,37 +49,152 @@ def log(subparser_action):
     msg = "Show Syncthing server's log."
     subparser = subparser_action.add_parser("log", description=msg, help=msg)
     subparser.set_defaults(func=subcommands.log)
+
+    subparser.add_argument(
+        "-f", "--follow", action="store_true",
+        help="Keep polling the server and print new messages as they come. "
+             "JSON output is always one message per line (ndjson) when following.")
+
+    subparser.add_argument(
+        "--interval", action="store", type=float, default=2.0, metavar="SECONDS",
+        help="Seconds between two polls when following. (Default: %(default)s)")
     return subparser_action, subparser
 
 @_add_docstring
 def scan(subparser_action):
-    msg = "Scan a directory/file to triger synchronization."
+    msg = "Scan directories/files to triger synchronization."
     subparser = subparser_action.add_parser("scan", description=msg, help=msg)
     subparser.set_defaults(func=subcommands.scan)
-    subparser.add_argument("path", action="store", type=str, metavar="PATH", help=msg)
+
+    subparser.add_argument(
+        "paths", action="store", type=str, metavar="PATH", nargs="*",
+        help="Directories/files to scan. If no PATH is given or PATH is `-`, "
+        "paths are read from stdin, one per line.")
+
+    subparser.add_argument(
+        "-0", "--null", action="store_true", dest="null",
+        help="Paths read from stdin are separated by NUL characters instead of "
+        "newlines.")
+
+    subparser.add_argument(
+        "--changed", action="store_true", dest="changed",
+        help="Only scan files/directories under the given directories that "
+        "changed since the last `scan --changed`, according to a snapshot of "
+        "sizes, modification times, and inodes in the cache directory. The "
+        "first run scans the whole directories and takes the snapshot.")
+
+    subparser.add_argument(
+        "-j", "--jobs", action="store", type=int, default=8, metavar="N", dest="jobs",
+        help="Number of threads listing directories with --changed. (Default: %(default)s)")
+
+    subparser.add_argument(
+        "--max-subs", action="store", type=int, default=100, metavar="N",
+        help="Collapse changed or queued paths of a folder to their common "
+        "ancestors until there are at most N of them. (Default: %(default)s)",
+        dest="max_subs")
+
+    subparser.add_argument(
+        "--queue", action="store_true", dest="queue",
+        help="Add the request to a queue shared by all processes instead of "
+        "sending it. The first process finding no one else draining the queue "
+        "sends the queued requests that are due, merged by folders, without "
+        "waiting for the others.")
+
+    subparser.add_argument(
+        "--drain", action="store_true", dest="drain",
+        help="Keep draining the queue until interrupted, e.g., as a service; "
+        "PATH is optional.")
+
+    subparser.add_argument(
+        "--min-interval", action="store", type=float, default=10., metavar="SECONDS",
+        dest="min_interval",
+        help="Minimum seconds between queued scans of the same folder. (Default: %(default)s)")
+
+    subparser.add_argument(
+        "--rate", action="store", type=float, default=2., metavar="N", dest="rate",
+        help="Maximum queued scan requests sent per second. (Default: %(default)s)")
     return subparser_action, subparser
 
 @_add_docstring
 def check(subparser_action):
-    msg = "Check if the configuration file matches the running server."
+    msg = "Check if the configuration file matches the running server. " + \
+        "All differences of folders and devices are reported; the exit code " + \
+        "is 1 if there is any."
     subparser = subparser_action.add_parser("check", description=msg, help=msg)
     subparser.set_defaults(func=subcommands.check)
+
+    return subparser_action, subparser
+
+@_add_docstring
+def status(subparser_action):
+    msg = "Show the status of every folder and its completion on every " + \
+        "device sharing it. Requests are sent concurrently."
+    subparser = subparser_action.add_parser("status", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.status)
+
+    subparser.add_argument(
+        "folders", action="store", nargs="*", metavar="FOLDER",
+        help="IDs of folders to show. (Default: all folders)")
+    subparser.add_argument(
+        "-j", "--jobs", action="store", type=int, default=16, metavar="N", dest="jobs",
+        help="Number of concurrent requests. (Default: %(default)s)")
+    return subparser_action, subparser
+
+@_add_docstring
+def diff(subparser_action):
+    msg = "Compare a directory in a monitored folder with the server's index " + \
+        "(`/db/browse`) and print one JSON line per difference: files or " + \
+        "directories only in the index (missing) or only on the disk " + \
+        "(extra), and different types, sizes, or modification times. Files " + \
+        "ignored through .stignore are reported as extra. The exit code is 1 " + \
+        "if there is any difference."
+    subparser = subparser_action.add_parser("diff", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.diff)
+
+    subparser.add_argument(
+        "path", action="store", type=str, metavar="PATH",
+        help="A directory in a monitored folder.")
+    subparser.add_argument(
+        "-j", "--jobs", action="store", type=int, default=8, metavar="N", dest="jobs",
+        help="Number of threads listing local directories. (Default: %(default)s)")
+    subparser.add_argument(
+        "--mtime-window", action="store", type=float, default=0., metavar="SECONDS",
+        dest="mtime_window",
+        help="Allowed difference of modification times, e.g., 2 for FAT file " + \
+        "systems. (Default: %(default)s)")
     return subparser_action, subparser
 
 @_add_docstring
 def get(subparser_action):
-    msg = "Send a GET request to server. This command is useful for debugging."
+    msg = "Send GET requests to server. This command is useful for debugging. " + \
+        "Several `ENDPOINT key=value ...` groups can be given, or read from " + \
+        "stdin with `-`; they are sent concurrently and each result is " + \
+        "printed as one JSON line tagged with its endpoint and parameters."
     subparser = subparser_action.add_parser("get", description=msg, help=msg)
     subparser.set_defaults(func=subcommands.get)
 
+    subparser.add_argument(
+        "--stream", action="store_true",
+        help="Parse the response while downloading it and print one JSON record "
+        "per line (e.g., one per file for /db/browse and /db/need), so memory "
+        "use does not grow with the response size. Must precede ENDPOINT.")
+
+    subparser.add_argument(
+        "-j", "--jobs", action="store", type=int, default=8, metavar="N", dest="jobs",
+        help="Number of concurrent requests for several endpoints. "
+        "(Default: %(default)s) Must precede ENDPOINT.")
+
     subparser.add_argument(
         "endpoint", action="store", type=str, metavar="ENDPOINT",
-        help="The GET api endpoint. Options: %(choices)s.",
-        choices=subcommands.SyncthingSession._get_apis)
+        help="The GET api endpoint, or - to read one request per line from stdin "
+        "(`ENDPOINT key=value ...` or {\"endpoint\": ..., \"params\": {...}}). "
+        "Options: %(choices)s.",
+        choices=SyncthingConfig._get_apis + ["-"])
 
     subparser.add_argument(
         "args", action="store", type=str, metavar="ARGS", nargs=argparse.REMAINDER,
-        help="Parameters of the API endpoint.")
+        help="Parameters of the API endpoint, optionally followed by more "
+        "endpoints and their parameters.")
     return subparser_action, subparser
 
 @_add_docstring
@@ -89,9 +206,134 @@ def post(subparser_action):
     subparser.add_argument(
         "endpoint", action="store", type=str, metavar="ENDPOINT",
         help="The POST api endpoint. Options: %(choices)s.",
-        choices=subcommands.SyncthingSession._post_apis)
+        choices=SyncthingConfig._post_apis)
 
     subparser.add_argument(
         "args", action="store", type=str, metavar="ARGS", nargs=argparse.REMAINDER,
         help="Parameters of the API endpoint.")
     return subparser_action, subparser
+
+@_add_docstring
+def events(subparser_action):
+    msg = "Stream server events as NDJSON (one JSON object per line)."
+    subparser = subparser_action.add_parser("events", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.events)
+
+    subparser.add_argument(
+        "--since", action="store", type=int, default=None, metavar="ID",
+        help="Only show events after this event ID. (Default: the ID in the "
+        "cursor file, or 0)")
+
+    subparser.add_argument(
+        "--limit", action="store", type=int, default=None, metavar="N",
+        help="Only get the latest N events of each poll; older events are skipped.")
+
+    subparser.add_argument(
+        "--events", action="store", type=str, default=None, metavar="TYPES",
+        help="Comma-separated event types to show, e.g., `FolderSummary,ItemFinished`.")
+
+    subparser.add_argument(
+        "--cursor", action="store", type=pathlib.Path, default=None, metavar="FILE",
+        help="A file keeping the last event ID, so a restarted consumer resumes "
+        "from where it stopped.")
+
+    subparser.add_argument(
+        "--poll-timeout", action="store", type=int, default=60, metavar="SECONDS",
+        help="How long the server holds a poll if no new events. (Default: %(default)s)",
+        dest="poll_timeout")
+
+    subparser.add_argument(
+        "--once", action="store_true",
+        help="Exit after one poll instead of streaming forever.")
+    return subparser_action, subparser
+
+@_add_docstring
+def watch_scan(subparser_action):
+    msg = "Watch directories/files and scan changed ones in batches."
+    subparser = subparser_action.add_parser("watch-scan", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.watch_scan)
+
+    subparser.add_argument(
+        "paths", action="store", type=str, metavar="PATH", nargs="*",
+        help="Directories to watch. (Default: all monitored folders)")
+
+    subparser.add_argument(
+        "--delay", action="store", type=float, default=1.0, metavar="SECONDS",
+        help="Scan after no new changes for this long. (Default: %(default)s)")
+
+    subparser.add_argument(
+        "--max-delay", action="store", type=float, default=10.0, metavar="SECONDS",
+        help="Scan at least this often under continuous changes. (Default: %(default)s)",
+        dest="max_delay")
+
+    subparser.add_argument(
+        "--max-subs", action="store", type=int, default=100, metavar="N",
+        help="Collapse changed paths of a folder to their common ancestors until "
+        "there are at most N of them. (Default: %(default)s)", dest="max_subs")
+
+    subparser.add_argument(
+        "--poll", action="store_true",
+        help="Poll the file system instead of using inotify.")
+
+    subparser.add_argument(
+        "--interval", action="store", type=float, default=2.0, metavar="SECONDS",
+        help="Seconds between two polls when polling. (Default: %(default)s)")
+    return subparser_action, subparser
+
+@_add_docstring
+def serve(subparser_action):
+    msg = "Run a daemon holding a warm session to the server. Other subcommands " + \
+        "forward their requests to it through a Unix socket when it is running."
+    subparser = subparser_action.add_parser("serve", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.serve)
+    return subparser_action, subparser
+
+@_add_docstring
+def cache(subparser_action):
+    msg = "Show statistics of the on-disk cache of GET responses."
+    subparser = subparser_action.add_parser("cache", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.cache)
+
+    subparser.add_argument(
+        "--clear", action="store_true", dest="clear",
+        help="Drop all cached responses and reset the counters.")
+    return subparser_action, subparser
+
+@_add_docstring
+def config(subparser_action):
+    msg = "Change the server's configuration."
+    subparser = subparser_action.add_parser("config", description=msg, help=msg)
+    commands = subparser.add_subparsers(dest="config_cmd", metavar="<ACTION>", required=True)
+
+    msg = "Apply a list of edits with one GET and at most one POST of the " + \
+        "configuration. Edits are JSON objects, e.g., " + \
+        "{\"op\": \"set\", \"path\": \"folders[id=abc].label\", \"value\": \"A\"}, " + \
+        "{\"op\": \"pause\", \"folder\": \"abc\"}, or " + \
+        "{\"op\": \"add-device\", \"folder\": \"abc\", \"device\": \"ID\"}; " + \
+        "ops are set, unset, pause, resume, add-device, and remove-device."
+    apply = commands.add_parser("apply", description=msg, help=msg)
+    apply.set_defaults(func=subcommands.config_apply)
+
+    apply.add_argument(
+        "file", action="store", type=str, nargs="?", default="-", metavar="FILE",
+        help="A JSON array of edits or one edit per line; - for stdin. (Default: -)")
+    apply.add_argument(
+        "-n", "--dry-run", action="store_true", dest="dry_run",
+        help="Print the diff of the configuration without posting it.")
+    return subparser_action, subparser
+
+@_add_docstring
+def batch(subparser_action):
+    msg = "Run many subcommands, one per line (e.g., `get /system/version`), " + \
+        "in one process with one session. Global options of `batch` apply " + \
+        "to all lines; lines with their own --config, --url, --api-key, " + \
+        "--cache-dir, or --cache get sessions of their own. A failed line is reported to stderr without aborting " + \
+        "the rest; the exit code is 1 if any line failed."
+    subparser = subparser_action.add_parser("batch", description=msg, help=msg)
+    subparser.set_defaults(func=subcommands.batch)
+
+    subparser.add_argument(
+        "file", action="store", type=str, nargs="?", default="-", metavar="FILE",
+        help="A file of subcommands, one per line; - for stdin. Blank lines " +
+        "and lines starting with # are skipped. (Default: -)")
+    return subparser_action, subparser
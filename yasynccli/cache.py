@@ -0,0 +1,232 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Provides ResponseCache, an on-disk TTL cache of GET responses.
+
+The cache is an SQLite database, so it is shared by all processes using the
+same file, and by the threads of the daemon. Only GET endpoints with a TTL are
+cached, and POST requests to mutating endpoints invalidate the related GET
+endpoints. The database is opened on first use; if it can not be opened, a
+warning is logged and requests go to the server as if there were no cache.
+"""
+import os
+import time
+import json
+import pathlib
+import sqlite3
+import logging
+import threading
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.cache")
+logger.addHandler(logging.NullHandler())
+
+class ResponseCache:
+    """An on-disk TTL cache of GET responses with LRU eviction.
+
+    Constructor args:
+    -----------------
+        path: a str or Path object of the SQLite database file.
+        ttls: a dict of {GET endpoint: TTL in seconds}; supersede the defaults.
+        max_bytes: an int; the maximum total size of cached bodies.
+    """
+
+    # TTLs in seconds of idempotent GET endpoints; others are never cached
+    ttls = {
+        "/system/config": 10, "/system/config/insync": 10, "/system/version": 300,
+        "/svc/deviceid": 3600, "/svc/lang": 3600, "/stats/folder": 10,
+        "/stats/device": 10,
+    }
+
+    # GET endpoints invalidated by POST endpoints; None means everything
+    invalidates = {
+        "/system/config": ["/system/config", "/system/config/insync", "/stats/folder", "/stats/device"],
+        "/system/pause": ["/system/config", "/system/config/insync"],
+        "/system/resume": ["/system/config", "/system/config/insync"],
+        "/system/upgrade": ["/system/version"],
+        "/system/reset": None, "/system/restart": None, "/system/shutdown": None,
+    }
+
+    def __init__(self, path, ttls=None, max_bytes=16*1024*1024):
+        self._path = pathlib.Path(path).expanduser()
+        self._max_bytes = max_bytes
+        self.hits, self.misses = 0, 0
+
+        if ttls is not None:
+            self.ttls = dict(self.ttls, **ttls)
+
+        # the daemon's threads share one connection, serialized by the lock
+        self._lock = threading.Lock()
+        self._db = None # opened on first use
+        self._failed = False
+
+    def _database(self):
+        """Get the database connection, opening it if needed; call with the lock held.
+
+        Returns:
+        --------
+            A sqlite3.Connection, or None if the database can not be opened.
+        """
+
+        if self._db is not None or self._failed:
+            return self._db
+
+        try:
+            # the cache may hold API-key-protected data, so only the owner can read it
+            self._path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd = os.open(self._path, os.O_CREAT | os.O_RDWR, 0o600)
+            os.close(fd)
+
+            db = sqlite3.connect(
+                str(self._path), timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+                "endpoint TEXT, expires REAL, accessed REAL, status INTEGER, "
+                "headers TEXT, body BLOB, size INTEGER)")
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+            db.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+        except (OSError, sqlite3.Error) as err:
+            logger.warning("Not using the response cache {}: {}".format(self._path, err))
+            self._failed = True
+            return None
+
+        self._db = db
+        return db
+
+    def ttl(self, endpoint):
+        """The TTL in seconds of a GET endpoint; 0 if it is not cacheable."""
+        return self.ttls.get(endpoint, 0)
+
+    def get(self, key):
+        """Get a cached response.
+
+        Args:
+        -----
+            key: a str; usually the full URL.
+
+        Returns:
+        --------
+            (status code, headers dict, body bytes), or None if not cached or
+            expired.
+        """
+
+        now = time.time()
+        with self._lock:
+            if self._database() is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT status, headers, body FROM responses WHERE key = ? AND expires > ?",
+                (key, now)).fetchone()
+
+            name = "misses" if row is None else "hits"
+            setattr(self, name, getattr(self, name) + 1)
+            self._db.execute("UPDATE stats SET value = value + 1 WHERE name = ?", (name,))
+
+            if row is None:
+                logger.debug("Cache miss: {}".format(key))
+                return None
+
+            logger.debug("Cache hit: {}".format(key))
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return row[0], json.loads(row[1]), row[2]
+
+    def put(self, endpoint, key, status, headers, body):
+        """Cache a response and evict least recently used ones if too large.
+
+        Args:
+        -----
+            endpoint: a str; the GET endpoint, e.g., "/system/config".
+            key: a str; usually the full URL.
+            status: an int; the status code.
+            headers: a dict of response headers.
+            body: bytes.
+        """
+
+        now = time.time()
+        with self._lock:
+            if self._database() is None:
+                return
+
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, now + self.ttl(endpoint), now, status,
+                     json.dumps(dict(headers)), body, len(body)))
+                self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+
+                total = self._db.execute("SELECT TOTAL(size) FROM responses").fetchone()[0]
+                if total > self._max_bytes:
+                    rows = self._db.execute(
+                        "SELECT key, size FROM responses ORDER BY accessed").fetchall()
+                    for old, size in rows:
+                        if total <= self._max_bytes:
+                            break
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (old,))
+                        total -= size
+
+    def invalidate(self, endpoint):
+        """Drop cached responses affected by a POST endpoint.
+
+        Args:
+        -----
+            endpoint: a str; the POST endpoint, e.g., "/system/config".
+        """
+
+        if endpoint not in self.invalidates:
+            return
+
+        targets = self.invalidates[endpoint]
+        logger.debug("Invalidating {} due to POST {}".format(targets or "all", endpoint))
+
+        with self._lock:
+            if self._database() is None:
+                return
+
+            if targets is None:
+                self._db.execute("DELETE FROM responses")
+            else:
+                self._db.executemany(
+                    "DELETE FROM responses WHERE endpoint = ?", [(target,) for target in targets])
+
+    def stats(self):
+        """Get the counters shared by all processes.
+
+        Returns:
+        --------
+            A dict of `hits`, `misses`, `entries`, and `bytes`.
+        """
+
+        with self._lock:
+            self._required()
+            results = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            results["entries"], results["bytes"] = self._db.execute(
+                "SELECT COUNT(*), TOTAL(size) FROM responses WHERE expires > ?",
+                (time.time(),)).fetchone()
+        results["bytes"] = int(results["bytes"])
+        return results
+
+    def clear(self):
+        """Drop all cached responses and reset the counters."""
+        with self._lock:
+            self._required()
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("UPDATE stats SET value = 0")
+
+    def _required(self):
+        """Open the database for commands managing the cache; raise if it can't."""
+        if self._database() is None:
+            raise RuntimeError("Can not open the response cache {}.".format(self._path))
+
+    def close(self):
+        """Close the database if it has been opened."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
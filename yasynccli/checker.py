@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Compare a config file with the configuration of a running server.
+
+Both sides are turned into model.ConfigModel objects, folders and devices are
+matched by their IDs with dict/set operations, and all differences are
+reported at once. Paths are compared as normalized strings first; the file
+system is only consulted (to resolve symbolic links) when the strings differ.
+"""
+import os
+import pathlib
+
+def _normpath(path):
+    """Normalize a path without touching the file system."""
+    return os.path.normpath(os.path.expanduser(path))
+
+def _same_path(resolved, raw, live):
+    """Whether a folder's path in the config file is the same as the server's.
+
+    Args:
+    -----
+        resolved: a Path object; the resolved path from the config file.
+        raw: a str; the path as written in the config file.
+        live: a str; the path from the server.
+    """
+
+    if _normpath(raw) == _normpath(live) or str(resolved) == _normpath(live):
+        return True
+
+    return resolved == pathlib.Path(live).expanduser().resolve()
+
+def compare(config, live):
+    """Find all differences between a config file and a running server.
+
+    Args:
+    -----
+        config: a SyncthingConfig.
+        live: a dict (JSON) returned by GET `/system/config`.
+
+    Returns:
+    --------
+        A list of dicts with keys `kind` ("folder" or "device"), `id`, `field`,
+        `config`, and `server`. `field` is None if the folder/device only exists
+        on one side, in which case the other side's value is None. For
+        "devices" of folders, `config` and `server` are the device IDs only
+        shared on that side.
+    """
+
+    from .model import ConfigModel
+
+    ours, theirs = config.model, ConfigModel.from_json(live)
+    diffs = []
+
+    # folders
+    folders, live_folders = ours.folders_by_id, theirs.folders_by_id
+
+    for folder_id in sorted(folders.keys() - live_folders.keys()):
+        diffs.append({
+            "kind": "folder", "id": folder_id, "field": None,
+            "config": folders[folder_id].path, "server": None})
+
+    for folder_id in sorted(live_folders.keys() - folders.keys()):
+        diffs.append({
+            "kind": "folder", "id": folder_id, "field": None, "config": None,
+            "server": live_folders[folder_id].path})
+
+    for folder_id in sorted(folders.keys() & live_folders.keys()):
+        folder, live_folder = folders[folder_id], live_folders[folder_id]
+
+        if folder.label != live_folder.label:
+            diffs.append({
+                "kind": "folder", "id": folder_id, "field": "label",
+                "config": folder.label, "server": live_folder.label})
+
+        if not _same_path(folder.resolved, folder.path, live_folder.path):
+            diffs.append({
+                "kind": "folder", "id": folder_id, "field": "path",
+                "config": folder.path, "server": live_folder.path})
+
+        shared, live_shared = set(folder.devices), set(live_folder.devices)
+        if shared != live_shared:
+            diffs.append({
+                "kind": "folder", "id": folder_id, "field": "devices",
+                "config": sorted(shared - live_shared),
+                "server": sorted(live_shared - shared)})
+
+    # devices
+    devices, live_devices = ours.devices_by_id, theirs.devices_by_id
+
+    for device_id in sorted(devices.keys() - live_devices.keys()):
+        diffs.append({
+            "kind": "device", "id": device_id, "field": None,
+            "config": devices[device_id].name, "server": None})
+
+    for device_id in sorted(live_devices.keys() - devices.keys()):
+        diffs.append({
+            "kind": "device", "id": device_id, "field": None, "config": None,
+            "server": live_devices[device_id].name})
+
+    for device_id in sorted(devices.keys() & live_devices.keys()):
+        if devices[device_id].name != live_devices[device_id].name:
+            diffs.append({
+                "kind": "device", "id": device_id, "field": "name",
+                "config": devices[device_id].name, "server": live_devices[device_id].name})
+
+    return diffs
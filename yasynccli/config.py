@@ -0,0 +1,425 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Provides SyncthingConfig class.
+"""
+import os
+import re
+import json
+import zlib
+import pathlib
+import logging
+import urllib.parse
+from . import instrument
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.config")
+logger.addHandler(logging.NullHandler())
+
+# bump this when the content of cached config files changes
+_CACHE_VERSION = 4
+
+def _bool(text, default):
+    """Convert a boolean in config.xml; the default if missing."""
+    return default if text is None else text.strip().lower() == "true"
+
+def _int(text, default):
+    """Convert an integer in config.xml; the default if missing."""
+    return default if text is None else int(text)
+
+def _parse_config(path):
+    """Parse a Syncthing config file.
+
+    The file is parsed incrementally, and only the `gui`, `options`, `folder`,
+    and `device` elements are kept. Other elements are discarded as soon as
+    they are parsed.
+
+    Args:
+    -----
+        path: a Path object of the config file.
+
+    Returns:
+    --------
+        A dict in the format of GET `/system/config` (see model.ConfigModel)
+        with keys `gui`, `options`, `folders`, and `devices`, and only the
+        fields the model uses. Folder paths are not resolved here; the model
+        resolves them on first use.
+    """
+
+    import xml.etree.ElementTree
+
+    logger.debug("Parsing {}.".format(path))
+
+    info = {"gui": {}, "options": {}, "folders": [], "devices": []}
+    root, depth = None, 0
+
+    for event, elem in xml.etree.ElementTree.iterparse(path, ("start", "end")):
+        if event == "start":
+            root = elem if root is None else root
+            depth += 1
+            continue
+
+        depth -= 1
+
+        # only handle direct children of the root element
+        if depth != 1:
+            continue
+
+        attrib = elem.attrib
+        if elem.tag == "gui":
+            info["gui"] = {
+                "address": elem.findtext("address"), "apiKey": elem.findtext("apikey"),
+                "useTLS": _bool(attrib.get("tls"), False),
+                "enabled": _bool(attrib.get("enabled"), True)}
+        elif elem.tag == "options":
+            info["options"] = {
+                "listenAddresses": [e.text for e in elem.iterfind("listenAddress")] or ["default"],
+                "globalAnnounceEnabled": _bool(elem.findtext("globalAnnounceEnabled"), True),
+                "localAnnounceEnabled": _bool(elem.findtext("localAnnounceEnabled"), True),
+                "relaysEnabled": _bool(elem.findtext("relaysEnabled"), True),
+                "startBrowser": _bool(elem.findtext("startBrowser"), True),
+                "maxSendKbps": _int(elem.findtext("maxSendKbps"), 0),
+                "maxRecvKbps": _int(elem.findtext("maxRecvKbps"), 0)}
+        elif elem.tag == "folder":
+            info["folders"].append({
+                "id": attrib["id"], "label": attrib.get("label", ""), "path": attrib["path"],
+                "type": attrib.get("type", "sendreceive"),
+                "rescanIntervalS": _int(attrib.get("rescanIntervalS"), 3600),
+                "fsWatcherEnabled": _bool(attrib.get("fsWatcherEnabled"), True),
+                "paused": _bool(elem.findtext("paused"), False),
+                "devices": [{"deviceID": e.attrib["id"]} for e in elem.iterfind("device")]})
+        elif elem.tag == "device":
+            info["devices"].append({
+                "deviceID": attrib["id"], "name": attrib.get("name", ""),
+                "addresses": [e.text for e in elem.iterfind("address")],
+                "compression": attrib.get("compression", "metadata"),
+                "introducer": _bool(attrib.get("introducer"), False),
+                "paused": _bool(elem.findtext("paused"), False)})
+
+        root.clear()
+
+    return info
+
+def _read_config(path, cache=None):
+    """Read a Syncthing config file through a parsed-config cache.
+
+    A cache entry is valid only if the config file's path, mtime, size, and
+    inode are all the same as when the entry was created.
+
+    Args:
+    -----
+        path: a resolved Path object of the config file.
+        cache: a str or Path object of the cache directory; None to disable.
+
+    Returns:
+    --------
+        The same dict as `_parse_config` returns.
+    """
+
+    if cache is None:
+        return _parse_config(path)
+
+    stat = os.stat(path)
+    key = [str(path), stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+    cache = pathlib.Path(cache).expanduser()
+    # collisions are harmless since the full path is part of the key
+    target = cache.joinpath("config-{:08x}.json".format(zlib.crc32(str(path).encode())))
+
+    try:
+        with open(target, "r") as f:
+            data = json.load(f)
+        if data["version"] == _CACHE_VERSION and data["key"] == key:
+            logger.debug("Using cached config {}.".format(target))
+            return data["info"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    import tempfile
+    info = _parse_config(path)
+
+    # the cache holds the API key, so only the owner can read it
+    try:
+        cache.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache, prefix=".config-")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": _CACHE_VERSION, "key": key, "info": info}, f)
+        os.replace(tmp, target)
+    except OSError as err:
+        logger.warning("Failed to cache config to {}: {}".format(target, err))
+
+    return info
+
+def socket_path(config, url=None, apikey=None, cache=None):
+    """Get the default socket path of the daemon serving a config.
+
+    Each combination of config file, URL, and API key gets its own daemon, so a
+    client never talks to a daemon serving another Syncthing instance.
+
+    Args:
+    -----
+        config: a str or Path object of the path to a config file.
+        url: a str or None; the alternative address to server.
+        apikey: a str or None; the alternative API key.
+        cache: a str or Path object of the directory holding the socket.
+
+    Returns:
+    --------
+        A pathlib.Path.
+    """
+
+    key = "\0".join([str(config), str(url), str(apikey)]).encode()
+    cache = pathlib.Path(cache).expanduser()
+    return cache.joinpath("daemon-{:08x}.sock".format(zlib.crc32(key)))
+
+class SyncthingConfig:
+    """Syncthing configuration holder.
+
+    SyncthingConfig parses Syncthing's configuration XML file and holds info for
+    communication with the Syncthing server, i.e., the server address, the API
+    key, the monitored folders, and the legal REST API endpoints. It does not
+    talk to the server, so it is cheap to import and to create. Session classes
+    derive from it and add the transport.
+
+    Without a config file, both `url` and `apikey` are required, and folders
+    and devices come from `_live_config`, which only sessions implement.
+
+    Construcgtor args:
+    ------------------
+        config: a str or Path object of the path to a config file; or None.
+        url: a str; address to server; supersede the one in the config file.
+        apikey: a str; API Key; supersede the one in the config file.
+        cache: a str or Path object of a directory to cache parsed config files
+            in; None to disable caching.
+    """
+
+    # legal GET APIs
+    _get_apis = [
+        "/system/browse", "/system/config", "/system/config/insync",
+        "/system/connections", "/system/debug", "/system/discovery",
+        "/system/error", "/system/log", "/system/ping", "/system/status",
+        "/system/upgrade", "/system/version", "/db/browse", "/db/completion",
+        "/db/file", "/db/ignores", "/db/need", "/db/status", "/events",
+        "/stats/device", "/stats/folder", "/svc/deviceid", "/svc/lang",
+        "/svc/random/string", "/svc/report"
+    ]
+
+    # legal POST APIs
+    _post_apis = [
+        "/system/config", "/system/debug", "/system/discovery",
+        "/system/error/clear", "/system/error", "/system/pause", "/system/ping",
+        "/system/reset", "/system/restart", "/system/resume", "/system/shutdown",
+        "/system/upgrade", "/db/ignores", "/db/override", "/db/prio",
+        "/db/revert", "/db/scan"
+    ]
+
+
+    @instrument.wrap("config")
+    def __init__(self, config, url=None, apikey=None, cache=None):
+        """SyncthingConfig constructor.
+
+        Args:
+        -----
+            config: a str or Path object of the path to a config file; None to
+                use `url` and `apikey` only.
+            url: a str; address to server; supersede the one in the config file.
+            apikey: a str; API Key; supersede the one in the config file.
+            cache: a str or Path object of a directory to cache parsed config
+                files in; None to disable caching.
+        """
+
+        logger.debug("Initializing a SyncthingConfig instance.")
+
+        # read and parse the config file
+        if config is None:
+            if url is None or apikey is None:
+                raise RuntimeError("Both the URL and the API key are required without a config file.")
+            self._config, info = None, {"gui": {}}
+        else:
+            self._config = pathlib.Path(config).resolve()
+            info = _read_config(self._config, cache)
+
+        # get url and apikey from GUI info
+        self._url = info["gui"].get("address") if url is None else url
+
+        # a Unix-domain socket, e.g., unix:///var/run/syncthing.sock
+        match = re.search(r"^unix://(?P<socket>/.*)$", self._url)
+        if match is not None:
+            self._socket = match.group("socket")
+            self._host, self._port, self._proto = "localhost", None, "http+unix"
+
+        # to consider some possible ways to specify URL
+        else:
+            pattern = r"(?://|(?P<proto>.*)://|)(?P<host>.*):(?P<port>\d+?)(?:$|/)"
+            match = re.search(pattern, self._url)
+            self._host, self._port = match.group("host"), match.group("port")
+            self._proto = "http" if match.group("proto") is None else match.group("proto")
+            self._socket = None
+
+        # api key
+        self._apikey = info["gui"].get("apiKey") if apikey is None else apikey
+
+        # the model and the folder trie are built on first use; e.g., `scan` of
+        # a few paths does not need device objects
+        self._info = info
+        self._model = None
+        self._folder_trie = None
+
+        logger.debug("Done initializing a SyncthingConfig instance.")
+
+    def __repr__(self): # overriding __repr__
+
+        logger.debug("Preparing __repr__ string")
+
+        col1 = "{:28s}"
+        idnt = "  "
+
+        s = "\n"
+        s += col1.format("[Config path]") + "\n\n"
+        s += idnt + str(self.config) + "\n"
+
+        s += "\n"
+        s += col1.format("[GUI info]") + "\n\n"
+        s += col1.format(idnt+"Address: ") + self.url + "\n"
+        s += col1.format(idnt+"API Key: ") + self.apikey + "\n"
+
+        s += "\n"
+        s += col1.format("[Folders]") +"\n"
+        for key, value in self.folders.items():
+            s += "\n"
+            s += col1.format(idnt+"- "+str(key)) + "\n"
+            s += "{}{}ID: {}\n".format(idnt, idnt, value["id"])
+            s += "{}{}Label: {}\n".format(idnt, idnt, value["label"])
+
+        logger.debug("Done preparing __repr__ string")
+
+        return s
+
+    @property
+    def config(self): # read-only attribute
+        """Path to the config file saved in this instance; None if no file."""
+        return self._config
+
+    @property
+    def url(self, *args): # read-only attribute
+        """Syncthing GUI server address.
+
+        For a Unix-domain socket, the socket path is percent-encoded as the host,
+        e.g., http+unix://%2Fvar%2Frun%2Fsyncthing.sock.
+        """
+        if self._socket is not None:
+            return "{}://{}".format(self._proto, urllib.parse.quote(self._socket, safe=""))
+        return "{}://{}:{}".format(self._proto, self._host, self._port)
+
+    @property
+    def apikey(self): # read-only attribute
+        """API key saved in this instance."""
+        return self._apikey
+
+    @property
+    def model(self): # read-only attribute
+        """The model.ConfigModel of the config file, built on first use.
+
+        Without a config file, it is the server's configuration instead.
+        """
+
+        if self._model is None:
+            from .model import ConfigModel
+            if self._config is None: # paths on the server's machine
+                self._model = ConfigModel.from_json(self._live_config())
+            else:
+                self._model = ConfigModel.from_json(self._info, resolve=True)
+            self._info = None
+        return self._model
+
+    def _live_config(self):
+        """Get the server's configuration in the format of GET `/system/config`.
+
+        Session classes override this; SyncthingConfig does not talk to the
+        server.
+        """
+        raise RuntimeError("Folders and devices are unknown without a config file.")
+
+    @property
+    def folders(self): # read-only attribute
+        """Folders stored in this instance; {resolved Path: model.Folder}."""
+        return self.model.folders_by_path
+
+    @property
+    def devices(self): # read-only attribute
+        """Devices stored in this instance; {device ID: model.Device}."""
+        return self.model.devices_by_id
+
+    def resolve_folder(self, path):
+        """Find the deepest monitored folder containing a path.
+
+        Args:
+        -----
+            path: a str or Path object of an absolute path; symbolic links should
+                have been resolved because folder paths in this instance are.
+
+        Returns:
+        --------
+            folder: a str; the ID of the monitored folder.
+            sub: a str or None; the path relative to the folder; None if the
+                path is the folder itself.
+        """
+
+        parts = pathlib.Path(os.path.abspath(os.path.expanduser(path))).parts
+
+        # a path-component trie for finding the deepest folder containing a path
+        if self._folder_trie is None:
+            self._folder_trie = {}
+            for folder in self.model.folders:
+                node = self._folder_trie
+                for part in folder.resolved.parts:
+                    node = node.setdefault(part, {})
+                node[None] = folder.id
+
+        # walk down the trie and remember the deepest folder seen on the way
+        node, folder, depth = self._folder_trie, None, 0
+        for i, part in enumerate(parts):
+            try:
+                node = node[part]
+            except KeyError:
+                break
+
+            if None in node:
+                folder, depth = node[None], i + 1
+
+        if folder is None:
+            raise ValueError("{} does not belong to any monitored folder.".format(path))
+
+        sub = None if depth == len(parts) else str(pathlib.PurePath(*parts[depth:]))
+        return folder, sub
+
+    def _rest_url(self, method, apis, *args):
+        """Build the full URL of a REST API endpoint after checking it.
+
+        Args:
+        -----
+            method: a str; the HTTP method, used in the error message only.
+            apis: a list of str; legal endpoints of this method.
+            args: positional arguments; each one represents a fregment in the
+                REST API endpoint URL.
+
+        Returns:
+        --------
+            A str of the full URL.
+        """
+
+        action = ""
+        for arg in args:
+            action += "/{}".format(arg.strip("/"))
+
+        # check if the api is ligal
+        if not action in apis:
+            logger.error("{} is not a legal {} endpoint.".format(action, method))
+            raise RuntimeError("{} is not a legal {} endpoint.".format(action, method))
+
+        return self.url + "/rest" + action
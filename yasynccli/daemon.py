@@ -0,0 +1,332 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""A long-lived client daemon and its Unix-socket front end.
+
+The daemon holds a warm SyncthingSession (parsed config and keep-alive
+connections to the Syncthing server) and listens on a Unix socket. Clients send
+one JSON object per line describing a GET/POST request, and the daemon replies
+with one JSON object per line describing the response.
+
+Request:
+    {"method": "GET", "endpoint": "/system/log", "params": [[key, value], ...],
+     "json": null, "timeout": 60, "cache": true}
+
+Response:
+    {"status": 200, "reason": "OK", "url": "...", "headers": {...}, "body": "...",
+     "cached": false}
+    or, if the request could not be sent to the server,
+    {"error": "ConnectionError", "message": "..."}
+"""
+import os
+import json
+import time
+import socket
+import pathlib
+import logging
+from . import instrument
+from .config import SyncthingConfig
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.daemon")
+logger.addHandler(logging.NullHandler())
+
+def _exception(name):
+    """Get the exception class of a name in a daemon's error reply.
+
+    Exceptions of `requests` come first, then built-in ones, e.g., ValueError;
+    other names give RuntimeError.
+    """
+
+    import builtins
+    import requests
+
+    cls = getattr(requests.exceptions, name, None) or getattr(builtins, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls
+    return RuntimeError
+
+class DaemonResponse:
+    """A minimal requests.Response look-alike built from a daemon reply.
+
+    Constructor args:
+    -----------------
+        reply: a dict; the decoded reply from the daemon.
+    """
+
+    def __init__(self, reply):
+        self.status_code = reply["status"]
+        self.reason = reply["reason"]
+        self.url = reply["url"]
+        self.headers = reply["headers"]
+        self.text = reply["body"]
+
+    @property
+    def ok(self):
+        """Whether the status code is less than 400."""
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        """The body in bytes."""
+        return self.text.encode("utf-8")
+
+    @instrument.wrap("json")
+    def json(self, **kwargs):
+        """Decode the JSON body."""
+        return json.loads(self.text, **kwargs)
+
+    def raise_for_status(self):
+        """Raise requests.exceptions.HTTPError for 4xx and 5xx status codes."""
+
+        if self.ok:
+            return
+
+        import requests
+        kind = "Client" if self.status_code < 500 else "Server"
+        raise requests.exceptions.HTTPError(
+            "{} {} Error: {} for url: {}".format(
+                self.status_code, kind, self.reason, self.url), response=self)
+
+class DaemonSession(SyncthingConfig):
+    """A session forwarding GET/POST requests to a running daemon.
+
+    DaemonSession has the same configuration attributes and the same `get` and
+    `post` signatures as SyncthingSession, but it does not import `requests` or
+    open connections to the Syncthing server by itself.
+
+    Constructor args:
+    -----------------
+        sock: a connected socket.socket to the daemon.
+        config: a str or Path object of the path to a config file.
+        url: a str; address to server; supersede the one in the config file.
+        apikey: a str; API Key; supersede the one in the config file.
+        cache: a str or Path object of a directory to cache parsed config files
+            in; None to disable caching.
+    """
+
+    def __init__(self, sock, config, url=None, apikey=None, cache=None):
+        super(DaemonSession, self).__init__(config, url, apikey, cache)
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, path, config, url=None, apikey=None, cache=None):
+        """Connect to a daemon.
+
+        Args:
+        -----
+            path: a str or Path object of the daemon's socket.
+            config, url, apikey, cache: see the constructor.
+
+        Returns:
+        --------
+            A DaemonSession, or None if no daemon listens on the socket.
+        """
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            sock.close()
+            return None
+
+        logger.debug("Connected to daemon at {}.".format(path))
+        return cls(sock, config, url, apikey, cache)
+
+    def _request(self, method, action, params=None, timeout=None, **kwargs):
+        """Send a request to the daemon and wait for the reply."""
+
+        body = kwargs.pop("json", None)
+        use_cache = kwargs.pop("cache", True)
+
+        if kwargs:
+            raise NotImplementedError(
+                "Arguments not supported by the daemon: {}".format(", ".join(kwargs)))
+
+        if isinstance(params, dict):
+            params = list(params.items())
+
+        request = {
+            "method": method, "endpoint": action, "params": params, "json": body,
+            "timeout": timeout, "cache": use_cache}
+
+        start = time.perf_counter()
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+
+        # `requests` is only imported for errors, raised as a SyncthingSession would
+        line = self._file.readline()
+        if not line:
+            raise _exception("ConnectionError")("The daemon closed the connection.")
+
+        try:
+            reply = json.loads(line)
+        except ValueError as err:
+            raise _exception("ConnectionError")("Invalid reply from the daemon: {}".format(err))
+
+        if instrument.enabled() and "error" not in reply:
+            instrument.emit(
+                "request", time.perf_counter()-start, method=method,
+                endpoint="/"+action, status=reply["status"],
+                cached=reply.get("cached", False))
+
+        # re-raise errors of the daemon as the exceptions a SyncthingSession raises
+        if "error" in reply:
+            raise _exception(reply["error"])(reply["message"])
+
+        return DaemonResponse(reply)
+
+    def get(self, *args, **kwargs):
+        """GET method forwarded to the daemon.
+
+        Args:
+        -----
+            args: positional arguments; each one represents a fregment in the
+                REST API endpoint URL.
+            kwargs: `params`, `json`, `timeout`, and `cache`.
+
+        Returns:
+        --------
+            A DaemonResponse.
+        """
+        self._rest_url("GET", self._get_apis, *args) # only to check the endpoint
+        return self._request("GET", "/".join(arg.strip("/") for arg in args), **kwargs)
+
+    def post(self, *args, **kwargs):
+        """POST method forwarded to the daemon.
+
+        Args:
+        -----
+            args: positional arguments; each one represents a fregment in the
+                REST API endpoint URL.
+            kwargs: `params`, `json`, and `timeout`.
+
+        Returns:
+        --------
+            A DaemonResponse.
+        """
+        self._rest_url("POST", self._post_apis, *args) # only to check the endpoint
+        return self._request("POST", "/".join(arg.strip("/") for arg in args), **kwargs)
+
+    def close(self):
+        """Close the connection to the daemon."""
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def serve(path, config, url=None, apikey=None, cache=None, response_cache=None):
+    """Run the daemon until interrupted.
+
+    Args:
+    -----
+        path: a str or Path object of the Unix socket to listen on.
+        config: a str or Path object of the path to a config file.
+        url: a str; address to server; supersede the one in the config file.
+        apikey: a str; API Key; supersede the one in the config file.
+        cache: a str or Path object of a directory to cache parsed config files
+            in; None to disable caching.
+        response_cache: a yasynccli.cache.ResponseCache shared by all clients;
+            None to disable caching.
+    """
+
+    import signal
+    import threading
+    import socketserver
+    import requests
+    from .session import SyncthingSession
+
+    path = pathlib.Path(path)
+    lock = threading.Lock()
+    state = {"session": None, "key": None}
+
+    def _session():
+        """Get the warm session; rebuild it if the config file changed."""
+        stat = os.stat(config)
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with lock:
+            if state["key"] != key:
+                logger.info("Loading config {}.".format(config))
+                state["session"] = SyncthingSession(
+                    config, url, apikey, cache, response_cache)
+                state["key"] = key
+            return state["session"]
+
+    class Handler(socketserver.StreamRequestHandler):
+        """Serve requests from one client connection."""
+
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    method = getattr(_session(), request["method"].lower())
+                    kwargs = {"params": request["params"], "timeout": request["timeout"]}
+
+                    if request["method"] == "GET":
+                        kwargs["cache"] = request.get("cache", True)
+                    else:
+                        kwargs["json"] = request["json"]
+
+                    response = method(request["endpoint"], **kwargs)
+                except requests.exceptions.RequestException as err:
+                    reply = {"error": type(err).__name__, "message": str(err)}
+                except Exception as err: # pylint: disable=broad-except
+                    # reply instead of dropping the connection, so the client sees the error
+                    logger.exception("Failed to serve a request: {}".format(line[:200]))
+                    reply = {"error": type(err).__name__, "message": str(err)}
+                else:
+                    reply = {
+                        "status": response.status_code, "reason": response.reason,
+                        "url": response.url, "headers": dict(response.headers),
+                        "body": response.text,
+                        "cached": getattr(response, "from_cache", False)}
+
+                self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        """Threading Unix-socket server with daemon threads."""
+        daemon_threads = True
+
+    # refuse to replace the socket of a running daemon; remove a stale one
+    probe = DaemonSession.connect(path, config, url, apikey, cache)
+    if probe is not None:
+        probe.close()
+        raise RuntimeError("A daemon is already listening on {}.".format(path))
+
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+    _session() # warm up before accepting clients
+
+    umask = os.umask(0o177) # only the owner can connect
+    try:
+        server = Server(str(path), Handler)
+    finally:
+        os.umask(umask)
+
+    # shut down cleanly on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+
+    logger.info("Listening on {}.".format(path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        logger.info("Daemon at {} stopped.".format(path))
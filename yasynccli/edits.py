@@ -0,0 +1,173 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Edits of a server's configuration for the `config apply` subcommand.
+
+An edit is a JSON object with an `op` key:
+
+    {"op": "set", "path": "options.relaysEnabled", "value": false}
+    {"op": "unset", "path": "folders[id=abc].versioning.params.keep"}
+    {"op": "pause", "folder": "abc"}  (or "device": "<device ID>")
+    {"op": "resume", "folder": "abc"}  (or "device": "<device ID>")
+    {"op": "add-device", "folder": "abc", "device": "<device ID>"}
+    {"op": "remove-device", "folder": "abc", "device": "<device ID>"}
+
+A path is dot-separated keys of objects, integer indices of arrays, or
+`[key=value]` selectors picking the element of an array of objects whose `key`
+is `value`, e.g., `folders[id=abc].label`.
+"""
+import re
+import copy
+import json
+
+_segment = re.compile(r"([^.\[\]]+)|\[([^=\]]+)=([^\]]*)\]|\[(\d+)\]")
+
+def _parse_path(path):
+    """Split a path into a list of str keys, int indices, and (key, value) selectors."""
+
+    segments, pos = [], 0
+    while pos < len(path):
+        match = _segment.match(path, pos)
+        if match is None:
+            raise RuntimeError("Invalid path {!r} near {!r}.".format(path, path[pos:]))
+
+        key, sel_key, sel_value, index = match.groups()
+        if key is not None:
+            segments.append(int(key) if key.isdigit() else key)
+        elif index is not None:
+            segments.append(int(index))
+        else:
+            segments.append((sel_key, sel_value))
+
+        pos = match.end()
+        if pos < len(path) and path[pos] == ".":
+            pos += 1
+
+    if not segments:
+        raise RuntimeError("Empty path.")
+
+    return segments
+
+def _step(node, segment, path):
+    """Get the child of a node by a path segment."""
+
+    try:
+        if isinstance(segment, tuple):
+            key, value = segment
+            for item in node:
+                if isinstance(item, dict) and str(item.get(key)) == value:
+                    return item
+            raise KeyError(segment)
+        return node[segment]
+    except (KeyError, IndexError, TypeError):
+        raise RuntimeError("{} not found in the configuration.".format(path))
+
+def _find(config, kind, item_id):
+    """Find a folder or a device by its ID."""
+
+    key = "id" if kind == "folders" else "deviceID"
+    return _step(config.get(kind, []), (key, item_id), "{}[{}={}]".format(kind, key, item_id))
+
+def apply(config, edits):
+    """Apply edits to a copy of a configuration.
+
+    Args:
+    -----
+        config: a dict; the configuration from GET `/system/config`.
+        edits: a list of dicts; see the module docstring.
+
+    Returns:
+    --------
+        A new dict; `config` is not changed.
+    """
+
+    config = copy.deepcopy(config)
+
+    for i, edit in enumerate(edits):
+        try:
+            op = edit["op"]
+
+            if op in ("set", "unset"):
+                segments = _parse_path(edit["path"])
+                parent = config
+                for segment in segments[:-1]:
+                    parent = _step(parent, segment, edit["path"])
+
+                last = segments[-1]
+                if isinstance(last, tuple):
+                    raise RuntimeError("A path can not end with a selector.")
+
+                if op == "set":
+                    if isinstance(parent, list) and not 0 <= last < len(parent):
+                        raise RuntimeError("{} not found in the configuration.".format(edit["path"]))
+                    parent[last] = edit["value"]
+                else:
+                    _step(parent, last, edit["path"]) # raise if missing
+                    del parent[last]
+
+            elif op in ("pause", "resume"):
+                kind = "folders" if "folder" in edit else "devices"
+                target = _find(config, kind, edit["folder" if kind == "folders" else "device"])
+                target["paused"] = op == "pause"
+
+            elif op == "add-device":
+                folder = _find(config, "folders", edit["folder"])
+                devices = folder.setdefault("devices", [])
+                if all(device.get("deviceID") != edit["device"] for device in devices):
+                    devices.append({"deviceID": edit["device"], "introducedBy": ""})
+
+            elif op == "remove-device":
+                folder = _find(config, "folders", edit["folder"])
+                folder["devices"] = [
+                    device for device in folder.get("devices", [])
+                    if device.get("deviceID") != edit["device"]]
+
+            else:
+                raise RuntimeError("Unknown op {!r}.".format(op))
+
+        except KeyError as err:
+            raise RuntimeError("Edit #{} misses key {}: {}".format(i+1, err, json.dumps(edit)))
+        except RuntimeError as err:
+            raise RuntimeError("Edit #{} failed: {} {}".format(i+1, err, json.dumps(edit)))
+
+    return config
+
+def read(fileobj):
+    """Read edits from a JSON array or from one JSON object per line.
+
+    Args:
+    -----
+        fileobj: a text file object.
+
+    Returns:
+    --------
+        A list of dicts.
+    """
+
+    text = fileobj.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def diff(old, new):
+    """Get the unified diff between two configurations.
+
+    Args:
+    -----
+        old, new: dicts.
+
+    Returns:
+    --------
+        A list of str lines without newlines; empty if they are the same.
+    """
+
+    import difflib
+
+    old = json.dumps(old, indent=2, sort_keys=True).splitlines()
+    new = json.dumps(new, indent=2, sort_keys=True).splitlines()
+    return list(difflib.unified_diff(old, new, "server", "edited", lineterm=""))
@@ -0,0 +1,299 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Run a subcommand against many Syncthing instances (`--fleet INVENTORY`).
+
+An inventory lists the instances. It is a JSON file (`.json`) with a list of
+hosts or an object of {name: host}, a TOML file (`.toml`) with one table per
+host, or an INI file (any other suffix) with one section per host. A host has
+`config`, `url`, `apikey`, and `timeout`, all optional; the global options
+are used for the missing ones, except that a host with both a URL and an API
+key does not read the global config file: its folders and devices come from
+the server, and `check` does not work for it. In a JSON list, a str is the
+path to a config file. For example:
+
+    [laptop]
+    config = ~/inventory/laptop.xml
+
+    [nas]
+    url = https://nas.local:8384
+    apikey = abcdefg
+    timeout = 120
+
+Each host runs the subcommand in a worker thread with its own session and
+captured outputs. There is no timeout for the whole run; each host has its
+own `timeout` (`--host-timeout` unless the inventory says otherwise), counted
+from when a worker starts it. Requests are not allowed to wait beyond that,
+and a host not done by then is reported as timed out and its worker is
+replaced, so a hung server never holds a slot of the pool. Results are written
+as soon as each host is done.
+"""
+import io
+import sys
+import json
+import time
+import queue
+import logging
+import pathlib
+import argparse
+import threading
+from . import output
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.fleet")
+logger.addHandler(logging.NullHandler())
+
+# subcommands that only read from servers and end by themselves
+COMMANDS = ["check", "get", "log", "status"]
+
+_KEYS = {"name", "config", "url", "apikey", "api-key", "api_key", "timeout"}
+
+def read_inventory(path, timeout=60.):
+    """Read an inventory file.
+
+    Args:
+    -----
+        path: a str or Path object of the inventory.
+        timeout: a float; the seconds a host may take if it has no `timeout`.
+
+    Returns:
+    --------
+        A list of dicts with keys `name`, `config` (a Path or None), `url`,
+        `apikey`, and `timeout`, in the order of the inventory.
+    """
+
+    path = pathlib.Path(path).expanduser()
+    text = path.read_text()
+
+    if path.suffix == ".json":
+        data = json.loads(text)
+    elif path.suffix == ".toml":
+        if tomllib is None:
+            raise RuntimeError("Reading TOML inventories requires Python 3.11+ or tomli.")
+        data = tomllib.loads(text)
+    else:
+        import configparser
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read_string(text, str(path))
+        data = {name: dict(parser[name]) for name in parser.sections()}
+
+    if isinstance(data, dict):
+        data = [dict(value, name=name) for name, value in data.items()]
+
+    hosts = []
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {"config": entry}
+
+        if not isinstance(entry, dict) or not entry.keys() <= _KEYS:
+            raise RuntimeError("Invalid host in {}: {}".format(path, entry))
+
+        config = entry.get("config")
+        if config is not None: # relative to the inventory
+            config = path.parent.joinpath(pathlib.Path(config).expanduser()).resolve()
+
+        url = entry.get("url")
+        apikey = entry.get("apikey", entry.get("api-key", entry.get("api_key")))
+        hosts.append({
+            "name": str(entry.get("name") or url or config), "config": config,
+            "url": url, "apikey": apikey, "timeout": float(entry.get("timeout", timeout))})
+
+    names = [host["name"] for host in hosts]
+    if len(set(names)) != len(names):
+        raise RuntimeError("Host names in {} are not unique.".format(path))
+
+    return hosts
+
+def _parse(text):
+    """Parse captured JSON output: one document, or one per line."""
+
+    try:
+        return json.loads(text) if text.strip() else None
+    except ValueError:
+        pass
+
+    try:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    except ValueError: # e.g., not JSON at all
+        return text
+
+def _run_host(args, host, deadline):
+    """Run the subcommand against a host and capture the results.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        host: a dict from `read_inventory`.
+        deadline: a float; the time.monotonic() by which the host must be done.
+
+    Returns:
+    --------
+        A dict with keys `host`, `status` ("ok", "failed", or "error"), `code`,
+        `seconds`, `output`, and `errors`.
+    """
+
+    start = time.monotonic()
+    host_args = argparse.Namespace(**vars(args))
+    host_args.fleet = None
+    host_args.stdout, host_args.stderr = io.StringIO(), io.StringIO()
+
+    # JSON is parsed and put in the per-host records
+    if args.output != "pretty":
+        host_args.output = "compact"
+
+    result = {"host": host["name"], "status": "ok", "code": 0}
+    try:
+        from .session import SyncthingSession
+
+        url = args.url if host["url"] is None else host["url"]
+        apikey = args.apikey if host["apikey"] is None else host["apikey"]
+
+        # a host with a URL and an API key is not described by the local config
+        # file; its folders and devices are read from the server instead
+        config = host["config"]
+        if config is None and (url is None or apikey is None):
+            config = args.config
+
+        # the live state is wanted, so responses are not cached
+        host_args.session = SyncthingSession(config, url, apikey, args.cache_dir)
+        host_args.session.deadline = deadline
+        host_args.func(host_args)
+    except SystemExit as err: # subcommands' exit codes
+        if err.code not in (None, 0):
+            result.update(status="failed", code=err.code)
+    except Exception as err: # pylint: disable=broad-except
+        result.update(status="error", code=None)
+        host_args.stderr.write("Error: {}\n".format(err))
+    finally:
+        if getattr(host_args, "session", None) is not None:
+            host_args.session.close()
+
+    text = host_args.stdout.getvalue()
+    result.update(
+        seconds=round(time.monotonic()-start, 3),
+        output=text if args.output == "pretty" else _parse(text),
+        errors=host_args.stderr.getvalue())
+    return result
+
+def _text(result):
+    """Format a host's result for the `pretty` output."""
+
+    if result["status"] == "ok":
+        status = "ok"
+    elif result["status"] == "failed":
+        status = "exit code {}".format(result["code"])
+    else:
+        status = result["status"]
+
+    text = "== {}: {} ({:.2f} s) ==\n".format(result["host"], status, result["seconds"])
+    for part in (result["output"], result["errors"]):
+        if part:
+            text += part if part.endswith("\n") else part + "\n"
+    return text + "\n"
+
+def run(args):
+    """Run a subcommand against all hosts in the inventory `args.fleet`.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+    """
+
+    if args.cmd not in COMMANDS:
+        raise RuntimeError("`--fleet` only works with {}.".format(", ".join(COMMANDS)))
+    if args.cmd == "log" and args.follow:
+        raise RuntimeError("`log --follow` can not be used with `--fleet`.")
+    if args.cmd == "get" and args.endpoint == "-":
+        raise RuntimeError("`get -` can not be used with `--fleet`.")
+
+    hosts = read_inventory(args.fleet, args.host_timeout)
+    logger.debug("Running `{}` against {} hosts.".format(args.cmd, len(hosts)))
+
+    todo, events = queue.Queue(), queue.Queue()
+    for host in hosts:
+        todo.put(host)
+
+    # a host is either finished by its worker or timed out by the main loop
+    lock, finished, timed_out = threading.Lock(), set(), set()
+
+    def _worker():
+        while True:
+            try:
+                host = todo.get_nowait()
+            except queue.Empty:
+                return
+
+            start = time.monotonic()
+            deadline = start + host["timeout"]
+            events.put(("start", host["name"], (start, deadline)))
+            result = _run_host(args, host, deadline)
+
+            with lock:
+                if host["name"] in timed_out: # reported, and this worker replaced
+                    return
+                finished.add(host["name"])
+                events.put(("done", host["name"], result))
+
+    def _spawn():
+        # daemon threads, so hung hosts do not keep the process alive
+        threading.Thread(target=_worker, daemon=True).start()
+
+    for _ in range(min(args.fleet_jobs, len(hosts))):
+        _spawn()
+
+    out = output.writer(args)
+    running, left, failed = {}, len(hosts), 0 # running: name -> (start, deadline)
+
+    def _write(result):
+        out.record(result, lambda: _text(result))
+        out.flush()
+
+    while left:
+        wait = min(d for _, d in running.values()) - time.monotonic() if running else None
+        try:
+            kind, name, value = events.get(timeout=None if wait is None else max(wait, 0))
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (start, deadline) in list(running.items()):
+                if deadline > now:
+                    continue
+
+                with lock:
+                    if name in finished: # its result is in the queue
+                        continue
+                    timed_out.add(name)
+
+                del running[name]
+                left, failed = left - 1, failed + 1
+                _write({
+                    "host": name, "status": "timeout", "code": None,
+                    "seconds": round(now-start, 3), "output": None, "errors": ""})
+                _spawn()
+            continue
+
+        if kind == "start":
+            running[name] = value
+        else:
+            del running[name]
+            left, failed = left - 1, failed + (value["status"] != "ok")
+            _write(value)
+
+    out.close()
+    logger.debug("Done running `{}` against {} hosts.".format(args.cmd, len(hosts)))
+
+    if failed:
+        sys.stderr.write("{} of {} hosts failed.\n".format(failed, len(hosts)))
+        sys.exit(1)
@@ -8,70 +8,117 @@
 
 """Formatters for JSON outputs of different subcommands.
 """
-import sys
 import re
-import pathlib
+from . import instrument
 
-def _add_docstring(func):
-    """Add a docstring to a func and return it.
+# timestamps of log messages, e.g., 2020-05-19T12:34:56.123456789-07:00
+_when = re.compile(
+    r"(?P<date>\d{4}-\d{2}-\d{2})T(?P<time>\d{2}:\d{2}:\d{2})(?:\.\d*)?"
+    r"(?P<tz>Z|[+-]\d{2}:\d{2})")
 
-    All functions in this module have very similar docstring, so we use a
-    factory to add docstrings.
+@instrument.wrap("format", name="log")
+def log(data):
+    """Formatter of the output of subcommand `log`.
+
+    Args:
+    -----
+        data: a dict (JSON) returned by a HTTP request.
+
+    Yields:
+    -------
+        A ready to print string of each message, ending with a newline.
     """
+    for msg in data["messages"] or []:
+        date, time, tz = _when.search(msg["when"]).groups()
+        yield "{} {}{}: {}\n".format(date, time, tz, msg["message"])
 
-    func.__doc__ = \
-    """Formatter of the output of subcommand `{}`.
+@instrument.wrap("format", name="check")
+def check(data):
+    """Formatter of the output of subcommand `check`.
 
     Args:
     -----
-        data: a dict (JSON) returned by a HTTP request.
+        data: a list of differences returned by `checker.compare`.
 
     Returns:
     --------
-        A ready to print string.
-    """.format(func.__name__)
+        A ready to print string; one line per difference.
+    """
 
-    return func
+    lines = []
+    for diff in data:
+        name = "{} {}".format(diff["kind"].capitalize(), diff["id"])
 
-@_add_docstring
-def log(data):
-    s = ""
-    for msg in data["messages"]:
-        pattern = r"(?P<date>\d{4}-\d{2}-\d{2})T"
-        pattern += r"(?P<time>\d{2}:\d{2}:\d{2})\.\d*?"
-        pattern += r"(?P<tz>[+-]\d{2}:\d{2})"
-        date, time, tz = re.search(pattern, msg["when"]).groups()
-        s += "{} {}{}: {}\n".format(date, time, tz, msg["message"])
-    return s
+        if diff["field"] is None:
+            where = "the config file" if diff["server"] is None else "the server"
+            value = diff["config"] if diff["server"] is None else diff["server"]
+            lines.append("{}: only in {} ({})".format(name, where, value))
+        elif diff["field"] == "devices":
+            lines.append(
+                "{}: shared devices differ; only in the config file: {}; "
+                "only in the server: {}".format(
+                    name, ", ".join(diff["config"]) or "none",
+                    ", ".join(diff["server"]) or "none"))
+        else:
+            lines.append("{}: {} mismatch: {!r} (config file) v.s. {!r} (server)".format(
+                name, diff["field"], diff["config"], diff["server"]))
 
-@_add_docstring
-def check(data):
-    config = data["instance"]
-    folders = config.folders
-    if len(data["folders"]) != len(folders):
-        raise RuntimeError(
-            "The config file has different number of monitored folders than "
-            "the actual running server does. "
-            "{} {}".format(len(data["devices"]), len(folders)))
-
-    for item in data["folders"]:
-        try:
-            path = pathlib.Path(item["path"]).expanduser().resolve()
-            target = folders[path]
-        except KeyError:
-            sys.stderr.write(
-                "Error: server has a folder {} not found ".format(path) +\
-                "in the configuration file {}\n".format(config.config))
-            sys.exit(1)
-
-        if item["id"] != target["id"]:
-            sys.stderr.write(
-                "Error: folder ID of {} mismatch: {} v.s. {}\n".format(
-                    path, item["id"], target["id"]))
-            sys.exit(1)
-
-        if item["label"] != target["label"]:
-            sys.stderr.write(
-                "Error: folder label of {} mismatch: {} v.s. {}\n".format(
-                    path, item["label"], target["label"]))
-            sys.exit(1)
+    return "".join(line + "\n" for line in lines)
+
+def _size(nbytes):
+    """Format a number of bytes with a binary prefix, e.g., 12.0 MiB."""
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if abs(nbytes) < 1024 or unit == "TiB":
+            break
+        nbytes /= 1024
+    return "{} B".format(nbytes) if unit == "B" else "{:.1f} {}".format(nbytes, unit)
+
+def _percent(value):
+    """Format a percentage; "?" if unknown."""
+    return "?" if value is None else "{:.1f}%".format(value)
+
+@instrument.wrap("format", name="status")
+def status(data):
+    """Formatter of the output of subcommand `status`.
+
+    Args:
+    -----
+        data: a dict returned by `subcommands._status_summary`.
+
+    Returns:
+    --------
+        A ready to print string; a table of folders, each followed by its
+        devices, and then a table of devices over all folders.
+    """
+
+    names = {device_id: device["name"] for device_id, device in data["devices"].items()}
+    device = lambda device_id: "{} ({})".format(names.get(device_id) or "?", device_id[:7])
+    row = "{:<36} {:<12} {:>8} {:>12}\n"
+
+    s = row.format("FOLDER / DEVICE", "STATE", "DONE", "NEED")
+    for folder in data["folders"]:
+        name = "{} ({})".format(folder["label"] or folder["id"], folder["id"])
+        if folder["error"] is not None:
+            s += "{:<36} error: {}\n".format(name, folder["error"])
+        else:
+            s += row.format(
+                name, folder["state"] or "", _percent(folder["completion"]),
+                _size(folder["needBytes"]))
+
+        for device_id, value in folder["devices"].items():
+            if value["error"] is not None:
+                s += "  {:<34} error: {}\n".format(device(device_id), value["error"])
+            else:
+                s += row.format(
+                    "  " + device(device_id), "", _percent(value["completion"]),
+                    _size(value["needBytes"]))
+
+    if data["devices"]:
+        row = "{:<36} {:>12} {:>8} {:>12}\n"
+        s += "\n" + row.format("DEVICE", "FOLDERS", "DONE", "NEED")
+        for device_id, value in data["devices"].items():
+            s += row.format(
+                device(device_id), value["folders"], _percent(value["completion"]),
+                _size(value["needBytes"]))
+
+    return s
@@ -0,0 +1,206 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Timing hooks of the phases of a yasync-cli run.
+
+Instrumented code reports each timed phase to the registered callbacks as
+`callback(phase, seconds, info)`, where phase is one of:
+
+    "import": importing yasync-cli's modules (only when run from the CLI).
+    "config": parsing (or loading the cached) config file.
+    "session": creating a SyncthingSession, including "config".
+    "request": a GET/POST until the response headers arrive, including
+        connecting; info has `method`, `endpoint`, `status`, and `cached`.
+    "download": reading the response body after the headers.
+    "json": decoding a JSON response body.
+    "format": running a formatter; info has `name`.
+
+Nothing is timed unless at least one callback is registered.
+"""
+import time
+import functools
+
+# the flag of generator functions in `code.co_flags`; `inspect` is slow to import
+_CO_GENERATOR = 0x20
+
+_callbacks = []
+
+def register(callback):
+    """Register a callback of timed phases.
+
+    Args:
+    -----
+        callback: a callable taking (phase, seconds, info); info is a dict.
+    """
+    _callbacks.append(callback)
+
+def unregister(callback):
+    """Unregister a callback registered with `register`."""
+    _callbacks.remove(callback)
+
+def enabled():
+    """Whether any callback is registered."""
+    return bool(_callbacks)
+
+def emit(phase, seconds, **info):
+    """Report a timed phase to all callbacks.
+
+    Args:
+    -----
+        phase: a str; the name of the phase.
+        seconds: a float; the elapsed wall time.
+        info: extra information of the phase.
+    """
+    for callback in list(_callbacks):
+        callback(phase, seconds, info)
+
+class timed:
+    """A context manager timing the enclosed code as a phase.
+
+    Constructor args:
+    -----------------
+        phase: a str; the name of the phase.
+        info: extra information of the phase; can be updated through the
+            `info` attribute inside the block.
+    """
+
+    def __init__(self, phase, **info):
+        self.phase = phase
+        self.info = info
+
+    def __enter__(self):
+        self._start = time.perf_counter() if _callbacks else None
+        return self
+
+    def __exit__(self, *args):
+        if self._start is not None:
+            emit(self.phase, time.perf_counter()-self._start, **self.info)
+
+def wrap(phase, **info):
+    """A decorator timing every call of a function as a phase.
+
+    Time spent by a generator function is the sum over all its iterations, not
+    including the time spent by its consumer.
+
+    Args:
+    -----
+        phase: a str; the name of the phase.
+        info: extra information of the phase.
+
+    Returns:
+    --------
+        A decorator.
+    """
+
+    def decorator(func):
+
+        if func.__code__.co_flags & _CO_GENERATOR:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not _callbacks:
+                    return (yield from func(*args, **kwargs))
+
+                elapsed, gen = 0., func(*args, **kwargs)
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            value = next(gen)
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield value
+                except StopIteration as result:
+                    return result.value
+                finally:
+                    gen.close()
+                    emit(phase, elapsed, **info)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with timed(phase, **info):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class Profiler:
+    """A callback summarizing timed phases.
+
+    Register an instance with `register`, and get the summary from `report`
+    or `to_dict` afterward.
+
+    Constructor args:
+    -----------------
+        start: a float from `time.perf_counter()` of the start of the run; None
+            means now.
+    """
+
+    # phases in the order of a typical run
+    _order = ["import", "config", "session", "request", "download", "json", "format"]
+
+    def __init__(self, start=None):
+        self.phases = {} # phase -> [count, seconds]
+        self.requests = [] # (method, endpoint, status, cached, seconds)
+        self._start = time.perf_counter() if start is None else start
+
+    def __call__(self, phase, seconds, info):
+        record = self.phases.setdefault(phase, [0, 0.])
+        record[0] += 1
+        record[1] += seconds
+
+        if phase == "request":
+            self.requests.append((
+                info.get("method"), info.get("endpoint"), info.get("status"),
+                info.get("cached", False), seconds))
+
+    def to_dict(self):
+        """Get the summary as a JSON-serializable dict.
+
+        Returns:
+        --------
+            A dict with `total` in seconds since the start of the run,
+            `phases` of {phase: {"count", "seconds"}}, and `requests`.
+        """
+
+        return {
+            "total": time.perf_counter() - self._start,
+            "phases": {
+                phase: {"count": count, "seconds": seconds}
+                for phase, (count, seconds) in self.phases.items()},
+            "requests": [
+                {"method": method, "endpoint": endpoint, "status": status,
+                 "cached": cached, "seconds": seconds}
+                for method, endpoint, status, cached, seconds in self.requests]}
+
+    def report(self):
+        """Get the summary as a human-readable table.
+
+        Returns:
+        --------
+            A str ending with a newline.
+        """
+
+        summary = self.to_dict()
+        phases = sorted(
+            summary["phases"],
+            key=lambda phase: (self._order + [phase]).index(phase))
+
+        lines = ["{:<10} {:>6} {:>11}".format("phase", "count", "time (ms)")]
+        for phase in phases:
+            lines.append("{:<10} {:>6} {:>11.2f}".format(
+                phase, summary["phases"][phase]["count"],
+                summary["phases"][phase]["seconds"]*1e3))
+        lines.append("{:<10} {:>6} {:>11.2f}".format("total", "", summary["total"]*1e3))
+
+        for request in summary["requests"]:
+            lines.append("  {} {} -> {}{}: {:.2f} ms".format(
+                request["method"], request["endpoint"], request["status"],
+                " (cached)" if request["cached"] else "", request["seconds"]*1e3))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,263 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Incremental, event-based JSON parsing for huge responses.
+
+`iterparse` turns chunks of a JSON document into a stream of events, and
+`records` turns the events of a response into small records, e.g., one per
+file of `/db/browse`. Only one record is held in memory at a time.
+
+Events are (event, value) tuples, where event is one of "start_map",
+"map_key", "end_map", "start_array", "end_array", and "value".
+"""
+import re
+import codecs
+import json.decoder
+
+# a token after optional whitespace: punctuation, the opening quote of a string,
+# a number, or a literal
+_token = re.compile(
+    r'[ \t\n\r]*(?:([{}\[\]:,])|(")|'
+    r'(-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?)|(true|false|null))')
+
+_literals = {"true": True, "false": False, "null": None}
+
+def iterparse(chunks):
+    """Parse a JSON document incrementally.
+
+    Args:
+    -----
+        chunks: an iterable of bytes; the UTF-8 encoded document in pieces.
+
+    Yields:
+    -------
+        (event, value) tuples. value is the key for "map_key", the Python
+        object for "value", and None for others.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf, pos, final = "", 0, False
+    stack, expect_key = [], False # stack: True for a map, False for an array
+
+    while True:
+        match = _token.match(buf, pos)
+
+        # a complete token, except a number that may continue in the next chunk
+        if match is not None and (
+                final or match.group(3) is None or
+                (match.end() < len(buf) and buf[match.end()] not in ".eE")):
+            pos = match.end()
+
+            if match.group(1) is not None:
+                char = match.group(1)
+                if char == "{":
+                    stack.append(True)
+                    expect_key = True
+                    yield "start_map", None
+                elif char == "}":
+                    stack.pop()
+                    expect_key = False
+                    yield "end_map", None
+                elif char == "[":
+                    stack.append(False)
+                    expect_key = False
+                    yield "start_array", None
+                elif char == "]":
+                    stack.pop()
+                    yield "end_array", None
+                elif char == ",":
+                    expect_key = bool(stack) and stack[-1]
+                else: # ":"
+                    expect_key = False
+                continue
+
+            if match.group(2) is not None:
+                try:
+                    value, end = json.decoder.scanstring(buf, pos)
+                except json.decoder.JSONDecodeError:
+                    if final:
+                        raise
+                    pos = match.start() # read more and try again
+                else:
+                    pos = end
+                    yield ("map_key" if expect_key else "value"), value
+                    continue
+
+            elif match.group(3) is not None:
+                if match.group(4) is None and match.group(5) is None:
+                    yield "value", int(match.group(3))
+                else:
+                    yield "value", float(match.group(3))
+                continue
+
+            else:
+                yield "value", _literals[match.group(6)]
+                continue
+
+        if final:
+            if buf[pos:].strip():
+                raise ValueError("Invalid JSON near: {!r}".format(buf[pos:pos+20]))
+            return
+
+        # need more data
+        chunk = next(chunks, None)
+        if chunk is None:
+            buf, final = buf[pos:] + decoder.decode(b"", True), True
+        else:
+            buf = buf[pos:] + decoder.decode(chunk)
+        pos = 0
+
+def build(event, value, events):
+    """Build a Python object from events.
+
+    Args:
+    -----
+        event, value: the first event of the object.
+        events: an iterator of the remaining events.
+
+    Returns:
+    --------
+        The Python object; the events of it are consumed.
+    """
+
+    if event == "start_map":
+        obj = {}
+        for event, value in events:
+            if event == "end_map":
+                return obj
+            obj[value] = build(*next(events), events)
+
+    if event == "start_array":
+        obj = []
+        for event, value in events:
+            if event == "end_array":
+                return obj
+            obj.append(build(event, value, events))
+
+    return value
+
+def _browse_entries(events, prefix):
+    """Flatten `/db/browse` entries ([{"name": ..., "children": [...]}, ...])."""
+
+    for event, value in events:
+        if event == "end_array":
+            return
+
+        if event != "start_map":
+            yield {"path": prefix, "value": build(event, value, events)}
+            continue
+
+        entry, done = {}, False
+        for event, value in events:
+            if event == "end_map":
+                break
+
+            key = value
+            event, value = next(events)
+
+            # emit the directory before its children; `children` is the last key
+            if key == "children" and event == "start_array":
+                path = prefix + str(entry.get("name", ""))
+                yield dict(_strip(entry), path=path)
+                done = True
+                yield from _browse_entries(events, path + "/")
+            else:
+                entry[key] = build(event, value, events)
+
+        if not done:
+            yield dict(_strip(entry), path=prefix+str(entry.get("name", "")))
+
+def _browse_tree(events, prefix):
+    """Flatten the legacy `/db/browse` tree ({"dir": {"file": [mtime, size]}})."""
+
+    for event, value in events:
+        if event == "end_map":
+            return
+
+        path = prefix + value
+        event, value = next(events)
+
+        if event == "start_map":
+            yield {"path": path, "type": "dir"}
+            yield from _browse_tree(events, path + "/")
+            continue
+
+        value = build(event, value, events)
+        if isinstance(value, list) and len(value) == 2:
+            yield {"path": path, "type": "file", "modTime": value[0], "size": value[1]}
+        else:
+            yield {"path": path, "value": value}
+
+def _strip(entry):
+    """Remove keys that are replaced by `path` in a browse record."""
+    return {key: value for key, value in entry.items() if key not in ("name", "children")}
+
+def records(events, endpoint, prefix=None):
+    """Turn the events of a response into small records.
+
+    `/db/browse` gives one record per file/directory with its full path
+    relative to the folder. `/db/need` gives one record per file, tagged with
+    its section (`progress`, `queued`, or `rest`). Other endpoints give one
+    record per element of a top-level array, or one {"key", "value"} record per
+    entry of a top-level map.
+
+    Args:
+    -----
+        events: an iterable of events from `iterparse`.
+        endpoint: a str; the GET endpoint, e.g., "/db/browse".
+        prefix: a str or None; the `prefix` parameter of `/db/browse`.
+
+    Yields:
+    -------
+        A JSON-serializable object per record.
+    """
+
+    events = iter(events)
+    event, value = next(events, ("value", None))
+    endpoint = "/" + endpoint.strip("/")
+
+    if endpoint == "/db/browse":
+        prefix = "" if not prefix else prefix.strip("/") + "/"
+        if event == "start_array":
+            yield from _browse_entries(events, prefix)
+        elif event == "start_map":
+            yield from _browse_tree(events, prefix)
+        elif value is not None:
+            yield value
+
+    elif endpoint == "/db/need" and event == "start_map":
+        for event, key in events:
+            if event == "end_map":
+                break
+
+            event, value = next(events)
+            if event != "start_array":
+                build(event, value, events) # pagination info, e.g., `page`
+                continue
+
+            for event, value in events:
+                if event == "end_array":
+                    break
+                item = build(event, value, events)
+                yield dict(item, section=key) if isinstance(item, dict) else item
+
+    elif event == "start_array":
+        for event, value in events:
+            if event == "end_array":
+                break
+            yield build(event, value, events)
+
+    elif event == "start_map":
+        for event, key in events:
+            if event == "end_map":
+                break
+            yield {"key": key, "value": build(*next(events), events)}
+
+    else:
+        yield value
@@ -0,0 +1,270 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""A typed, read-only model of a Syncthing configuration.
+
+The model is built from the JSON of GET `/system/config`, or from a config
+file through `SyncthingConfig`, which converts config.xml to the same JSON.
+Records use `__slots__`, so a config with many folders and devices stays
+small, and they can not be changed after creation. Fields can be read as
+attributes (`folder.label`) or, like the plain dicts used before, as items
+(`folder["label"]`).
+
+Indexes of `ConfigModel` (by ID, label, path, and shared device) are built on
+first use only.
+"""
+import types
+import pathlib
+
+class _Record:
+    """Base of read-only records with fields in `__slots__`.
+
+    A record computing a field on first use keeps the raw value in a private
+    slot, and lists its public fields in `_fields`.
+    """
+
+    __slots__ = ()
+    _fields = None
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is read-only.".format(type(self).__name__))
+
+    def __getitem__(self, name):
+        if name not in (self._fields or self.__slots__):
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        """Get a field like dict.get."""
+        return getattr(self, name) if name in (self._fields or self.__slots__) else default
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self._fields or self.__slots__))
+
+class Folder(_Record):
+    """A monitored folder.
+
+    Fields:
+    -------
+        id, label: str.
+        path: a str; the path as written in the configuration.
+        resolved: a pathlib.Path of the resolved path, or None if not resolved
+            (e.g., a path on the server's machine). Paths on this machine are
+            resolved on first use, since that touches the file system.
+        type: a str, e.g., "sendreceive".
+        rescan_interval: an int; seconds between full rescans.
+        fs_watcher: a bool; whether the file system watcher is enabled.
+        paused: a bool.
+        devices: a tuple of the IDs of devices sharing the folder.
+    """
+
+    _fields = (
+        "id", "label", "path", "resolved", "type", "rescan_interval", "fs_watcher",
+        "paused", "devices")
+
+    # `_resolved` is a Path, None, or True to resolve `path` on first use
+    __slots__ = (
+        "id", "label", "path", "_resolved", "type", "rescan_interval", "fs_watcher",
+        "paused", "devices")
+
+    @property
+    def resolved(self):
+        """The resolved pathlib.Path, or None if not resolved."""
+        if self._resolved is True:
+            object.__setattr__(self, "_resolved", pathlib.Path(self.path).expanduser().resolve())
+        return self._resolved
+
+    @classmethod
+    def from_json(cls, data, resolve=False):
+        """Create a Folder from an element of `folders` of `/system/config`.
+
+        Args:
+        -----
+            data: a dict.
+            resolve: a bool; whether to resolve the path on this machine (on
+                first use) if the dict does not carry `resolvedPath`.
+        """
+
+        resolved = data.get("resolvedPath")
+        if resolved is not None:
+            resolved = pathlib.Path(resolved)
+        elif resolve:
+            resolved = True
+
+        return cls(
+            id=data["id"], label=data.get("label", ""), path=data["path"],
+            _resolved=resolved, type=data.get("type", "sendreceive"),
+            rescan_interval=data.get("rescanIntervalS", 3600),
+            fs_watcher=data.get("fsWatcherEnabled", True), paused=data.get("paused", False),
+            devices=tuple(device["deviceID"] for device in data.get("devices") or []))
+
+class Device(_Record):
+    """A device.
+
+    Fields:
+    -------
+        id, name: str.
+        addresses: a tuple of str, e.g., ("dynamic",).
+        compression: a str, e.g., "metadata".
+        introducer, paused: bool.
+    """
+
+    __slots__ = ("id", "name", "addresses", "compression", "introducer", "paused")
+
+    @classmethod
+    def from_json(cls, data):
+        """Create a Device from an element of `devices` of `/system/config`."""
+        return cls(
+            id=data["deviceID"], name=data.get("name", ""),
+            addresses=tuple(data.get("addresses") or ()),
+            compression=data.get("compression", "metadata"),
+            introducer=data.get("introducer", False), paused=data.get("paused", False))
+
+class Gui(_Record):
+    """The GUI/REST API server.
+
+    Fields:
+    -------
+        address, apikey: str or None.
+        tls, enabled: bool.
+    """
+
+    __slots__ = ("address", "apikey", "tls", "enabled")
+
+    @classmethod
+    def from_json(cls, data):
+        """Create a Gui from `gui` of `/system/config`."""
+        return cls(
+            address=data.get("address"), apikey=data.get("apiKey"),
+            tls=data.get("useTLS", False), enabled=data.get("enabled", True))
+
+class Options(_Record):
+    """Commonly used global options.
+
+    Fields:
+    -------
+        listen_addresses: a tuple of str.
+        global_announce, local_announce, relays, start_browser: bool.
+        max_send_kbps, max_recv_kbps: int; 0 means unlimited.
+    """
+
+    __slots__ = (
+        "listen_addresses", "global_announce", "local_announce", "relays",
+        "start_browser", "max_send_kbps", "max_recv_kbps")
+
+    @classmethod
+    def from_json(cls, data):
+        """Create an Options from `options` of `/system/config`."""
+        return cls(
+            listen_addresses=tuple(data.get("listenAddresses") or ("default",)),
+            global_announce=data.get("globalAnnounceEnabled", True),
+            local_announce=data.get("localAnnounceEnabled", True),
+            relays=data.get("relaysEnabled", True), start_browser=data.get("startBrowser", True),
+            max_send_kbps=data.get("maxSendKbps", 0), max_recv_kbps=data.get("maxRecvKbps", 0))
+
+def _group(items, key):
+    """Build a read-only index of {key: tuple of items}."""
+
+    index = {}
+    for item in items:
+        index.setdefault(key(item), []).append(item)
+    return types.MappingProxyType({k: tuple(v) for k, v in index.items()})
+
+class ConfigModel:
+    """A whole configuration with indexes built on first use.
+
+    Constructor args:
+    -----------------
+        gui: a Gui.
+        options: an Options.
+        folders: an iterable of Folder.
+        devices: an iterable of Device.
+    """
+
+    __slots__ = ("gui", "options", "folders", "devices", "_indexes")
+
+    def __init__(self, gui, options, folders, devices):
+        object.__setattr__(self, "gui", gui)
+        object.__setattr__(self, "options", options)
+        object.__setattr__(self, "folders", tuple(folders))
+        object.__setattr__(self, "devices", tuple(devices))
+        object.__setattr__(self, "_indexes", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigModel is read-only.")
+
+    @classmethod
+    def from_json(cls, data, resolve=False):
+        """Create a ConfigModel from the JSON of `/system/config`.
+
+        Args:
+        -----
+            data: a dict.
+            resolve: a bool; whether to resolve folder paths on this machine.
+        """
+        return cls(
+            Gui.from_json(data.get("gui") or {}), Options.from_json(data.get("options") or {}),
+            (Folder.from_json(folder, resolve) for folder in data.get("folders") or []),
+            (Device.from_json(device) for device in data.get("devices") or []))
+
+    def _index(self, name, build):
+        """Get an index, building it on first use."""
+
+        try:
+            return self._indexes[name]
+        except KeyError:
+            index = self._indexes[name] = build()
+            return index
+
+    @property
+    def folders_by_id(self):
+        """A read-only dict of {folder ID: Folder}."""
+        return self._index("folders_by_id", lambda: types.MappingProxyType(
+            {folder.id: folder for folder in self.folders}))
+
+    @property
+    def folders_by_path(self):
+        """A read-only dict of {resolved pathlib.Path: Folder}."""
+        return self._index("folders_by_path", lambda: types.MappingProxyType(
+            {folder.resolved: folder for folder in self.folders if folder.resolved is not None}))
+
+    @property
+    def folders_by_label(self):
+        """A read-only dict of {label: tuple of Folder}; labels may repeat."""
+        return self._index("folders_by_label", lambda: _group(
+            self.folders, lambda folder: folder.label))
+
+    @property
+    def folders_by_device(self):
+        """A read-only dict of {device ID: tuple of Folder shared with it}."""
+
+        def _build():
+            pairs = ((device, folder) for folder in self.folders for device in folder.devices)
+            index = _group(pairs, lambda pair: pair[0])
+            return types.MappingProxyType({
+                device: tuple(folder for _, folder in pairs) for device, pairs in index.items()})
+
+        return self._index("folders_by_device", _build)
+
+    @property
+    def devices_by_id(self):
+        """A read-only dict of {device ID: Device}."""
+        return self._index("devices_by_id", lambda: types.MappingProxyType(
+            {device.id: device for device in self.devices}))
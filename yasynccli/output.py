@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Output formats shared by all subcommands.
+
+The global `--output` option selects one of:
+
+    pretty: human-readable text (the default); JSON indented by 2 spaces for
+        results without a dedicated formatter.
+    json: one JSON document indented by 2 spaces.
+    compact: one JSON document without whitespace.
+    ndjson: one JSON document per line, e.g., one per log message.
+
+JSON is encoded with `orjson` if it is installed, and with the standard `json`
+module otherwise. `orjson` is only imported when JSON is first encoded, so it
+does not slow down the startup of every run.
+"""
+import sys
+import json
+
+_orjson = [] # [the orjson module or None] once imported
+
+def _get_orjson():
+    """Import orjson on first use; None if it is not installed."""
+
+    if not _orjson:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson.append(orjson)
+    return _orjson[0]
+
+MODES = ["pretty", "json", "compact", "ndjson"]
+
+def dumps(obj, indent=False):
+    """Encode an object as a JSON str.
+
+    Args:
+    -----
+        obj: a JSON-serializable object.
+        indent: a bool; whether to indent by 2 spaces; otherwise no whitespace.
+
+    Returns:
+    --------
+        A str without a trailing newline.
+    """
+
+    orjson = _get_orjson()
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, option=option).decode("utf-8")
+        except TypeError: # e.g., integers beyond 64 bits
+            pass
+
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+class Writer:
+    """Write results of a subcommand in the selected output format.
+
+    A subcommand writes either one `document` or a sequence of `record`s, and
+    calls `close` at the end. In the `json` and `compact` modes, records are
+    collected and written as one JSON array by `close`.
+
+    Constructor args:
+    -----------------
+        mode: a str; one of `MODES`.
+        stream: a text file object; None means sys.stdout.
+    """
+
+    def __init__(self, mode="pretty", stream=None):
+        if mode not in MODES:
+            raise ValueError("Unknown output format: {}".format(mode))
+
+        self.mode = mode
+        self._stream = sys.stdout if stream is None else stream
+        self._records = None # records waiting for `close`
+
+    def document(self, obj, text=None):
+        """Write a whole result.
+
+        Args:
+        -----
+            obj: a JSON-serializable object.
+            text: a str or a callable returning a str; the human-readable form
+                used in the `pretty` mode.
+        """
+
+        if self.mode == "pretty" and text is not None:
+            self._stream.write(text() if callable(text) else text)
+        elif self.mode == "ndjson" or self.mode == "compact":
+            self._stream.write(dumps(obj) + "\n")
+        else:
+            self._stream.write(dumps(obj, True) + "\n")
+
+    def record(self, obj, text=None):
+        """Write one record of a sequence.
+
+        Args:
+        -----
+            obj: a JSON-serializable object.
+            text: a str or a callable returning a str; the human-readable form
+                used in the `pretty` mode; a JSON line if None.
+        """
+
+        if self.mode == "json" or self.mode == "compact":
+            if self._records is None:
+                self._records = []
+            self._records.append(obj)
+            return
+
+        if self.mode == "pretty" and text is not None:
+            self._stream.write(text() if callable(text) else text)
+        else:
+            self._stream.write(dumps(obj) + "\n")
+
+    def flush(self):
+        """Flush written records, e.g., after each poll of a long-running command."""
+        self._stream.flush()
+
+    def close(self, empty=True):
+        """Finish the output; write collected records as one JSON array.
+
+        Args:
+        -----
+            empty: a bool; whether to write an empty array if no record was
+                written in the `json` and `compact` modes.
+        """
+
+        if self._records is not None or (empty and self.mode in ("json", "compact")):
+            self.document(self._records or [])
+            self._records = None
+        self._stream.flush()
+
+def writer(args):
+    """Get a Writer from CMD arguments.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments; `output` and,
+            optionally, `stdout` are used.
+
+    Returns:
+    --------
+        A Writer.
+    """
+    return Writer(getattr(args, "output", "pretty"), getattr(args, "stdout", None))
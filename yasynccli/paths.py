@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Helpers of paths shared by subcommands, the scan queue, and watchers.
+"""
+
+def _parts(path):
+    """Components of a pathlib.PurePath or a POSIX str."""
+    return path.split("/") if isinstance(path, str) else path.parts
+
+def drop_nested(paths):
+    """Remove paths whose ancestors (or themselves) are already in the list.
+
+    Args:
+    -----
+        paths: an iterable of pathlib.PurePath, or of str of POSIX paths.
+
+    Returns:
+    --------
+        A list of the same type, sorted by components, in which no path is
+        under another one.
+    """
+
+    results, last = [], None
+
+    # in lexicographic order of parts, descendants follow their ancestor closely
+    for path in sorted(set(paths), key=_parts):
+        parts = _parts(path)
+        if last is not None and parts[:len(last)] == last:
+            continue
+        results.append(path)
+        last = parts
+
+    return results
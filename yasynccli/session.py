@@ -8,143 +8,67 @@
 
 """Provides SyncthingSession class.
 """
-import re
-import copy
-import pathlib
+import time
 import logging
-import xml.etree.ElementTree
 import requests
+from . import instrument
+from .config import SyncthingConfig
+from .transport import UnixAdapter
 
 # get a logger with dummy handler if the caller does not have logging config
 logger = logging.getLogger("yasynccli.session")
 logger.addHandler(logging.NullHandler())
 
-class SyncthingSession(requests.Session):
+class SyncthingSession(SyncthingConfig, requests.Session):
     """Syncthing communication session.
 
     SyncthingSession is an derived requests.Session class that also parses
-    Syncthing's configuration XML file and holds info for communication with the
-    Syncthing server. This object can be used as an configuration holder also
-    a requests.Session.
+    Syncthing's configuration XML file (through SyncthingConfig) and holds info
+    for communication with the Syncthing server. This object can be used as an
+    configuration holder also a requests.Session. Without a config file,
+    folders and devices are read from GET `/system/config` on first use.
 
     Construcgtor args:
     ------------------
-        config: a str or Path object of the path to a config file.
+        config: a str or Path object of the path to a config file; or None.
         url: a str; address to server; supersede the one in the config file.
         apikey: a str; API Key; supersede the one in the config file.
+        cache: a str or Path object of a directory to cache parsed config files
+            in; None to disable caching.
+        response_cache: a yasynccli.cache.ResponseCache for caching GET
+            responses; None to disable caching.
     """
 
-    # legal GET APIs
-    _get_apis = [
-        "/system/browse", "/system/config", "/system/config/insync",
-        "/system/connections", "/system/debug", "/system/discovery",
-        "/system/error", "/system/log", "/system/ping", "/system/status",
-        "/system/upgrade", "/system/version", "/db/browse", "/db/completion",
-        "/db/file", "/db/ignores", "/db/need", "/db/status", "/events",
-        "/stats/device", "/stats/folder", "/svc/deviceid", "/svc/lang",
-        "/svc/random/string", "/svc/report"
-    ]
-
-    # legal POST APIs
-    _post_apis = [
-        "/system/config", "/system/debug", "/system/discovery",
-        "/system/error/clear", "/system/error", "/system/pause", "/system/ping",
-        "/system/reset", "/systemart", "/system/resume", "/system/shutdown",
-        "/system/upgrade", "/db/ignores", "/db/override", "/db/prio",
-        "/db/revert", "/db/scan"
-    ]
-
-
-    def __init__(self, config, url=None, apikey=None):
-        """SyncthingConfig constructor.
+    @instrument.wrap("session")
+    def __init__(self, config, url=None, apikey=None, cache=None, response_cache=None):
+        """SyncthingSession constructor.
 
         Args:
         -----
-            config: a str or Path object of the path to a config file.
+            config: a str or Path object of the path to a config file; None to
+                use `url` and `apikey` only.
             url: a str; address to server; supersede the one in the config file.
             apikey: a str; API Key; supersede the one in the config file.
+            cache: a str or Path object of a directory to cache parsed config
+                files in; None to disable caching.
+            response_cache: a yasynccli.cache.ResponseCache for caching GET
+                responses; None to disable caching.
         """
 
-        logger.debug("Initializing a SyncthingConfig instance.")
-        super(SyncthingSession, self).__init__()
-
-        # read and parse the config file
-        self._config = pathlib.Path(config).resolve()
-        tree = xml.etree.ElementTree.parse(self._config)
-
-        # get url and apikey from GUI info
-        gui = tree.find("gui")
-        self._url = gui.find("address").text if url is None else url
-
-        # to consider some possible ways to specify URL
-        pattern = r"(?://|(?P<proto>.*)://|)(?P<host>.*):(?P<port>\d+?)(?:$|/)"
-        match = re.search(pattern, self._url)
-        self._host, self._port = match.group("host"), match.group("port")
-        self._proto = "http" if match.group("proto") is None else match.group("proto")
-
-        # api key
-        self._apikey = gui.find("apikey").text if apikey is None else apikey
-
-        # get folders
-        self._folders = {}
-
-        for folder in tree.iterfind("folder"):
-            p = pathlib.Path(folder.attrib["path"]).expanduser().resolve()
-            self._folders[p] = {
-                "label": folder.attrib["label"], "id": folder.attrib["id"]}
+        logger.debug("Initializing a SyncthingSession instance.")
+        requests.Session.__init__(self)
+        SyncthingConfig.__init__(self, config, url, apikey, cache)
+        self.response_cache = response_cache
 
         # update attributes inhirented from the parent
         self.headers.update({"X-API-KEY": self._apikey})
+        self.mount("http+unix://", UnixAdapter())
+        self._pool_size = requests.adapters.DEFAULT_POOLSIZE
 
-        logger.debug("Done initializing a SyncthingConfig instance.")
-
-    def __repr__(self): # overriding __repr__
-
-        logger.debug("Preparing __repr__ string")
-
-        col1 = "{:28s}"
-        idnt = "  "
-
-        s = "\n"
-        s += col1.format("[Config path]") + "\n\n"
-        s += idnt + str(self.config) + "\n"
-
-        s += "\n"
-        s += col1.format("[GUI info]") + "\n\n"
-        s += col1.format(idnt+"Address: ") + self.url + "\n"
-        s += col1.format(idnt+"API Key: ") + self.apikey + "\n"
-
-        s += "\n"
-        s += col1.format("[Folders]") +"\n"
-        for key, value in self.folders.items():
-            s += "\n"
-            s += col1.format(idnt+"- "+str(key)) + "\n"
-            s += "{}{}ID: {}\n".format(idnt, idnt, value["id"])
-            s += "{}{}Label: {}\n".format(idnt, idnt, value["label"])
+        # a time.monotonic() value; requests' timeouts are capped to it if set
+        self.deadline = None
 
-        logger.debug("Done preparing __repr__ string")
-
-        return s
-
-    @property
-    def config(self): # read-only attribute
-        """Path to the config file saved in this instance."""
-        return copy.deepcopy(self._config)
-
-    @property
-    def url(self, *args): # read-only attribute
-        """Syncthing GUI server address."""
-        return "{}://{}:{}".format(self._proto, self._host, self._port)
-
-    @property
-    def apikey(self): # read-only attribute
-        """API key saved in this instance."""
-        return copy.deepcopy(self._apikey)
-
-    @property
-    def folders(self): # read-only attribute
-        """Folders' info stored in this instance."""
-        return copy.deepcopy(self._folders)
+        logger.debug("Done initializing a SyncthingSession instance.")
 
     def get(self, *args, **kwargs):
         """GET method with URL embeded in.
@@ -154,24 +78,46 @@ class SyncthingSession(requests.Session):
             args: positional arguments; each one represents a fregment in the
                 REST API endpoint URL. For example, session.get("system", "config")
                 will send a GET request to http://<server>/rest/system/config.
-            kwargs: optional arguments that a request takes.
+            kwargs: optional arguments that a request takes, plus `cache`, a
+                bool to bypass the response cache if False.
 
         Returns:
         --------
             A request.Response; response from the server.
         """
 
-        action = ""
-        for arg in args:
-            action += "/{}".format(arg.strip("/"))
+        action = self._rest_url("GET", self._get_apis, *args)
+        endpoint = action[len(self.url)+5:]
+        get = super(SyncthingSession, self).get
+
+        use_cache = kwargs.pop("cache", True) and self.response_cache is not None
+        if not use_cache or kwargs.get("stream") or not self.response_cache.ttl(endpoint):
+            return self._send("GET", endpoint, get, action, **kwargs)
 
-        # check if the api is ligal
-        if not action in self._get_apis:
-            logger.error("{} is not a legal GET endpoint.".format(action))
-            raise RuntimeError("{} is not a legal GET endpoint.".format(action))
+        start = time.perf_counter()
+        key = requests.Request("GET", action, params=kwargs.get("params")).prepare().url
+        cached = self.response_cache.get(key)
 
-        action = self.url + "/rest" + action
-        return super(SyncthingSession, self).get(action, **kwargs)
+        if cached is not None:
+            response = requests.Response()
+            response.status_code, headers, response._content = cached
+            response.headers = requests.structures.CaseInsensitiveDict(headers)
+            response.url, response.reason, response.encoding = key, "OK", "utf-8"
+            response.from_cache = True
+
+            if instrument.enabled():
+                instrument.emit(
+                    "request", time.perf_counter()-start, method="GET",
+                    endpoint=endpoint, status=response.status_code, cached=True)
+                response.json = instrument.wrap("json")(response.json)
+
+            return response
+
+        response = self._send("GET", endpoint, get, action, **kwargs)
+        if response.status_code == 200:
+            self.response_cache.put(
+                endpoint, key, response.status_code, response.headers, response.content)
+        return response
 
     def post(self, *args, data=None, json=None, **kwargs):
         """POST method with URL embeded in.
@@ -191,17 +137,85 @@ class SyncthingSession(requests.Session):
             A request.Response; response from the server.
         """
 
-        action = ""
-        for arg in args:
-            action += "/{}".format(arg.strip("/"))
+        action = self._rest_url("POST", self._post_apis, *args)
+        endpoint = action[len(self.url)+5:]
+
+        if self.response_cache is not None:
+            self.response_cache.invalidate(endpoint)
+
+        return self._send(
+            "POST", endpoint, super(SyncthingSession, self).post, action,
+            data=data, json=json, **kwargs)
+
+    def _send(self, method, endpoint, send, *args, **kwargs):
+        """Send a request and report its phases to instrumentation callbacks.
+
+        If `deadline` is set, the request's timeout is capped to the time left.
+
+        Args:
+        -----
+            method: a str; the HTTP method, for the callbacks and errors only.
+            endpoint: a str; the endpoint, for the callbacks and errors only.
+            send: the requests.Session method to call.
+            args, kwargs: arguments to `send`.
+
+        Returns:
+        --------
+            A request.Response; response from the server.
+        """
+
+        if self.deadline is not None:
+            left = self.deadline - time.monotonic()
+            if left <= 0:
+                raise requests.exceptions.Timeout("Deadline exceeded before {} {}".format(method, endpoint))
+            kwargs["timeout"] = min(kwargs.get("timeout") or left, left)
+
+        if not instrument.enabled():
+            return send(*args, **kwargs)
+
+        start = time.perf_counter()
+        response = send(*args, **kwargs)
+        total = time.perf_counter() - start
+
+        # `elapsed` stops when the headers arrive; the rest is reading the body
+        headers = min(response.elapsed.total_seconds(), total)
+        instrument.emit(
+            "request", headers, method=method, endpoint=endpoint,
+            status=response.status_code, cached=False)
+        if not kwargs.get("stream"):
+            instrument.emit("download", total-headers)
+
+        response.json = instrument.wrap("json")(response.json)
+        return response
+
+    def _live_config(self):
+        """Get the server's configuration in the format of GET `/system/config`."""
+
+        response = self.get("system", "config", cache=False)
+        response.raise_for_status()
+        return response.json()
+
+    def set_pool_size(self, size):
+        """Keep up to `size` connections per host for concurrent requests.
+
+        The default pools keep 10 connections per host; requests from more
+        threads than that would open and drop extra connections. Pools are
+        never shrunk, so a session shared by several subcommands (`batch`)
+        keeps its open connections.
+
+        Args:
+        -----
+            size: an int; the number of connections per host.
+        """
 
-        # check if the api is ligal
-        if not action in self._post_apis:
-            logger.error("{} is not a legal POST endpoint.".format(action))
-            raise RuntimeError("{} is not a legal POST endpoint.".format(action))
+        if size <= self._pool_size:
+            return
 
-        action = self.url + "/rest" + action
-        return super(SyncthingSession, self).post(action, data=data, json=json, **kwargs)
+        self._pool_size = size
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.mount("http+unix://", UnixAdapter(pool_maxsize=size))
 
     def options(self, *args, **kwargs):
         raise NotImplementedError
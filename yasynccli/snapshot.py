@@ -0,0 +1,165 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Provides Snapshot, a persisted index of the files in a monitored folder.
+
+`scan --changed` compares a fresh walk of a directory with the snapshot taken
+by the previous run, and only asks the server to scan the paths that changed.
+
+A snapshot is an SQLite database of (path, type, size, mtime, inode) rows.
+Paths are stored as UTF-8 blobs with "/" replaced by NUL, so the rows of a
+subtree are a range of the primary key, and are read in the same order as
+`treediff.walk` lists a tree: a directory before its children, and siblings
+sorted by name.
+"""
+import os
+import pathlib
+import sqlite3
+import logging
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.snapshot")
+logger.addHandler(logging.NullHandler())
+
+def _key(path):
+    """Convert a POSIX path to a primary key."""
+    return path.encode("utf-8", "surrogateescape").replace(b"/", b"\0")
+
+def _path(key):
+    """Convert a primary key to a POSIX path."""
+    return key.replace(b"\0", b"/").decode("utf-8", "surrogateescape")
+
+class Snapshot:
+    """A persisted index of path -> type/size/mtime/inode of one folder.
+
+    Changes found by `refresh` are staged, and only written by `commit`, e.g.,
+    after the server accepted the scan requests.
+
+    Constructor args:
+    -----------------
+        path: a str or Path object of the SQLite database file.
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path).expanduser()
+
+        # file names may be private too, so only the owner can read them
+        self._path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_CREAT | os.O_RDWR, 0o600)
+        os.close(fd)
+
+        self._db = sqlite3.connect(str(self._path), timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files (key BLOB PRIMARY KEY, type TEXT, "
+            "size INTEGER, mtime INTEGER, inode INTEGER) WITHOUT ROWID")
+
+        # changes staged by `refresh`; temporary tables are private to this connection
+        self._db.execute(
+            "CREATE TEMP TABLE upserts (key BLOB PRIMARY KEY, type TEXT, "
+            "size INTEGER, mtime INTEGER, inode INTEGER) WITHOUT ROWID")
+        self._db.execute("CREATE TEMP TABLE deletes (key BLOB PRIMARY KEY) WITHOUT ROWID")
+
+    def _select(self, columns, prefix):
+        """Select rows of a subtree in key order."""
+
+        prefix = prefix.strip("/")
+        if not prefix:
+            return self._db.execute("SELECT {} FROM files ORDER BY key".format(columns))
+
+        # children of "a" are keys from b"a\0" (exclusive) to b"a\1"
+        low = _key(prefix) + b"\0"
+        return self._db.execute(
+            "SELECT {} FROM files WHERE key > ? AND key < ? ORDER BY key".format(columns),
+            (low, low[:-1] + b"\1"))
+
+    def entries(self, prefix=""):
+        """Get the entries of a subtree.
+
+        Args:
+        -----
+            prefix: a str; the POSIX path of the subtree; "" for all.
+
+        Yields:
+        -------
+            (path, type, size, mtime in ns, inode) tuples, like those from
+            `treediff.walk`.
+        """
+
+        for key, kind, size, mtime, inode in self._select("*", prefix):
+            yield _path(key), kind, size, mtime, inode
+
+    def refresh(self, local, prefix="", batch=10000):
+        """Compare a walk of a subtree with the snapshot and stage the changes.
+
+        Args:
+        -----
+            local: a generator from `treediff.walk` of the same subtree.
+            prefix: a str; the POSIX path of the subtree; "" for all.
+            batch: an int; the number of staged rows written at once.
+
+        Returns:
+        --------
+            A list of str; the changed, added, or removed paths, none of which
+            is under another one. None if the snapshot has nothing of the
+            subtree yet, i.e., the whole subtree has to be scanned.
+        """
+
+        from . import treediff
+
+        fresh = self._select("1", prefix).fetchone() is None
+        changed, upserts, deletes = [], [], []
+
+        # children of new/removed directories are staged but not reported
+        for ours, theirs in treediff.merge(local, self.entries(prefix), False):
+            if theirs is None:
+                upserts.append((_key(ours[0]),) + ours[1:])
+            elif ours is None:
+                deletes.append((_key(theirs[0]),))
+            elif ours[1] != theirs[1] or (ours[1] != "dir" and ours[2:] != theirs[2:]):
+                upserts.append((_key(ours[0]),) + ours[1:])
+            else:
+                continue
+
+            path = (theirs if ours is None else ours)[0]
+            if not fresh and (not changed or not path.startswith(changed[-1] + "/")):
+                changed.append(path)
+
+            if len(upserts) >= batch or len(deletes) >= batch:
+                self._stage(upserts, deletes)
+                upserts, deletes = [], []
+
+        # parents of the subtree, so it is not new to a later walk of the folder;
+        # directories are only compared by types, so they need no stat results
+        parts = prefix.strip("/").split("/") if prefix.strip("/") else []
+        for i in range(len(parts)):
+            upserts.append((_key("/".join(parts[:i+1])), "dir", None, None, None))
+
+        self._stage(upserts, deletes)
+        logger.debug("Staged changes of {!r} in {}.".format(prefix, self._path))
+        return None if fresh else changed
+
+    def _stage(self, upserts, deletes):
+        """Write rows to the staging tables."""
+        self._db.executemany("INSERT OR REPLACE INTO upserts VALUES (?, ?, ?, ?, ?)", upserts)
+        self._db.executemany("INSERT OR REPLACE INTO deletes VALUES (?)", deletes)
+
+    def commit(self):
+        """Write the staged changes to the snapshot."""
+
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM files WHERE key IN (SELECT key FROM deletes)")
+            self._db.execute("INSERT OR REPLACE INTO files SELECT * FROM upserts")
+            self._db.execute("DELETE FROM upserts")
+            self._db.execute("DELETE FROM deletes")
+        logger.debug("Committed changes to {}.".format(self._path))
+
+    def close(self):
+        """Close the database; uncommitted changes are dropped."""
+        self._db.close()
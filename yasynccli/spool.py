@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""A scan request queue shared by processes, used by `scan --queue`.
+
+Each request is a small JSON file in a spool directory, written atomically by
+any process. The process holding the lock of the directory (the drainer) reads
+and removes the files, merges duplicate and nested paths of the same folder
+with a `Scheduler`, and sends the merged requests to the server no more often
+than the per-folder interval and the global rate allow.
+
+A caller adds its request before trying to take the lock, and a drainer checks
+the directory again after releasing the lock, so a new request is never left
+behind without a drainer. The limits' state is saved in the directory, so the
+limits hold across drainers. Requests that are not due yet (because of the
+limits) are left in the queue by callers that are not long-running drainers;
+they are sent by the next caller or a long-running drainer.
+"""
+import os
+import json
+import time
+import fcntl
+import pathlib
+import logging
+from .paths import drop_nested
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.spool")
+logger.addHandler(logging.NullHandler())
+
+class ScanQueue:
+    """A spool directory of scan requests.
+
+    Constructor args:
+    -----------------
+        path: a str or Path object of the spool directory.
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path).expanduser()
+        self._path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self._lock = None
+
+    def put(self, folder, subs):
+        """Add a request.
+
+        Args:
+        -----
+            folder: a str; the folder ID.
+            subs: a list of str or None; POSIX subpaths; None for the whole folder.
+        """
+
+        name = "{:020d}-{}-{}".format(time.time_ns(), os.getpid(), os.urandom(4).hex())
+        tmp = self._path.joinpath(".{}.tmp".format(name))
+        tmp.write_text(json.dumps({"folder": folder, "subs": subs}))
+        os.replace(tmp, self._path.joinpath("{}.json".format(name)))
+
+    def _files(self):
+        """Names of request files in the order they were added."""
+        return sorted(name for name in os.listdir(self._path) if name.endswith(".json"))
+
+    def empty(self):
+        """Whether there's no request."""
+        return not self._files()
+
+    def size(self):
+        """The number of requests."""
+        return len(self._files())
+
+    def take(self):
+        """Read and remove all requests.
+
+        Returns:
+        --------
+            A list of (folder ID, list of subpaths or None).
+        """
+
+        requests = []
+        for name in self._files():
+            path = self._path.joinpath(name)
+            try:
+                request = json.loads(path.read_text())
+            except ValueError: # not a request of ours; never written partially
+                logger.warning("Dropping invalid request file {}".format(path))
+            else:
+                requests.append((request["folder"], request["subs"]))
+            path.unlink()
+
+        return requests
+
+    def lock(self):
+        """Try to become the drainer without waiting.
+
+        Returns:
+        --------
+            A bool; whether the lock is taken.
+        """
+
+        fd = os.open(self._path.joinpath("lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        self._lock = fd
+        return True
+
+    def unlock(self):
+        """Stop being the drainer."""
+        fcntl.flock(self._lock, fcntl.LOCK_UN)
+        os.close(self._lock)
+        self._lock = None
+
+    def load_state(self):
+        """Get the limits' state saved by drainers.
+
+        Returns:
+        --------
+            A dict with keys `last`, {folder ID: time of the last scan}, and
+            `next`, the earliest time of the next request.
+        """
+
+        try:
+            state = json.loads(self._path.joinpath("state").read_text())
+        except (FileNotFoundError, ValueError):
+            return {"last": {}, "next": 0.}
+
+        # older versions only saved the times of the last scans
+        if not isinstance(state.get("last"), dict):
+            return {"last": state, "next": 0.}
+        return state
+
+    def save_state(self, last, next_time):
+        """Save the limits' state for later drainers.
+
+        Args:
+        -----
+            last: a dict of {folder ID: time of the last scan}.
+            next_time: a float; the earliest time of the next request.
+        """
+
+        tmp = self._path.joinpath(".state.tmp")
+        tmp.write_text(json.dumps({"last": last, "next": next_time}))
+        os.replace(tmp, self._path.joinpath("state"))
+
+class Scheduler:
+    """Merge scan requests and decide which folder to scan next.
+
+    A folder is not scanned again within `min_interval` seconds, and requests
+    are not sent faster than `rate` per second in total. Among the folders
+    ready to scan, the one with the fewest subpaths goes first, and scans of
+    whole folders go last.
+
+    Constructor args:
+    -----------------
+        min_interval: a float; the minimum seconds between scans of a folder.
+        rate: a float; the maximum requests per second.
+        last: a dict of {folder ID: time of the last scan}.
+        next_time: a float; the earliest time of the next request.
+    """
+
+    def __init__(self, min_interval, rate, last=None, next_time=0.):
+        self.min_interval = min_interval
+        self.rate = rate
+        self.last = dict(last or {})
+        self.next_time = next_time
+        self.pending = {} # folder ID -> list of subpaths or None
+
+    def add(self, folder, subs):
+        """Add a request, merging it with pending ones of the same folder."""
+
+        if subs is None or self.pending.get(folder, []) is None:
+            self.pending[folder] = None
+        else:
+            self.pending[folder] = drop_nested(self.pending.get(folder, []) + subs)
+
+    def pop(self, now):
+        """Take the next folder to scan.
+
+        Args:
+        -----
+            now: a float; the current time from time.time().
+
+        Returns:
+        --------
+            folder: a str or None; the folder ID; None if no folder is due.
+            subs: a list of str or None; the subpaths to scan.
+            wait: a float or None; seconds until the next folder is due if none
+                is due now; None if nothing is pending.
+        """
+
+        if not self.pending:
+            return None, None, None
+
+        if now < self.next_time:
+            return None, None, self.next_time - now
+
+        due = {
+            folder: self.last.get(folder, 0.) + self.min_interval
+            for folder in self.pending}
+        ready = [folder for folder, time_ in due.items() if time_ <= now]
+
+        if not ready:
+            return None, None, min(due.values()) - now
+
+        folder = min(ready, key=lambda f: (
+            self.pending[f] is None, len(self.pending[f] or ()), f))
+        return folder, self.pending.pop(folder), 0.
+
+    def done(self, folder, now, requests=1):
+        """Record a scan that took `requests` requests."""
+        self.last[folder] = now
+        self.next_time = now + requests / self.rate
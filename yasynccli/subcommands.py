@@ -8,14 +8,17 @@
 
 """Subcommand wrappers.
 """
+import os
 import sys
 import re
-import pprint
+import json
 import pathlib
 import logging
-import requests
-from .session import SyncthingSession
+import urllib.parse
+from .config import SyncthingConfig
+from .paths import drop_nested
 from . import formatters
+from . import output
 
 # get a logger with dummy handler if the caller does not have logging config
 logger = logging.getLogger("yasynccli.subcommands")
@@ -38,104 +41,1086 @@ def _add_docstring(func):
 
     return func
 
+def _session(args, daemon=True):
+    """Get a session from the global options in CMD arguments.
+
+    If a daemon started by `yasync-cli serve` is listening, a DaemonSession
+    forwarding requests to it is returned. Otherwise, a SyncthingSession is
+    created. `requests` is heavy to import, so it is only imported when really
+    talking to the server directly. Under `batch`, the session shared by all
+    lines (`args.session`) is returned.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        daemon: a bool; whether to try the daemon first.
+
+    Returns:
+    --------
+        A DaemonSession or a SyncthingSession.
+    """
+
+    if getattr(args, "session", None) is not None:
+        return args.session
+
+    if daemon and not args.no_daemon:
+        from .daemon import DaemonSession
+        session = DaemonSession.connect(
+            args.socket, args.config, args.url, args.apikey, args.cache_dir)
+        if session is not None:
+            return session
+
+    from .session import SyncthingSession
+    return SyncthingSession(
+        args.config, args.url, args.apikey, args.cache_dir, _response_cache(args))
+
+def _stderr(args):
+    """Get the stream for error messages; `--fleet` captures it per host."""
+    return getattr(args, "stderr", None) or sys.stderr
+
+def _response_cache(args):
+    """Get the on-disk response cache if `--cache` is given; None otherwise.
+
+    The database is only opened by the first cacheable GET request, so commands
+    that never send one (e.g., `scan`) do not touch it.
+    """
+
+    if not args.use_cache:
+        return None
+
+    from .cache import ResponseCache
+    return ResponseCache(args.cache_dir.joinpath("responses.sqlite"))
+
+# the upper bound of the query string length of a single `/db/scan` request
+_SCAN_QUERY_LIMIT = 8000
+
+def _read_paths(paths, null=False):
+    """Get the list of paths from CMD arguments and/or stdin.
+
+    Args:
+    -----
+        paths: a list of str; the positional PATH arguments. An empty list or a
+            `-` in it means reading paths from stdin.
+        null: a bool; whether paths in stdin are separated by NUL characters.
+
+    Returns:
+    --------
+        A list of str.
+    """
+
+    if paths and "-" not in paths:
+        return list(paths)
+
+    data = sys.stdin.read()
+    stdin = data.split("\0") if null else data.splitlines()
+    stdin = [path for path in stdin if path]
+
+    if not paths:
+        return stdin
+
+    return [path for path in paths if path != "-"] + stdin
+
+def _group_by_folder(syncthing, targets):
+    """Group paths by the monitored folders they belong to.
+
+    Args:
+    -----
+        syncthing: a SyncthingSession.
+        targets: an iterable of absolute pathlib.Path with no nested paths.
+
+    Returns:
+    --------
+        A dict of {folder ID: list of subpaths}. The value is None if the whole
+        folder has to be scanned.
+    """
+
+    batches = {}
+    for target in targets:
+        folder, sub = syncthing.resolve_folder(target)
+
+        if sub is None:
+            batches[folder] = None
+        elif folder not in batches:
+            batches[folder] = [sub]
+        elif batches[folder] is not None:
+            batches[folder].append(sub)
+
+    return batches
+
+def _locate(syncthing, target):
+    """Find the monitored folder of a path, the folder's path, and the subpath.
+
+    Args:
+    -----
+        syncthing: a SyncthingSession.
+        target: an absolute pathlib.Path.
+
+    Returns:
+    --------
+        folder: a str; the ID of the monitored folder.
+        root: a pathlib.Path; the path of the folder.
+        prefix: a str; the POSIX-style path of target relative to root; "" if
+            target is the folder itself.
+    """
+
+    folder, sub = syncthing.resolve_folder(target)
+    if sub is None:
+        return folder, target, ""
+
+    sub = pathlib.PurePath(sub)
+    return folder, target.parents[len(sub.parts)-1], sub.as_posix()
+
+def _changed(args, syncthing, targets):
+    """Find changed paths under directories with their folders' snapshots.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        syncthing: a SyncthingSession.
+        targets: a list of absolute pathlib.Path of directories; none of which
+            is under another one.
+
+    Returns:
+    --------
+        batches: a dict of {folder ID: list of subpaths or None}, like those
+            from `_group_by_folder`; folders without changes are excluded.
+        snapshots: a list of snapshot.Snapshot with staged changes.
+    """
+
+    import concurrent.futures
+    from . import treediff
+    from . import watch
+    from .snapshot import Snapshot
+
+    snapshots, batches = {}, {}
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as pool:
+        for target in targets:
+            folder, root, prefix = _locate(syncthing, target)
+
+            if folder not in snapshots:
+                snapshots[folder] = Snapshot(args.cache_dir.joinpath(
+                    "snapshots", "{}.sqlite".format(urllib.parse.quote(folder, safe=""))))
+
+            local = treediff.walk(str(root), prefix, pool, 2*args.jobs)
+            subs = snapshots[folder].refresh(local, prefix)
+
+            # no snapshot yet: the whole directory
+            if subs is None:
+                subs = [prefix] if prefix else None
+
+            logger.info("Changed paths in folder {} under {!r}: {}".format(
+                folder, prefix, "all" if subs is None else len(subs)))
+
+            if subs is None or (folder in batches and batches[folder] is None):
+                batches[folder] = None
+            elif subs:
+                batches[folder] = batches.get(folder, []) + subs
+
+    batches = {folder: watch.collapse(subs, args.max_subs) for folder, subs in batches.items()}
+    return batches, list(snapshots.values())
+
+def _scan_params(folder, subs):
+    """Generate parameters of `/db/scan` requests for a folder.
+
+    Subpaths are packed into as few requests as possible, each using multiple
+    `sub` parameters, while keeping the query string under _SCAN_QUERY_LIMIT.
+
+    Args:
+    -----
+        folder: a str; the folder ID.
+        subs: a list of str or None; subpaths to scan; None means the whole
+            folder.
+
+    Yields:
+    -------
+        A list of (key, value) tuples ready for the `params` of a request.
+    """
+
+    if subs is None:
+        yield [("folder", folder)]
+        return
+
+    head = [("folder", folder)]
+    params, length = list(head), len(urllib.parse.urlencode(head))
+    for sub in subs:
+        size = len(urllib.parse.urlencode([("sub", sub)])) + 1
+        if len(params) > 1 and length + size > _SCAN_QUERY_LIMIT:
+            yield params
+            params, length = list(head), len(urllib.parse.urlencode(head))
+        params.append(("sub", sub))
+        length += size
+
+    yield params
+
+def _read_cursor(path):
+    """Read the last event ID saved in a cursor file; 0 if there is none."""
+
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def _write_cursor(path, since):
+    """Save the last event ID to a cursor file atomically."""
+
+    tmp = "{}.tmp".format(path)
+    with open(tmp, "w") as f:
+        f.write("{}\n".format(since))
+    os.replace(tmp, path)
+
 @_add_docstring
 def show(args):
-    print(SyncthingSession(args.config, args.url, args.apikey))
+    config = getattr(args, "session", None) # parsed once by `batch`
+    if config is None:
+        config = SyncthingConfig(args.config, args.url, args.apikey, args.cache_dir)
+    data = {
+        "config": str(config.config), "url": config.url, "apikey": config.apikey,
+        "folders": [
+            {"path": str(folder.resolved), "id": folder.id, "label": folder.label,
+             "devices": list(folder.devices)}
+            for folder in config.model.folders],
+        "devices": [
+            {"id": device.id, "name": device.name}
+            for device in config.model.devices]}
+    out = output.writer(args)
+    out.document(data, lambda: str(config) + "\n")
+    out.close(False)
 
 @_add_docstring
 def log(args):
+    import time
     logger.debug("Starting subcommand `{}`.".format("log"))
-    syncthing = SyncthingSession(args.config, args.url, args.apikey)
-    result = syncthing.get("system", "log", timeout=60)
-    result.raise_for_status()
-    string = formatters.log(result.json())
+    syncthing = _session(args)
+    params = {}
+
+    # following never ends, so JSON is printed one message per line as `events`
+    # does; `json` and `compact` would hold every message until the end
+    if args.follow and args.output in ("json", "compact"):
+        out = output.Writer("ndjson", getattr(args, "stdout", None))
+    else:
+        out = output.writer(args)
+
+    try:
+        while True:
+            result = syncthing.get("system", "log", timeout=60, params=params)
+            result.raise_for_status()
+            data = result.json()
+
+            # only format messages when they are printed as text
+            if out.mode == "pretty":
+                for line in formatters.log(data):
+                    out.record(None, line)
+            else:
+                for msg in data["messages"] or []:
+                    out.record(msg)
+            out.flush()
+
+            if not args.follow:
+                break
+
+            # only get messages after the last one printed
+            if data["messages"]:
+                params["since"] = data["messages"][-1]["when"]
+
+            time.sleep(args.interval)
+
+    except KeyboardInterrupt:
+        pass
+
+    out.close()
     logger.debug("Done subcommand `{}`.".format("log"))
-    print(string)
 
 @_add_docstring
 def scan(args):
     logger.debug("Starting subcommand `{}`.".format("scan"))
 
-    params = dict(folder=None, sub=None)
-
-    # convert to full & absolute path & check existence
-    target = pathlib.Path(args.path).expanduser().resolve()
-    if not target.exists():
-        raise FileNotFoundError("{} not found".format(target))
+    # a long-running drainer may have nothing to add to the queue itself
+    paths = [] if args.drain and not args.paths else _read_paths(args.paths, args.null)
 
-    syncthing = SyncthingSession(args.config, args.url, args.apikey)
+    # convert to full & absolute paths; bad ones are reported and skipped
+    targets, skipped = [], 0
+    for path in paths:
+        target = pathlib.Path(path).expanduser().resolve()
+        if not target.exists():
+            _stderr(args).write("Warning: {} not found; skipped.\n".format(target))
+            skipped += 1
+            continue
+        targets.append(target)
 
-    # naive way to find monitored folder and relative path
-    for p, values in syncthing.folders.items():
+    syncthing = _session(args)
 
-        # only if target is under/equals to p then no exception is raised
+    valid = []
+    for target in drop_nested(targets):
         try:
-            sub = target.relative_to(p)
-        except ValueError:
-            continue
+            syncthing.resolve_folder(target)
+        except ValueError as err:
+            _stderr(args).write("Warning: {} Skipped.\n".format(err))
+            skipped += 1
+        else:
+            valid.append(target)
+    targets = valid
 
-        params["folder"] = values["id"]
-        params["sub"] = None if sub == pathlib.Path('.') else str(sub)
-        break
+    # with --changed, directories are narrowed down to what changed in them
+    batches, snapshots = {}, []
+    if args.changed:
+        batches, snapshots = _changed(args, syncthing, [t for t in targets if t.is_dir()])
+        targets = [target for target in targets if not target.is_dir()]
 
-    if params["folder"] is None:
-        raise ValueError("{} does not belong to any monitored folder.".format(target))
+    for folder, subs in _group_by_folder(syncthing, targets).items():
+        if folder not in batches:
+            batches[folder] = subs
+        elif subs is None or batches[folder] is None:
+            batches[folder] = None
+        else:
+            batches[folder] += subs
+
+    queue = None
+    if args.queue or args.drain:
+        from .spool import ScanQueue
+        queue = ScanQueue(args.socket.with_suffix(".queue"))
+
+    try:
+        # one POST per folder (or per chunk of subpaths) instead of one per path
+        for folder, subs in batches.items():
+            if queue is not None:
+                queue.put(folder, subs)
+                continue
+
+            for params in _scan_params(folder, subs):
+                response = syncthing.post("db", "scan", timeout=60, params=params)
+                response.raise_for_status()
+
+        # only remember what the server has been (or will surely be) asked to scan
+        for snapshot in snapshots:
+            snapshot.commit()
+    finally:
+        for snapshot in snapshots:
+            snapshot.close()
+
+    if queue is not None:
+        try:
+            _drain(args, syncthing, queue)
+        except KeyboardInterrupt:
+            pass
 
-    response = syncthing.post("db", "scan", timeout=60, params=params)
-    response.raise_for_status()
     logger.debug("Done subcommand `{}`.".format("scan"))
 
+    if skipped:
+        _stderr(args).write("{} of {} paths skipped.\n".format(skipped, len(paths)))
+        sys.exit(1)
+
+# seconds between checks of the scan queue when waiting
+_SPOOL_POLL = 0.2
+
+def _drain(args, syncthing, queue):
+    """Send queued scan requests if no other process is doing so.
+
+    Requests of the same folder are merged, and sent with the interval and the
+    rate limits in CMD arguments. Without `args.drain`, it only sends requests
+    that are due now and returns without waiting; the others stay in the queue
+    for the next caller or a `--drain` process. Requests not sent yet are put
+    back to the queue on errors.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        syncthing: a SyncthingSession or DaemonSession.
+        queue: a spool.ScanQueue.
+    """
+
+    import time
+    from . import watch
+    from .spool import Scheduler
+
+    # re-check after unlocking: a request may have been added in between
+    while queue.lock():
+        logger.debug("Draining the scan queue.")
+        scheduler, left = None, 0
+        try:
+            state = queue.load_state()
+            scheduler = Scheduler(args.min_interval, args.rate, state["last"], state["next"])
+            while True:
+                for folder, subs in queue.take():
+                    scheduler.add(folder, subs)
+
+                folder, subs, wait = scheduler.pop(time.time())
+                if folder is None:
+                    if not args.drain: # only a drainer waits for the limits
+                        break
+                    time.sleep(_SPOOL_POLL if wait is None else min(wait, _SPOOL_POLL))
+                    continue
+
+                scheduler.add(folder, subs) # put back until sent
+                count = 0
+                for params in _scan_params(folder, watch.collapse(subs, args.max_subs)):
+                    response = syncthing.post("db", "scan", timeout=60, params=params)
+                    response.raise_for_status()
+                    count += 1
+                del scheduler.pending[folder]
+
+                logger.info("Scanned folder {}: {}".format(folder, "all" if subs is None else subs))
+                scheduler.done(folder, time.time(), count)
+                queue.save_state(scheduler.last, scheduler.next_time)
+        finally:
+            if scheduler is not None:
+                left = len(scheduler.pending)
+                for folder, subs in scheduler.pending.items():
+                    queue.put(folder, subs)
+            queue.unlock()
+
+        # only what was put back is left, i.e., nothing is added by others
+        if queue.size() <= left:
+            break
+
 @_add_docstring
 def check(args):
     logger.debug("Starting subcommand `{}`.".format("check"))
-    syncthing = SyncthingSession(args.config, args.url, args.apikey)
+    syncthing = _session(args)
+
+    if syncthing.config is None:
+        raise RuntimeError("`check` compares a config file with the server, but there is no config file.")
 
     try:
-        response = syncthing.get("system", "config", timeout=60)
+        response = syncthing.get("system", "config", timeout=60, cache=False)
         response.raise_for_status()
+    except Exception as err:
+        # only imported for errors, so a DaemonSession does not need `requests`
+        import requests
+
+        # server connection error
+        if isinstance(err, requests.exceptions.ConnectionError):
+            _stderr(args).write("Error: couldn't connect to server at {}\n".format(syncthing.url))
+            sys.exit(1)
+
+        # server connected, but forbided our client
+        if isinstance(err, requests.exceptions.HTTPError):
+            _stderr(args).write("Error: server refused the clint. Maybe check the API key?\n")
+            sys.exit(1)
+
+        raise
+
+    from . import checker
+    diffs = checker.compare(syncthing, response.json())
 
-    # server connection error
-    except requests.exceptions.ConnectionError:
-        sys.stderr.write("Error: couldn't connect to server at {}\n".format(syncthing.url))
+    out = output.writer(args)
+    if out.mode == "pretty":
+        out.document(diffs, formatters.check(diffs))
+    else:
+        for diff in diffs:
+            out.record(diff)
+    out.close()
+
+    logger.debug("Done subcommand `{}`.".format("check"))
+
+    if diffs:
         sys.exit(1)
 
-    # server connected, but forbided our client
-    except requests.exceptions.HTTPError:
-        sys.stderr.write("Error: server refused the clint. Maybe check the API key?\n")
+@_add_docstring
+def status(args):
+    import requests
+    import concurrent.futures
+    logger.debug("Starting subcommand `{}`.".format("status"))
+
+    # the daemon serves one request at a time per client, so talk to the server
+    syncthing = _session(args, daemon=False)
+    syncthing.set_pool_size(args.jobs)
+
+    def _fetch(endpoint, params):
+        """GET an endpoint; return (JSON, None) or (None, error message)."""
+        try:
+            response = syncthing.get(endpoint, params=params, timeout=60)
+            response.raise_for_status()
+            return response.json(), None
+        except (requests.exceptions.RequestException, ValueError) as err:
+            return None, str(err)
+
+    # the local device is in every folder but has no remote completion
+    data, error = _fetch("system/status", None)
+    if error is not None:
+        _stderr(args).write("Error: couldn't get the status from {}: {}\n".format(syncthing.url, error))
         sys.exit(1)
+    my_id = data.get("myID")
 
-    config = response.json()
-    config["instance"] = syncthing # because formatters.check only takes one arg
-    formatters.check(config)
+    folders = [
+        folder for folder in syncthing.model.folders
+        if not args.folders or folder.id in args.folders]
 
-    logger.debug("Done subcommand `{}`.".format("check"))
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as pool:
+        jobs = {}
+        for folder in folders:
+            params = {"folder": folder.id}
+            jobs[folder.id, None] = pool.submit(_fetch, "db/status", params)
+            for device in folder.devices:
+                if device != my_id:
+                    jobs[folder.id, device] = pool.submit(
+                        _fetch, "db/completion", dict(params, device=device))
+
+        results = {key: job.result() for key, job in jobs.items()}
+
+    summary = _status_summary(syncthing, folders, results)
+
+    # one line per folder and per device with ndjson
+    out = output.writer(args)
+    if out.mode == "ndjson":
+        for folder in summary["folders"]:
+            out.record(dict(folder, type="folder"))
+        for device_id, device in summary["devices"].items():
+            out.record(dict(device, type="device", id=device_id))
+    else:
+        out.document(summary, lambda: formatters.status(summary))
+    out.close(False)
+
+    logger.debug("Done subcommand `{}`.".format("status"))
 
 @_add_docstring
-def get(args):
-    logger.debug("Starting subcommand `{}`.".format("get"))
+def diff(args):
+    import concurrent.futures
+    from . import jsonstream
+    from . import treediff
+    logger.debug("Starting subcommand `{}`.".format("diff"))
+
+    target = pathlib.Path(args.path).expanduser().resolve()
+    if not target.is_dir():
+        raise NotADirectoryError("{} is not a directory".format(target))
+
+    # the daemon does not stream, so always talk to the server directly
+    syncthing = _session(args, daemon=False)
+    folder, root, prefix = _locate(syncthing, target)
+
+    params = {"folder": folder}
+    if prefix:
+        params["prefix"] = prefix
+
+    response = syncthing.get("db", "browse", timeout=60, params=params, stream=True)
+    response.raise_for_status()
+
+    # differences are printed as soon as found, whatever `--output` is
+    out = output.Writer("ndjson", getattr(args, "stdout", None))
+    found = False
+
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as pool:
+        local = treediff.walk(str(root), prefix, pool, 2*args.jobs)
+        events = jsonstream.iterparse(response.iter_content(65536))
+        server = treediff.remote(jsonstream.records(events, "/db/browse", prefix))
+
+        try:
+            for record in treediff.compare(local, server, args.mtime_window):
+                out.record(dict(record, folder=folder))
+                found = True
+        finally:
+            local.close() # cancel prefetched listings
+
+    out.close()
+    logger.debug("Done subcommand `{}`.".format("diff"))
+
+    if found:
+        sys.exit(1)
+
+def _status_summary(syncthing, folders, results):
+    """Aggregate `/db/status` and `/db/completion` results.
+
+    Args:
+    -----
+        syncthing: a SyncthingSession.
+        folders: a list of model.Folder.
+        results: a dict of {(folder ID, device ID or None): (JSON, error)};
+            None for `/db/status`.
+
+    Returns:
+    --------
+        A dict with `folders` and `devices`. Each folder has `id`, `label`,
+        `state`, `completion` (local, in percent), `needBytes`, `error`, and
+        `devices` of {device ID: {"completion", "needBytes", "error"}}. Each
+        device has `name`, `folders`, `completion` over all its folders (None
+        if all requests failed), `needBytes`, and `errors`.
+    """
+
+    devices = {}
+    summary = {"folders": [], "devices": devices}
+
+    for folder in folders:
+        status, error = results[folder.id, None]
+        status = status or {}
+        total = status.get("globalBytes", 0)
+        need = status.get("needBytes", 0)
+
+        item = {
+            "id": folder.id, "label": folder.label, "state": status.get("state"),
+            "completion": 100. if not total else 100. * (total - need) / total,
+            "needBytes": need, "error": error, "devices": {}}
+
+        for device_id in folder.devices:
+            if (folder.id, device_id) not in results: # the local device
+                continue
+
+            completion, error = results[folder.id, device_id]
+            completion = completion or {}
+            item["devices"][device_id] = {
+                "completion": completion.get("completion"),
+                "needBytes": completion.get("needBytes", 0), "error": error}
+
+            device = devices.setdefault(device_id, {
+                "name": syncthing.devices[device_id].name if device_id in syncthing.devices else "",
+                "folders": 0, "globalBytes": 0, "needBytes": 0, "errors": 0})
+            device["folders"] += 1
+            device["globalBytes"] += completion.get("globalBytes", 0)
+            device["needBytes"] += completion.get("needBytes", 0)
+            device["errors"] += error is not None
+
+        summary["folders"].append(item)
+
+    for device in devices.values():
+        total = device.pop("globalBytes")
+        if device["errors"] == device["folders"]:
+            device["completion"] = None
+        else:
+            device["completion"] = 100. if not total else 100. * (total - device["needBytes"]) / total
+
+    return summary
+
+def _params(tokens):
+    """Parse `key=value` CMD arguments into a dict of API parameters."""
 
     params = {}
-    for s in args.args:
+    for s in tokens:
         match = re.search(r"^(?P<key>.+?)=(?P<value>.+?)$", s)
+        if match is None:
+            raise RuntimeError("{} is not in the form of key=value.".format(s))
         params[match.group("key")] = match.group("value")
+    return params
 
-    response = SyncthingSession(args.config, args.url, args.apikey).get(
-        args.endpoint, timeout=60, params=params)
+def _get_specs(tokens, stdin=None):
+    """Split `ENDPOINT key=value ... ENDPOINT key=value ...` into requests.
+
+    Args:
+    -----
+        tokens: a list of str; a new request starts at each token without "=".
+        stdin: a file object or None; if given, each non-empty line is either
+            `ENDPOINT key=value ...` (shell-quoted) or a JSON object with
+            `endpoint` and optional `params`.
+
+    Returns:
+    --------
+        A list of (endpoint, params dict).
+    """
+
+    import shlex
+
+    groups = []
+    for token in tokens:
+        if "=" not in token:
+            groups.append([token])
+        elif groups:
+            groups[-1].append(token)
+        else:
+            raise RuntimeError("{} does not follow an endpoint.".format(token))
+
+    specs = [("/" + group[0].strip("/"), _params(group[1:])) for group in groups]
+
+    for line in stdin or []:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            spec = json.loads(line)
+            specs.append(("/" + spec["endpoint"].strip("/"), spec.get("params") or {}))
+        else:
+            tokens = shlex.split(line)
+            specs.append(("/" + tokens[0].strip("/"), _params(tokens[1:])))
+
+    for endpoint, _ in specs:
+        if endpoint not in SyncthingConfig._get_apis:
+            raise RuntimeError("{} is not a legal GET endpoint.".format(endpoint))
+
+    return specs
+
+@_add_docstring
+def get(args):
+    logger.debug("Starting subcommand `{}`.".format("get"))
+
+    if args.endpoint == "-":
+        specs = _get_specs(args.args, sys.stdin)
+    else:
+        specs = _get_specs([args.endpoint] + args.args)
+
+    if args.stream:
+        if len(specs) != 1:
+            raise RuntimeError("--stream takes exactly one endpoint.")
+        _get_stream(args, *specs[0])
+        logger.debug("Done subcommand `{}`.".format("get"))
+        return
+
+    if len(specs) > 1 or args.endpoint == "-":
+        _get_many(args, specs)
+        logger.debug("Done subcommand `{}`.".format("get"))
+        return
+
+    endpoint, params = specs[0]
+    response = _session(args).get(endpoint, timeout=60, params=params)
     response.raise_for_status()
 
+    out = output.writer(args)
+    out.document(response.json())
+    out.close(False)
     logger.debug("Done subcommand `{}`.".format("get"))
-    pprint.pprint(response.json())
+
+def _get_many(args, specs):
+    """Send GET requests concurrently and print results as records.
+
+    Each record is a JSON object with `endpoint`, `params`, `status`,
+    `result`, and `error`, in the same order as the requests, and is printed
+    as one line unless the output format is `json` or `compact`. A failed
+    request gives a record with `error` and does not stop the others.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        specs: a list of (endpoint, params dict).
+    """
+
+    import requests
+    import concurrent.futures
+
+    # a daemon connection serves one request at a time
+    jobs = min(args.jobs, len(specs))
+    syncthing = _session(args, daemon=jobs == 1)
+    if jobs > 1:
+        syncthing.set_pool_size(jobs)
+
+    def _fetch(spec):
+        endpoint, params = spec
+        line = {"endpoint": endpoint, "params": params, "status": None,
+                "result": None, "error": None}
+        try:
+            response = syncthing.get(endpoint, params=params, timeout=60)
+            line["status"] = response.status_code
+            response.raise_for_status()
+            line["result"] = response.json()
+        except (requests.exceptions.RequestException, ValueError) as err:
+            line["error"] = str(err)
+        return line
+
+    failed = False
+    out = output.writer(args)
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        for line in pool.map(_fetch, specs):
+            failed = failed or line["error"] is not None
+            out.record(line)
+            out.flush()
+    out.close()
+
+    if failed:
+        sys.exit(1)
+
+def _get_stream(args, endpoint, params):
+    """Print a GET response as NDJSON records while it is being downloaded.
+
+    Args:
+    -----
+        args: resulting namespace from parsing CMD arguments.
+        endpoint: a str; the GET endpoint.
+        params: a dict; parameters of the API endpoint.
+    """
+
+    from . import jsonstream
+
+    # the daemon does not stream, so always talk to the server directly
+    response = _session(args, daemon=False).get(
+        endpoint, timeout=60, params=params, stream=True)
+    response.raise_for_status()
+
+    # always one record per line as soon as parsed, whatever `--output` is, so
+    # memory use does not grow with the response size
+    out = output.Writer("ndjson", getattr(args, "stdout", None))
+
+    events = jsonstream.iterparse(response.iter_content(65536))
+    for record in jsonstream.records(events, endpoint, params.get("prefix")):
+        out.record(record)
+
+    out.close()
 
 @_add_docstring
 def post(args):
     logger.debug("Starting subcommand `{}`.".format("post"))
 
-    params = {}
-    for s in args.args:
-        match = re.search(r"^(?P<key>.+?)=(?P<value>.+?)$", s)
-        params[match.group("key")] = match.group("value")
+    params = _params(args.args)
 
-    response = SyncthingSession(args.config, args.url, args.apikey).post(
+    response = _session(args).post(
         args.endpoint, timeout=60, params=params)
     response.raise_for_status()
     logger.debug("Done subcommand `{}`.".format("post"))
+
+@_add_docstring
+def events(args):
+    logger.debug("Starting subcommand `{}`.".format("events"))
+
+    since = args.since
+    if since is None:
+        since = 0 if args.cursor is None else _read_cursor(args.cursor)
+
+    params = {"timeout": args.poll_timeout}
+    if args.limit is not None:
+        params["limit"] = args.limit
+    if args.events is not None:
+        params["events"] = args.events
+
+    # events never end, so they are always printed one per line
+    out = output.Writer("ndjson", getattr(args, "stdout", None))
+    syncthing = _session(args)
+
+    try:
+        while True:
+            params["since"] = since
+
+            # the server holds the request up to `poll_timeout` if no new events
+            response = syncthing.get("events", timeout=args.poll_timeout+30, params=params)
+            response.raise_for_status()
+
+            for event in response.json() or []:
+                out.record(event)
+                out.flush()
+
+                since = event["id"]
+                if args.cursor is not None:
+                    _write_cursor(args.cursor, since)
+
+            if args.once:
+                break
+
+    except KeyboardInterrupt:
+        pass
+
+    logger.debug("Done subcommand `{}`.".format("events"))
+
+@_add_docstring
+def watch_scan(args):
+    import time
+    from . import watch
+    logger.debug("Starting subcommand `{}`.".format("watch-scan"))
+
+    syncthing = _session(args)
+
+    # watch the given subtrees, or all monitored folders
+    if args.paths:
+        roots = [pathlib.Path(path).expanduser().resolve() for path in args.paths]
+        for root in roots:
+            syncthing.resolve_folder(root) # raise if not in any monitored folder
+        roots = [str(root) for root in drop_nested(roots)]
+    else:
+        roots = [str(p) for p in syncthing.folders if p.is_dir()]
+
+    if args.poll or not watch.Inotify.available():
+        watcher = watch.Poller(roots, args.interval)
+    else:
+        watcher = watch.Inotify(roots)
+
+    logger.info("Watching {} directories.".format(len(roots)))
+
+    def _flush(pending):
+        targets = []
+        for path in drop_nested(map(pathlib.Path, pending)):
+            try:
+                syncthing.resolve_folder(path)
+            except ValueError: # e.g., the parent of a deleted folder
+                logger.warning("Skipping {}: not in any monitored folder.".format(path))
+                continue
+            targets.append(path)
+
+        batches = _group_by_folder(syncthing, targets)
+        for folder, subs in batches.items():
+            subs = watch.collapse(subs, args.max_subs)
+            logger.info("Scanning folder {}: {}".format(folder, "all" if subs is None else subs))
+            for params in _scan_params(folder, subs):
+                response = syncthing.post("db", "scan", timeout=60, params=params)
+                response.raise_for_status()
+
+    # collect changes until no new ones for `delay` seconds, but flush at least
+    # every `max_delay` seconds under continuous writes
+    pending, first, last = set(), None, None
+    try:
+        while True:
+            timeout = None
+            if pending:
+                timeout = min(last + args.delay, first + args.max_delay) - time.monotonic()
+
+            changes = watcher.read(None if timeout is None else max(timeout, 0))
+            now = time.monotonic()
+
+            if changes:
+                first = now if not pending else first
+                last = now
+                pending.update(changes)
+
+            if pending and (now >= last + args.delay or now >= first + args.max_delay):
+                _flush(pending)
+                pending = set()
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    logger.debug("Done subcommand `{}`.".format("watch-scan"))
+
+@_add_docstring
+def serve(args):
+    from . import daemon
+    logger.debug("Starting subcommand `{}`.".format("serve"))
+    daemon.serve(
+        args.socket, args.config, args.url, args.apikey, args.cache_dir,
+        _response_cache(args))
+    logger.debug("Done subcommand `{}`.".format("serve"))
+
+@_add_docstring
+def cache(args):
+    from .cache import ResponseCache
+    logger.debug("Starting subcommand `{}`.".format("cache"))
+
+    responses = ResponseCache(args.cache_dir.joinpath("responses.sqlite"))
+
+    if args.clear:
+        responses.clear()
+
+    stats = responses.stats()
+    total = stats["hits"] + stats["misses"]
+    stats["file"] = str(responses._path)
+    stats["hitRate"] = stats["hits"] / total if total else 0.
+
+    text = "".join([
+        "Cache file: {}\n".format(stats["file"]),
+        "Entries: {}\n".format(stats["entries"]),
+        "Bytes: {}\n".format(stats["bytes"]),
+        "Hits: {}\n".format(stats["hits"]),
+        "Misses: {}\n".format(stats["misses"]),
+        "Hit rate: {:.1f}%\n".format(100. * stats["hitRate"])])
+
+    out = output.writer(args)
+    out.document(stats, text)
+    out.close(False)
+
+    responses.close()
+    logger.debug("Done subcommand `{}`.".format("cache"))
+
+@_add_docstring
+def config_apply(args):
+    import requests
+    from . import edits
+    logger.debug("Starting subcommand `{}`.".format("config apply"))
+
+    if args.file == "-":
+        changes = edits.read(sys.stdin)
+    else:
+        with open(os.path.expanduser(args.file), "r") as f:
+            changes = edits.read(f)
+
+    syncthing = _session(args)
+
+    # one GET, all edits locally, and at most one POST (one config reload)
+    response = syncthing.get("system", "config", timeout=60, cache=False)
+    response.raise_for_status()
+    old = response.json()
+    new = edits.apply(old, changes)
+    lines = edits.diff(old, new)
+
+    posted = False
+    if lines and not args.dry_run:
+        response = syncthing.post("system", "config", json=new, timeout=60)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            _stderr(args).write("Error: server rejected the configuration: {}\n".format(response.text))
+            sys.exit(1)
+        posted = True
+
+    if not lines:
+        text = "No changes.\n"
+    elif posted:
+        text = "\n".join(lines) + "\nApplied {} edits.\n".format(len(changes))
+    else:
+        text = "\n".join(lines) + "\n"
+
+    out = output.writer(args)
+    out.document(
+        {"edits": len(changes), "changed": bool(lines), "posted": posted, "diff": lines}, text)
+    out.close(False)
+
+    logger.debug("Done subcommand `{}`.".format("config apply"))
+
+# global options that only take effect once per process, so not on batch lines
+_BATCH_FIXED = ["log_level", "log_file", "profile", "fleet"]
+
+def _batch_key(args):
+    """The options that make a batch line need a session of its own."""
+    return (args.config, args.url, args.apikey, args.cache_dir, args.use_cache)
+
+@_add_docstring
+def batch(args):
+    import shlex
+    import argparse
+    from .__main__ import get_parser
+    logger.debug("Starting subcommand `{}`.".format("batch"))
+
+    if args.file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(os.path.expanduser(args.file), "r") as f:
+            lines = f.read().splitlines()
+
+    # one config parse and one connection pool for all lines; the daemon serves
+    # one request at a time, so concurrent subcommands need a direct session
+    parser = get_parser()
+    shared = {key: value for key, value in vars(args).items() if key not in ("cmd", "func", "file")}
+    sessions = {_batch_key(args): _session(args, daemon=False)}
+
+    def _line_session(line_args):
+        """Get the session of a line, which may have its own config, URL, etc."""
+
+        for name in _BATCH_FIXED:
+            if getattr(line_args, name) != shared.get(name):
+                raise RuntimeError("`--{}` can not be given on a batch line.".format(
+                    name.replace("_", "-")))
+
+        line_args.config = line_args.config.expanduser().resolve()
+        line_args.cache_dir = line_args.cache_dir.expanduser()
+        key = _batch_key(line_args)
+
+        if key not in sessions:
+            logger.debug("New session for line options {}".format(key[:2]))
+            if line_args.socket == args.socket: # not given on the line
+                from .config import socket_path
+                line_args.socket = socket_path(*key[:3], line_args.cache_dir)
+            sessions[key] = _session(line_args, daemon=False)
+        return sessions[key]
+
+    ran, failed = 0, 0
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+
+        ran += 1
+        logger.debug("Running line {}: {}".format(lineno, line))
+        try:
+            # global options of `batch` are the defaults of each line
+            line_args = parser.parse_args(shlex.split(line), argparse.Namespace(**shared))
+            if line_args.cmd == "batch":
+                raise RuntimeError("`batch` can not be nested.")
+            line_args.session = _line_session(line_args)
+            line_args.func(line_args)
+        except SystemExit as err: # argparse errors and subcommands' exit codes
+            if err.code not in (None, 0):
+                failed += 1
+                sys.stderr.write("Error: line {}: exit code {}: {}\n".format(lineno, err.code, line))
+        except Exception as err: # report and go on with the next line
+            failed += 1
+            sys.stderr.write("Error: line {}: {}: {}\n".format(lineno, err, line))
+        sys.stdout.flush()
+
+    for session in sessions.values():
+        session.close()
+
+    logger.debug("Done subcommand `{}`.".format("batch"))
+
+    if failed:
+        sys.stderr.write("{} of {} lines failed.\n".format(failed, ran))
+        sys.exit(1)
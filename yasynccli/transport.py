@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""A requests transport adapter for HTTP over Unix-domain sockets.
+
+Mount UnixAdapter on the `http+unix://` prefix; URLs carry the percent-encoded
+socket path as the host, e.g., http+unix://%2Fvar%2Frun%2Fsyncthing.sock/rest.
+Connections are pooled and kept alive by urllib3 as for TCP.
+"""
+import socket
+import threading
+import urllib.parse
+import urllib3
+import requests.adapters
+
+class UnixHTTPConnection(urllib3.connection.HTTPConnection):
+    """An urllib3 HTTP connection over a Unix-domain socket.
+
+    Constructor args:
+    -----------------
+        path: a str; the path to the socket.
+        others: the same as urllib3.connection.HTTPConnection's.
+    """
+
+    def __init__(self, path, *args, **kwargs):
+        super(UnixHTTPConnection, self).__init__("localhost", *args, **kwargs)
+        self.socket_path = path
+
+    def _new_conn(self):
+        timeout = self.timeout if isinstance(self.timeout, (int, float)) else None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as err:
+            sock.close()
+            raise urllib3.exceptions.NewConnectionError(
+                self, "Failed to connect to {}: {}".format(self.socket_path, err))
+        return sock
+
+class UnixHTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+    """An urllib3 connection pool of UnixHTTPConnection.
+
+    Constructor args:
+    -----------------
+        path: a str; the path to the socket.
+        others: the same as urllib3.connectionpool.HTTPConnectionPool's.
+    """
+
+    def __init__(self, path, **kwargs):
+        super(UnixHTTPConnectionPool, self).__init__("localhost", **kwargs)
+        self.socket_path = path
+
+    def _new_conn(self):
+        self.num_connections += 1
+        return UnixHTTPConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+class UnixAdapter(requests.adapters.HTTPAdapter):
+    """A requests transport adapter for `http+unix://` URLs.
+
+    Constructor args:
+    -----------------
+        the same as requests.adapters.HTTPAdapter's.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._unix_pools = {}
+        self._unix_lock = threading.Lock()
+        super(UnixAdapter, self).__init__(*args, **kwargs)
+
+    def get_connection(self, url, proxies=None):
+        """Get the connection pool of the socket in a URL."""
+
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url).netloc)
+
+        with self._unix_lock:
+            pool = self._unix_pools.get(path)
+            if pool is None:
+                pool = UnixHTTPConnectionPool(path, maxsize=self._pool_maxsize)
+                self._unix_pools[path] = pool
+
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        """Get the connection pool of the socket in a request's URL."""
+        return self.get_connection(request.url, proxies)
+
+    def request_url(self, request, proxies):
+        """Proxies never apply to Unix-domain sockets."""
+        return request.path_url
+
+    def close(self):
+        """Close all pooled connections."""
+
+        super(UnixAdapter, self).close()
+        with self._unix_lock:
+            for pool in self._unix_pools.values():
+                pool.close()
+            self._unix_pools.clear()
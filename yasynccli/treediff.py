@@ -0,0 +1,280 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""Compare a local directory tree with the index of a Syncthing server.
+
+Both sides are streams of (path, type, size, mtime in ns, inode) entries in the
+same order: depth-first, a directory before its children, and siblings sorted by
+name. `/db/browse` lists entries in this order, and `walk` lists the local tree
+in this order with `os.scandir` in a thread pool, so `compare` merges the two
+streams like sorted lists (`merge`). Only a bounded number of directory listings and one
+browse record are held in memory at a time.
+"""
+import os
+import re
+import stat
+import logging
+import datetime
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.treediff")
+logger.addHandler(logging.NullHandler())
+
+# files Syncthing never puts in the index
+_internal = {".stfolder", ".stignore", ".stversions"}
+_temporary = re.compile(r"^(\.syncthing\..*\.tmp|~syncthing~.*\.tmp)$")
+
+_timestamp = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$")
+
+def _mtime_ns(text):
+    """Convert an RFC 3339 timestamp with up to 9 fractional digits to ns."""
+
+    match = _timestamp.match(text)
+    if match is None:
+        raise ValueError("Invalid timestamp: {}".format(text))
+
+    base, fraction, zone = match.groups()
+    seconds = datetime.datetime.fromisoformat(base + ("+00:00" if zone == "Z" else zone))
+    return int(seconds.timestamp()) * 10**9 + int((fraction or "0")[:9].ljust(9, "0"))
+
+def _format_ns(mtime):
+    """Convert ns since the epoch to an RFC 3339 timestamp in UTC."""
+
+    seconds, ns = divmod(mtime, 10**9)
+    stamp = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+    return "{}.{:09d}Z".format(stamp.strftime("%Y-%m-%dT%H:%M:%S"), ns)
+
+def _list(path):
+    """List a directory as a sorted list of (name, type, size, mtime in ns, inode)."""
+
+    entries = []
+    with os.scandir(path) as iterator:
+        for entry in iterator:
+            if entry.name in _internal or _temporary.match(entry.name):
+                continue
+
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except FileNotFoundError: # removed while listing
+                continue
+
+            if stat.S_ISLNK(info.st_mode):
+                kind = "symlink"
+            elif stat.S_ISDIR(info.st_mode):
+                kind = "dir"
+            elif stat.S_ISREG(info.st_mode):
+                kind = "file"
+            else: # sockets, pipes, etc. are not synced
+                continue
+
+            entries.append((entry.name, kind, info.st_size, info.st_mtime_ns, info.st_ino))
+
+    entries.sort()
+    return entries
+
+def _safe_list(path):
+    """List a directory; an unreadable one is treated as empty."""
+
+    try:
+        return _list(path)
+    except OSError as err:
+        logger.warning("Skipping {}: {}".format(path, err))
+        return []
+
+def walk(root, prefix, pool, window=16):
+    """List a local tree depth-first with sorted siblings.
+
+    Listings of subdirectories are prefetched in a thread pool, up to `window`
+    directories ahead per level of depth.
+
+    Args:
+    -----
+        root: a str; the path of the monitored folder.
+        prefix: a str; the subdirectory to list, relative to root; "" for all.
+        pool: a concurrent.futures.Executor.
+        window: an int; the number of prefetched listings per level.
+
+    Yields:
+    -------
+        (path relative to root, type, size, mtime in ns, inode) tuples, where
+        type is "dir", "file", or "symlink". Send True after a directory to skip its
+        children.
+    """
+
+    prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    # frame: [path prefix, entries, next entry, next entry to prefetch, futures]
+    stack = [[prefix, _safe_list(os.path.join(root, prefix)), 0, 0, {}]]
+    try:
+        while stack:
+            frame = stack[-1]
+            parent, entries, i, ahead, futures = frame
+
+            while ahead < len(entries) and len(futures) < window:
+                if entries[ahead][1] == "dir":
+                    futures[ahead] = pool.submit(
+                        _safe_list, os.path.join(root, parent + entries[ahead][0]))
+                ahead += 1
+            frame[3] = ahead
+
+            if i == len(entries):
+                stack.pop()
+                continue
+            frame[2] = i + 1
+
+            name, kind, size, mtime, inode = entries[i]
+            skip = yield parent + name, kind, size, mtime, inode
+
+            future = futures.pop(i, None)
+            if kind != "dir":
+                continue
+
+            if skip:
+                if future is not None:
+                    future.cancel()
+                continue
+
+            if future is None:
+                future = pool.submit(_safe_list, os.path.join(root, parent + name))
+            stack.append([parent + name + "/", future.result(), 0, 0, {}])
+    finally: # e.g., the caller stops early
+        for frame in stack:
+            for future in frame[4].values():
+                future.cancel()
+
+def remote(records):
+    """Convert `/db/browse` records from `jsonstream.records` to entries.
+
+    Args:
+    -----
+        records: an iterable of dicts with `path`, `type`, `size`, and `modTime`.
+
+    Yields:
+    -------
+        (path, type, size, mtime in ns, None) tuples, like those from `walk`.
+    """
+
+    for record in records:
+        if not isinstance(record, dict) or "type" not in record:
+            continue
+
+        kind = str(record["type"]).lower()
+        if "dir" in kind:
+            kind = "dir"
+        elif "symlink" in kind:
+            kind = "symlink"
+        else:
+            kind = "file"
+
+        mtime = record.get("modTime")
+        yield (
+            record["path"].strip("/"), kind, record.get("size", 0),
+            None if mtime is None else _mtime_ns(mtime), None)
+
+def merge(local, other, skip=True):
+    """Pair up the entries of two sorted streams by their paths.
+
+    Args:
+    -----
+        local: a generator from `walk`.
+        other: an iterable of entries in the same order, e.g., from `remote`.
+        skip: a bool; whether to skip the children of a directory that is only
+            on one side or is not a directory on the other side.
+
+    Yields:
+    -------
+        (local entry, other entry) tuples; either one is None if the path is
+        only on the other side.
+    """
+
+    other = iter(other)
+    last = None
+
+    def _next_other(parent=None):
+        nonlocal last
+        for entry in other:
+            key = entry[0].split("/")
+            if parent is not None and key[:len(parent)] == parent:
+                continue # a child of a skipped directory
+            if last is not None and key < last:
+                raise RuntimeError("Entries are not sorted at {}".format(entry[0]))
+            last = key
+            return key, entry
+        return None, None
+
+    def _next_local(children=False):
+        try:
+            entry = local.send(True) if children else next(local)
+        except StopIteration:
+            return None, None
+        return entry[0].split("/"), entry
+
+    lkey, ours = _next_local()
+    okey, theirs = _next_other()
+
+    while ours is not None or theirs is not None:
+        if theirs is None or (ours is not None and lkey < okey):
+            yield ours, None
+            lkey, ours = _next_local(skip and ours[1] == "dir")
+        elif ours is None or okey < lkey:
+            yield None, theirs
+            okey, theirs = _next_other(okey if skip and theirs[1] == "dir" else None)
+        else:
+            yield ours, theirs
+            mismatch = skip and ours[1] != theirs[1]
+            key = okey
+            lkey, ours = _next_local(mismatch and ours[1] == "dir")
+            okey, theirs = _next_other(key if mismatch and theirs[1] == "dir" else None)
+
+def _info(entry):
+    """The JSON form of an entry for a diff record."""
+
+    if entry is None:
+        return None
+
+    _, kind, size, mtime, _ = entry
+    return {
+        "type": kind, "size": size,
+        "modTime": None if mtime is None else _format_ns(mtime)}
+
+def compare(local, server, mtime_window=0):
+    """Merge a local and a remote stream of entries and find differences.
+
+    A directory only on one side (or being a file on the other side) is
+    reported once; its children are skipped.
+
+    Args:
+    -----
+        local: a generator from `walk`.
+        server: an iterable of entries from `remote`, in the same order.
+        mtime_window: a float; the allowed difference of mtimes in seconds.
+
+    Yields:
+    -------
+        Dicts with `path`, `diff` ("missing" if only in the index, "extra" if
+        only on the disk, "type", "size", or "mtime"), `local`, and `remote`.
+    """
+
+    window = int(mtime_window * 10**9)
+
+    for ours, theirs in merge(local, server):
+        if theirs is None:
+            diff = "extra"
+        elif ours is None:
+            diff = "missing"
+        elif ours[1] != theirs[1]:
+            diff = "type"
+        elif ours[1] == "file" and ours[2] != theirs[2]:
+            diff = "size"
+        elif ours[1] == "file" and theirs[3] is not None and abs(ours[3] - theirs[3]) > window:
+            diff = "mtime"
+        else:
+            continue
+
+        path = (theirs if ours is None else ours)[0]
+        yield {"path": path, "diff": diff, "local": _info(ours), "remote": _info(theirs)}
@@ -0,0 +1,264 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Pi-Yueh Chuang <pychuang@pm.me>
+#
+# Distributed under terms of the BSD 3-Clause license.
+
+"""File system watchers for the `watch-scan` subcommand.
+
+Two watchers with the same interface are provided: Inotify uses Linux's inotify
+through ctypes, and Poller is a pure-Python fallback comparing snapshots of
+`os.lstat` results. Both return the set of changed paths from `read`.
+"""
+import os
+import re
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import posixpath
+from .paths import drop_nested
+
+# get a logger with dummy handler if the caller does not have logging config
+logger = logging.getLogger("yasynccli.watch")
+logger.addHandler(logging.NullHandler())
+
+# Syncthing's own files; changes to them should never trigger scans
+_ignored = re.compile(r"^(?:\.stfolder|\.stversions|\.stignore|\.syncthing\..*\.tmp|~syncthing~.*\.tmp)$")
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+def collapse(subs, limit):
+    """Collapse subpaths of a folder to their common ancestors.
+
+    The deepest subpaths are replaced by their parents level by level until the
+    number of subpaths is not greater than `limit`.
+
+    Args:
+    -----
+        subs: a list of str or None; POSIX-style subpaths relative to a folder,
+            none of which is under another one; None means the whole folder.
+        limit: an int; the maximum number of subpaths.
+
+    Returns:
+    --------
+        A sorted list of str, or None if the whole folder has to be scanned.
+    """
+
+    if subs is None:
+        return None
+
+    subs = drop_nested(subs)
+    while len(subs) > limit:
+        depth = max(sub.count("/") for sub in subs)
+
+        # the next level is the folder itself
+        if depth == 0:
+            return None
+
+        subs = drop_nested(
+            posixpath.dirname(sub) if sub.count("/") == depth else sub for sub in subs)
+
+    return subs
+
+class Inotify:
+    """A recursive file system watcher using Linux's inotify through ctypes.
+
+    Constructor args:
+    -----------------
+        roots: a list of str; absolute paths of directories to watch.
+    """
+
+    _mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+        IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+    _header = struct.Struct("iIII")
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._roots = list(roots)
+        self._paths = {} # watch descriptor -> directory
+        for root in self._roots:
+            self._add_tree(root)
+
+    @staticmethod
+    def available():
+        """Whether inotify is available on this system."""
+        libc = ctypes.util.find_library("c")
+        return libc is not None and hasattr(ctypes.CDLL(libc), "inotify_init1")
+
+    def _add_tree(self, root):
+        """Watch a directory and all its subdirectories."""
+
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not _ignored.match(name)]
+
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), self._mask)
+            if wd >= 0:
+                self._paths[wd] = dirpath
+                continue
+
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached; raise "
+                    "fs.inotify.max_user_watches or use polling")
+
+            # the directory may have gone before being watched
+            logger.debug("Failed to watch {}: {}".format(dirpath, os.strerror(err)))
+
+    def read(self, timeout=None):
+        """Wait for changes and return the changed paths.
+
+        Args:
+        -----
+            timeout: a float in seconds or None; None means waiting forever.
+
+        Returns:
+        --------
+            A set of str; changed files/directories. Deleted or moved-away
+            entries are reported as their parent directories.
+        """
+
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changes = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._header.unpack_from(data, offset)
+                offset += self._header.size
+                name = os.fsdecode(data[offset:offset+length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    logger.warning("inotify queue overflowed; rescanning all roots.")
+                    changes.update(self._roots)
+                    continue
+
+                directory = self._paths.get(wd)
+                if directory is None:
+                    continue
+
+                if mask & IN_IGNORED:
+                    del self._paths[wd]
+                    continue
+
+                if _ignored.match(name):
+                    continue
+
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changes.add(os.path.dirname(directory))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changes.add(directory)
+                else:
+                    path = os.path.join(directory, name) if name else directory
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path)
+                    changes.add(path)
+
+        return changes
+
+    def close(self):
+        """Stop watching."""
+        os.close(self._fd)
+
+class Poller:
+    """A pure-Python file system watcher comparing `os.lstat` snapshots.
+
+    Constructor args:
+    -----------------
+        roots: a list of str; absolute paths of directories to watch.
+        interval: a float; seconds between two snapshots.
+    """
+
+    def __init__(self, roots, interval=2.0):
+        self._roots = list(roots)
+        self._interval = interval
+        self._snapshot = self._take()
+        self._last = time.monotonic()
+
+    def _take(self):
+        """Take a snapshot of {path: (mtime, size, inode)}."""
+
+        snapshot = {}
+        for root in self._roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [name for name in dirnames if not _ignored.match(name)]
+                for name in dirnames + filenames:
+                    if _ignored.match(name):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.lstat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        return snapshot
+
+    def read(self, timeout=None):
+        """Wait for changes and return the changed paths.
+
+        Args:
+        -----
+            timeout: a float in seconds or None; None means waiting for the next
+                snapshot.
+
+        Returns:
+        --------
+            A set of str; changed files/directories. Deleted entries are
+            reported as their parent directories.
+        """
+
+        wait = self._last + self._interval - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return set()
+
+        time.sleep(max(wait, 0))
+        snapshot, self._last = self._take(), time.monotonic()
+
+        changes = set()
+        for path, value in snapshot.items():
+            if self._snapshot.get(path) != value:
+                changes.add(path)
+
+        for path in self._snapshot.keys() - snapshot.keys():
+            changes.add(os.path.dirname(path))
+
+        self._snapshot = snapshot
+        return changes
+
+    def close(self):
+        """Stop watching."""
+        self._snapshot = {}